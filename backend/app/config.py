@@ -1,58 +1,86 @@
 """应用配置 - 从环境变量读取"""
 import os
 from pathlib import Path
-from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 
-# 支持从项目根目录的 .env 加载（当在 backend/ 下启动时）
-_root_env = Path(__file__).resolve().parent.parent.parent / ".env"
-_env_file = _root_env if _root_env.exists() else ".env"
+if TYPE_CHECKING:
+    from pydantic_settings import BaseSettings
 
 
-class Settings(BaseSettings):
-    # 即梦 API (方案 B - 本地服务，免费用户使用)，端口 1000-10010 避免 ECS 冲突
-    jimeng_api_base_url: str = "http://localhost:1002"
-    jimeng_session_id: str = ""
-    jimeng_model: str = "jimeng-4.5"
+@lru_cache(maxsize=1)
+def _resolve_env_file() -> Optional[str]:
+    """支持从项目根目录的 .env 加载（当在 backend/ 下启动时）；首次构建配置时才探测文件。
+    APP_SKIP_DOTENV=1 时完全跳过 .env（环境变量已由 Docker/K8s 等平台注入）。"""
+    if os.environ.get("APP_SKIP_DOTENV") == "1":
+        return None
+    root_env = Path(__file__).resolve().parent.parent.parent / ".env"
+    return str(root_env) if root_env.exists() else ".env"
 
-    # 后端（端口 1001）
-    backend_host: str = "0.0.0.0"
-    backend_port: int = 1001
-    api_cors_origins: str = "http://localhost:1000,http://127.0.0.1:1000,https://story.ai-knowledgepoints.cn,http://story.ai-knowledgepoints.cn"
 
-    # LLM (OpenAI 兼容)
-    llm_api_base: str = "https://api.openai.com/v1"
-    llm_api_key: str = ""
-    llm_model: str = "gpt-4o-mini"
+@lru_cache(maxsize=1)
+def _settings_class():
+    """延迟导入 pydantic_settings，只在首次读取配置时才构建 Settings 类。"""
+    from pydantic_settings import BaseSettings, SettingsConfigDict
 
-    # 视频生成
-    enable_video_generation: bool = True
-    video_output_dir: str = str((Path(__file__).resolve().parent.parent / "storybook_videos").resolve())
+    class Settings(BaseSettings):
+        model_config = SettingsConfigDict(
+            env_file=_resolve_env_file(),
+            env_file_encoding="utf-8",
+            extra="ignore",
+            frozen=True,
+        )
 
-    # 用户数据（本地文件存储）
-    data_dir: str = "data"
-    auth_secret: str = "change-me-in-production"
+        # 即梦 API (方案 B - 本地服务，免费用户使用)，端口 1000-10010 避免 ECS 冲突
+        jimeng_api_base_url: str = "http://localhost:1002"
+        jimeng_session_id: str = ""
+        jimeng_model: str = "jimeng-4.5"
 
-    # 火山引擎官方 API（付费用户专享）
-    # 火山即梦官方 API
-    volcano_jimeng_ak: str = ""
-    volcano_jimeng_sk: str = ""
-    volcano_jimeng_req_key: str = "jimeng_t2i_v40"
+        # 后端（端口 1001）
+        backend_host: str = "0.0.0.0"
+        backend_port: int = 1001
+        api_cors_origins: str = "http://localhost:1000,http://127.0.0.1:1000,https://story.ai-knowledgepoints.cn,http://story.ai-knowledgepoints.cn"
 
-    # 火山 TTS 官方 API
-    volcano_tts_appid: str = ""
-    volcano_tts_access_token: str = ""
-    volcano_tts_cluster: str = "volcano_tts"
-    volcano_tts_endpoint: str = "wss://openspeech.bytedance.com/api/v1/tts/ws_binary"
-    volcano_tts_voice_type: str = "BV700_V2_streaming"
-    volcano_tts_encoding: str = "mp3"
+        # LLM (OpenAI 兼容)
+        llm_api_base: str = "https://api.openai.com/v1"
+        llm_api_key: str = ""
+        llm_model: str = "gpt-4o-mini"
+        llm_max_concurrency: int = 8  # 同时进行的 LLM 调用上限
+        llm_prompt_cache: bool = False  # 请求中附带 prompt_cache_key（仅 OpenAI 等支持该参数的后端开启）
+        llm_json_mode: bool = False  # 请求 response_format=json_object（仅支持该参数的后端开启）
+        outline_cache_ttl: int = 0  # 指定主题的大纲缓存有效期（秒），0 为关闭（每次重新生成）
 
-    class Config:
-        env_file = _env_file
-        env_file_encoding = "utf-8"
-        extra = "ignore"
+        # 视频生成
+        enable_video_generation: bool = True
+        video_output_dir: str = str((Path(__file__).resolve().parent.parent / "storybook_videos").resolve())
+
+        # 用户数据（本地文件存储）
+        data_dir: str = "data"
+        auth_secret: str = "change-me-in-production"
+
+        # 火山引擎官方 API（付费用户专享）
+        # 火山即梦官方 API
+        volcano_jimeng_ak: str = ""
+        volcano_jimeng_sk: str = ""
+        volcano_jimeng_req_key: str = "jimeng_t2i_v40"
+
+        # 火山 TTS 官方 API
+        volcano_tts_appid: str = ""
+        volcano_tts_access_token: str = ""
+        volcano_tts_cluster: str = "volcano_tts"
+        volcano_tts_endpoint: str = "wss://openspeech.bytedance.com/api/v1/tts/ws_binary"
+        volcano_tts_voice_type: str = "BV700_V2_streaming"
+        volcano_tts_encoding: str = "mp3"
+    return Settings
+
+
+def __getattr__(name: str):
+    # 兼容 `from app.config import Settings`
+    if name == "Settings":
+        return _settings_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @lru_cache
-def get_settings() -> Settings:
-    return Settings()
+def get_settings() -> "BaseSettings":
+    return _settings_class()()
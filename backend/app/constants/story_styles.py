@@ -60,14 +60,14 @@ STORY_STYLES: Dict[str, StoryStyle] = {
 # 默认风格（保持向后兼容）
 DEFAULT_STYLE_ID = "q_cute"
 
+# 风格ID -> prompt 的扁平映射，热路径只需一次查表
+_STYLE_PROMPTS: Dict[str, str] = {k: v["prompt"] for k, v in STORY_STYLES.items()}
+_DEFAULT_STYLE_PROMPT = _STYLE_PROMPTS[DEFAULT_STYLE_ID]
+
 # 获取风格prompt
 def get_style_prompt(style_id: str) -> str:
-    """根据风格ID获取对应的prompt"""
-    style = STORY_STYLES.get(style_id)
-    if not style:
-        # 如果风格不存在，使用默认风格
-        style = STORY_STYLES[DEFAULT_STYLE_ID]
-    return style["prompt"]
+    """根据风格ID获取对应的prompt（风格不存在时使用默认风格）"""
+    return _STYLE_PROMPTS.get(style_id, _DEFAULT_STYLE_PROMPT)
 
 # 获取风格信息
 def get_style_info(style_id: str) -> StoryStyle | None:
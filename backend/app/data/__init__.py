@@ -1,16 +1,21 @@
-from .pools import (
-    THEME_POOL,
-    SCENE_POOL,
-    TASK_POOL,
-    PLOT_TWIST_POOL,
-    LOCATION_HINT_POOL,
-    CHARACTER_POOL,
-    SETTING_POOL,
-    pick_theme,
-    pick_character,
-    pick_setting,
-    pick_story_preset,
-)
+from importlib import import_module
+
+# 按需加载：首次访问时才导入 .pools（PEP 562）
+_LAZY = {
+    "THEME_POOL": "pools",
+    "SCENE_POOL": "pools",
+    "TASK_POOL": "pools",
+    "PLOT_TWIST_POOL": "pools",
+    "LOCATION_HINT_POOL": "pools",
+    "CHARACTER_POOL": "pools",
+    "SETTING_POOL": "pools",
+    "THEME_PROMPT_FRAGMENTS": "pools",
+    "PromptFragment": "pools",
+    "pick_theme": "pools",
+    "pick_character": "pools",
+    "pick_setting": "pools",
+    "pick_story_preset": "pools",
+}
 
 __all__ = [
     "THEME_POOL",
@@ -20,8 +25,23 @@ __all__ = [
     "LOCATION_HINT_POOL",
     "CHARACTER_POOL",
     "SETTING_POOL",
+    "THEME_PROMPT_FRAGMENTS",
+    "PromptFragment",
     "pick_theme",
     "pick_character",
     "pick_setting",
     "pick_story_preset",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -1,6 +1,12 @@
 """故事主题、角色、场景池 - 供随机组合生成故事。"""
+import os
 import random
-from typing import Dict
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock, local
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Tuple
 
 from app.models.story import Character, Setting
 
@@ -29,6 +35,25 @@ THEME_POOL = [
 ]
 
 
+
+@dataclass(frozen=True, slots=True)
+class PromptFragment:
+    """提示词片段：cache_key 标识片段，is_cacheable 表示内容固定、可作为可缓存前缀的一部分"""
+    cache_key: str
+    text: str
+    is_cacheable: bool = True
+
+
+# 主题的静态部分（主题名 + 关键词 + 情节种子）预先拼好并驻留，按主题名索引；
+# LLM 服务直接取用，不再每次请求重新格式化
+THEME_PROMPT_FRAGMENTS: Mapping[str, PromptFragment] = MappingProxyType({
+    t["theme"]: PromptFragment(
+        cache_key=f"theme:{t['theme']}",
+        text=sys.intern(f"主题：{t['theme']}，{t['keywords']}，情节种子：{t['plot_seed']}"),
+    )
+    for t in THEME_POOL
+})
+
 SCENE_POOL = [
     "开场是一场刚下过雨的清晨，空气里都是泥土和花香",
     "夜空突然亮起一条会说话的光带，引来全城围观",
@@ -93,119 +118,226 @@ LOCATION_HINT_POOL = [
 ]
 
 
-CHARACTER_POOL = [
-    Character(name="小白", species="兔子", trait="好奇心旺盛，胆子小但很勇敢",
-              appearance="a small fluffy white rabbit with big blue eyes and a red scarf"),
-    Character(name="团团", species="小熊猫", trait="憨厚可爱，力气大心地善良",
-              appearance="a chubby red panda with round face and fluffy striped tail"),
-    Character(name="星星", species="小狐狸", trait="聪明机灵，有点调皮但很忠诚",
-              appearance="a small orange fox with sparkling golden eyes and a starry collar"),
-    Character(name="泡泡", species="小龙", trait="害羞内向，会吐彩色泡泡",
-              appearance="a tiny pastel blue baby dragon with rainbow bubbles around"),
-    Character(name="朵朵", species="小猫", trait="优雅温柔，喜欢唱歌跳舞",
-              appearance="a graceful calico kitten with a flower crown and pink bow"),
-    Character(name="闪闪", species="萤火虫", trait="活泼开朗，喜欢照亮别人",
-              appearance="a cute glowing firefly with tiny wings and warm golden light"),
-    Character(name="波波", species="小企鹅", trait="冒失但热心，经常摔跤",
-              appearance="a clumsy baby penguin with a wobbly walk and cheerful expression"),
-    Character(name="叮当", species="小鹿", trait="优美灵动，跑得最快",
-              appearance="a young deer with silver spots and graceful antlers with bells"),
-    Character(name="米粒", species="小仓鼠", trait="善于收纳，总能找到应急物品",
-              appearance="a tiny hamster with a patchwork satchel and bright eyes"),
-    Character(name="阿岩", species="小山羊", trait="稳重可靠，擅长攀爬陡坡",
-              appearance="a young mountain goat with cream fur and sturdy little horns"),
-    Character(name="悠悠", species="海獭", trait="乐观爱笑，擅长水下侦查",
-              appearance="a playful sea otter with a shell necklace and glossy brown fur"),
-    Character(name="栗子", species="刺猬", trait="谨慎细心，观察力超强",
-              appearance="a round hedgehog with chestnut quills and a tiny explorer cape"),
-    Character(name="铃铛", species="小鹦鹉", trait="记忆力超群，爱学各种声音",
-              appearance="a green parrot chick with yellow cheeks and a silver ankle bell"),
-    Character(name="阿墨", species="章鱼", trait="多才多艺，临场应变很快",
-              appearance="a baby octopus with violet skin and a painter's beret"),
-    Character(name="糖糖", species="蜜蜂", trait="勤快认真，时间观念很强",
-              appearance="a tiny bee with striped scarf and transparent golden wings"),
-    Character(name="阿跃", species="青蛙", trait="幽默健谈，擅长活跃气氛",
-              appearance="a bright green frog with a polka-dot raincoat and wide smile"),
-    Character(name="圆圆", species="猫头鹰", trait="知识丰富，夜里特别精神",
-              appearance="a fluffy owlet with amber eyes and a little scholar hat"),
-    Character(name="咚咚", species="小象", trait="温和有耐心，记忆力很好",
-              appearance="a baby elephant with soft gray skin and a blue backpack"),
-]
+# 角色池：每行 (名字, 种类, 性格, 英文外观)，再转置为按列存储的元组（同一下标为同一角色）
+_CHARACTER_ROWS = (
+    ("小白", "兔子", "好奇心旺盛，胆子小但很勇敢",
+     "a small fluffy white rabbit with big blue eyes and a red scarf"),
+    ("团团", "小熊猫", "憨厚可爱，力气大心地善良",
+     "a chubby red panda with round face and fluffy striped tail"),
+    ("星星", "小狐狸", "聪明机灵，有点调皮但很忠诚",
+     "a small orange fox with sparkling golden eyes and a starry collar"),
+    ("泡泡", "小龙", "害羞内向，会吐彩色泡泡",
+     "a tiny pastel blue baby dragon with rainbow bubbles around"),
+    ("朵朵", "小猫", "优雅温柔，喜欢唱歌跳舞",
+     "a graceful calico kitten with a flower crown and pink bow"),
+    ("闪闪", "萤火虫", "活泼开朗，喜欢照亮别人",
+     "a cute glowing firefly with tiny wings and warm golden light"),
+    ("波波", "小企鹅", "冒失但热心，经常摔跤",
+     "a clumsy baby penguin with a wobbly walk and cheerful expression"),
+    ("叮当", "小鹿", "优美灵动，跑得最快",
+     "a young deer with silver spots and graceful antlers with bells"),
+    ("米粒", "小仓鼠", "善于收纳，总能找到应急物品",
+     "a tiny hamster with a patchwork satchel and bright eyes"),
+    ("阿岩", "小山羊", "稳重可靠，擅长攀爬陡坡",
+     "a young mountain goat with cream fur and sturdy little horns"),
+    ("悠悠", "海獭", "乐观爱笑，擅长水下侦查",
+     "a playful sea otter with a shell necklace and glossy brown fur"),
+    ("栗子", "刺猬", "谨慎细心，观察力超强",
+     "a round hedgehog with chestnut quills and a tiny explorer cape"),
+    ("铃铛", "小鹦鹉", "记忆力超群，爱学各种声音",
+     "a green parrot chick with yellow cheeks and a silver ankle bell"),
+    ("阿墨", "章鱼", "多才多艺，临场应变很快",
+     "a baby octopus with violet skin and a painter's beret"),
+    ("糖糖", "蜜蜂", "勤快认真，时间观念很强",
+     "a tiny bee with striped scarf and transparent golden wings"),
+    ("阿跃", "青蛙", "幽默健谈，擅长活跃气氛",
+     "a bright green frog with a polka-dot raincoat and wide smile"),
+    ("圆圆", "猫头鹰", "知识丰富，夜里特别精神",
+     "a fluffy owlet with amber eyes and a little scholar hat"),
+    ("咚咚", "小象", "温和有耐心，记忆力很好",
+     "a baby elephant with soft gray skin and a blue backpack"),
+)
+CHARACTER_NAMES, CHARACTER_SPECIES, CHARACTER_TRAITS, CHARACTER_APPEARANCES = zip(*_CHARACTER_ROWS)
+# 英文描述会反复拼进画图提示词，驻留后相同文本共用同一对象
+CHARACTER_APPEARANCES = tuple(map(sys.intern, CHARACTER_APPEARANCES))
 
 
-SETTING_POOL = [
-    Setting(location="魔法森林", time="春天的早晨", weather="阳光明媚",
-            visual_description="enchanted forest with giant colorful mushrooms and glowing flowers"),
-    Setting(location="云朵王国", time="金色的黄昏", weather="霞光满天",
-            visual_description="kingdom above clouds with rainbow bridges and crystal castles"),
-    Setting(location="海底花园", time="阳光穿透海面的午后", weather="海水清澈",
-            visual_description="underwater garden with coral reef, colorful fish and seashell houses"),
-    Setting(location="星光小镇", time="满天星星的夜晚", weather="星光闪烁",
-            visual_description="tiny magical town under starry sky with lantern-lit cobblestone streets"),
-    Setting(location="彩虹山谷", time="雨后初晴", weather="彩虹挂天",
-            visual_description="valley with waterfall creating rainbows, flowers in every color"),
-    Setting(location="雪花村庄", time="冬天的黎明", weather="雪花飘飘",
-            visual_description="cozy snowy village with warm glowing windows and northern lights"),
-    Setting(location="风铃海岸", time="夏日午后", weather="海风轻拂",
-            visual_description="seaside cliffs with wind chimes, white foam waves and blue horizon"),
-    Setting(location="镜湖营地", time="清晨薄雾", weather="微凉湿润",
-            visual_description="lakeside camp with pine trees, misty water and wooden docks"),
-    Setting(location="琥珀沙湾", time="傍晚", weather="暖风晴朗",
-            visual_description="golden beach with amber rocks, tide pools and orange sunset"),
-    Setting(location="回声峡谷", time="午后", weather="晴空高远",
-            visual_description="narrow canyon with layered cliffs and echoing stone corridors"),
-    Setting(location="玻璃温室城", time="清晨", weather="温暖湿润",
-            visual_description="vast glass greenhouse city with vines, canals and sunlight beams"),
-    Setting(location="银月灯塔", time="深夜", weather="海雾弥漫",
-            visual_description="ancient lighthouse on dark sea cliffs with rotating silver beacon"),
-    Setting(location="云端菜园", time="日出时分", weather="微风轻柔",
-            visual_description="floating terraced gardens above clouds with dew and tiny bridges"),
-    Setting(location="古树图书馆", time="下午", weather="林间微光",
-            visual_description="library built inside giant trees with spiral stairs and hanging lanterns"),
-    Setting(location="极地科研站", time="冬夜", weather="极光闪动",
-            visual_description="polar station under aurora sky with ice domes and snow trails"),
-    Setting(location="蒸汽工坊街", time="黄昏", weather="薄雾朦胧",
-            visual_description="steampunk alley with brass pipes, clock towers and soft steam lights"),
-    Setting(location="珊瑚集市", time="正午", weather="浪花温柔",
-            visual_description="floating market near reefs with colorful tents and shell boats"),
-    Setting(location="星轨观测台", time="夜晚", weather="空气清澈",
-            visual_description="mountain observatory with rotating telescope and star maps"),
-    Setting(location="白鹭湿地", time="清晨", weather="露水晶莹",
-            visual_description="wetland boardwalk with reeds, white egrets and mirror-like ponds"),
-    Setting(location="纸鸢平原", time="春日下午", weather="和风徐徐",
-            visual_description="wide grassland filled with colorful kites, wildflowers and distant hills"),
-    Setting(location="火山温泉谷", time="傍晚", weather="温热蒸汽",
-            visual_description="volcanic valley with hot springs, red rocks and glowing dusk clouds"),
-    Setting(location="月影石桥镇", time="夜幕初降", weather="清爽干燥",
-            visual_description="old town of stone bridges and moonlit canals with warm lantern reflections"),
-]
+# 场景池：每行 (地点, 时间, 天气, 英文视觉描述)，同样转置为按列存储
+_SETTING_ROWS = (
+    ("魔法森林", "春天的早晨", "阳光明媚",
+     "enchanted forest with giant colorful mushrooms and glowing flowers"),
+    ("云朵王国", "金色的黄昏", "霞光满天",
+     "kingdom above clouds with rainbow bridges and crystal castles"),
+    ("海底花园", "阳光穿透海面的午后", "海水清澈",
+     "underwater garden with coral reef, colorful fish and seashell houses"),
+    ("星光小镇", "满天星星的夜晚", "星光闪烁",
+     "tiny magical town under starry sky with lantern-lit cobblestone streets"),
+    ("彩虹山谷", "雨后初晴", "彩虹挂天",
+     "valley with waterfall creating rainbows, flowers in every color"),
+    ("雪花村庄", "冬天的黎明", "雪花飘飘",
+     "cozy snowy village with warm glowing windows and northern lights"),
+    ("风铃海岸", "夏日午后", "海风轻拂",
+     "seaside cliffs with wind chimes, white foam waves and blue horizon"),
+    ("镜湖营地", "清晨薄雾", "微凉湿润",
+     "lakeside camp with pine trees, misty water and wooden docks"),
+    ("琥珀沙湾", "傍晚", "暖风晴朗",
+     "golden beach with amber rocks, tide pools and orange sunset"),
+    ("回声峡谷", "午后", "晴空高远",
+     "narrow canyon with layered cliffs and echoing stone corridors"),
+    ("玻璃温室城", "清晨", "温暖湿润",
+     "vast glass greenhouse city with vines, canals and sunlight beams"),
+    ("银月灯塔", "深夜", "海雾弥漫",
+     "ancient lighthouse on dark sea cliffs with rotating silver beacon"),
+    ("云端菜园", "日出时分", "微风轻柔",
+     "floating terraced gardens above clouds with dew and tiny bridges"),
+    ("古树图书馆", "下午", "林间微光",
+     "library built inside giant trees with spiral stairs and hanging lanterns"),
+    ("极地科研站", "冬夜", "极光闪动",
+     "polar station under aurora sky with ice domes and snow trails"),
+    ("蒸汽工坊街", "黄昏", "薄雾朦胧",
+     "steampunk alley with brass pipes, clock towers and soft steam lights"),
+    ("珊瑚集市", "正午", "浪花温柔",
+     "floating market near reefs with colorful tents and shell boats"),
+    ("星轨观测台", "夜晚", "空气清澈",
+     "mountain observatory with rotating telescope and star maps"),
+    ("白鹭湿地", "清晨", "露水晶莹",
+     "wetland boardwalk with reeds, white egrets and mirror-like ponds"),
+    ("纸鸢平原", "春日下午", "和风徐徐",
+     "wide grassland filled with colorful kites, wildflowers and distant hills"),
+    ("火山温泉谷", "傍晚", "温热蒸汽",
+     "volcanic valley with hot springs, red rocks and glowing dusk clouds"),
+    ("月影石桥镇", "夜幕初降", "清爽干燥",
+     "old town of stone bridges and moonlit canals with warm lantern reflections"),
+)
+SETTING_LOCATIONS, SETTING_TIMES, SETTING_WEATHERS, SETTING_VISUALS = zip(*_SETTING_ROWS)
+SETTING_LOCATIONS = tuple(map(sys.intern, SETTING_LOCATIONS))
+SETTING_VISUALS = tuple(map(sys.intern, SETTING_VISUALS))
+
+
+# 由列数据构建对象（首次抽取时构建一次并缓存）；随机抽取直接复用这些对象，不再逐次构造
+# 预置数据均为受控常量，用 model_construct 跳过字段校验；
+# 所有字段都显式传入（含 visual_description），保证 model_fields_set 与正常构造一致
+_C = Character.model_construct
+_S = Setting.model_construct
+
+
+@lru_cache(maxsize=1)
+def _load_pools() -> Tuple[List[Character], List[Setting]]:
+    characters = [
+        _C(name=name, species=species, trait=trait, appearance=appearance)
+        for name, species, trait, appearance in zip(
+            CHARACTER_NAMES, CHARACTER_SPECIES, CHARACTER_TRAITS, CHARACTER_APPEARANCES
+        )
+    ]
+    settings = [
+        _S(location=location, time=time, weather=weather, visual_description=visual)
+        for location, time, weather, visual in zip(
+            SETTING_LOCATIONS, SETTING_TIMES, SETTING_WEATHERS, SETTING_VISUALS
+        )
+    ]
+    return characters, settings
+
+
+def __getattr__(name: str):
+    # CHARACTER_POOL / SETTING_POOL 按需构建（PEP 562）
+    if name == "CHARACTER_POOL":
+        return _load_pools()[0]
+    if name == "SETTING_POOL":
+        return _load_pools()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 每个线程独立的随机数生成器，线程池中并发抽取时互不争用同一个全局状态
+_thread_local = local()
+
+
+def _rng() -> random.Random:
+    rng = getattr(_thread_local, "rng", None)
+    if rng is None:
+        # 各线程用独立的系统随机种子，避免序列相关
+        rng = random.Random(os.urandom(16))
+        _thread_local.rng = rng
+    return rng
+
+
+# 每批预采样的数量
+PRESET_BATCH_SIZE = 256
+
+
+class _BatchSampler:
+    """批量预采样：一次用 choices(k=N) 抽出一批结果，逐个取出，取完再整批补充。"""
+
+    def __init__(self, sample: Callable[[int], List], batch_size: int = PRESET_BATCH_SIZE):
+        self._sample = sample
+        self._batch_size = batch_size
+        self._buffer: List = []
+        self._lock = Lock()
+
+    def __call__(self):
+        with self._lock:
+            if not self._buffer:
+                self._buffer = self._sample(self._batch_size)
+            return self._buffer.pop()
+
+
+@lru_cache(maxsize=4096)
+def _assemble_theme(theme_idx: int, scene_idx: int, task_idx: int, twist_idx: int, location_idx: int) -> Mapping[str, str]:
+    """按下标组装主题预设，返回只读视图；相同组合复用同一对象。"""
+    return MappingProxyType({
+        **THEME_POOL[theme_idx],
+        "scene_seed": SCENE_POOL[scene_idx],
+        "core_task": TASK_POOL[task_idx],
+        "plot_twist": PLOT_TWIST_POOL[twist_idx],
+        "location_hint": LOCATION_HINT_POOL[location_idx],
+    })
+
+
+def _sample_themes(n: int) -> List[Mapping[str, str]]:
+    columns = zip(
+        _rng().choices(range(len(THEME_POOL)), k=n),
+        _rng().choices(range(len(SCENE_POOL)), k=n),
+        _rng().choices(range(len(TASK_POOL)), k=n),
+        _rng().choices(range(len(PLOT_TWIST_POOL)), k=n),
+        _rng().choices(range(len(LOCATION_HINT_POOL)), k=n),
+    )
+    return [_assemble_theme(*indices) for indices in columns]
+
+
+def _sample_presets(n: int) -> List[Dict[str, object]]:
+    columns = zip(
+        _sample_themes(n),
+        _rng().choices(_load_pools()[0], k=n),
+        _rng().choices(_load_pools()[1], k=n),
+    )
+    return [
+        {"theme": theme, "character": character, "setting": setting}
+        for theme, character, setting in columns
+    ]
+
+
+_theme_sampler = _BatchSampler(_sample_themes)
+_character_sampler = _BatchSampler(lambda n: _rng().choices(_load_pools()[0], k=n))
+_setting_sampler = _BatchSampler(lambda n: _rng().choices(_load_pools()[1], k=n))
+_preset_sampler = _BatchSampler(_sample_presets)
 
 
-def pick_theme() -> Dict[str, str]:
+def pick_theme() -> Mapping[str, str]:
     """
     选择主题并注入更多故事种子，提升随机组合丰富度。
     兼容旧字段：theme / keywords / plot_seed。
+    返回只读映射（同一组合会被复用），需要修改时请先 dict(...) 复制。
     """
-    base = random.choice(THEME_POOL).copy()
-    base["scene_seed"] = random.choice(SCENE_POOL)
-    base["core_task"] = random.choice(TASK_POOL)
-    base["plot_twist"] = random.choice(PLOT_TWIST_POOL)
-    base["location_hint"] = random.choice(LOCATION_HINT_POOL)
-    return base
+    return _theme_sampler()
 
 
 def pick_character() -> Character:
-    return random.choice(CHARACTER_POOL)
+    return _character_sampler()
 
 
 def pick_setting() -> Setting:
-    return random.choice(SETTING_POOL)
+    return _setting_sampler()
 
 
 def pick_story_preset() -> Dict[str, object]:
-    """一次性返回完整预设组合，便于后续扩展其他服务调用。"""
-    return {
-        "theme": pick_theme(),
-        "character": pick_character(),
-        "setting": pick_setting(),
-    }
+    """一次性返回完整预设组合（theme / character / setting），从预采样缓冲区取出。"""
+    return _preset_sampler()
@@ -8,7 +8,9 @@ from app.config import get_settings
 from app.routers import story, video, auth, voices, audio
 from app.utils.store import load_stories_from_disk
 from app.utils.paths import IMAGES_DIR
-from app.services.tts_service import pregenerate_all_previews
+from app.utils.responses import AppJSONResponse
+from app.services import prefetch_queue
+from app.utils.user_store_cache import start_preferences_flusher, stop_preferences_flusher
 import asyncio
 
 # 配置日志
@@ -20,7 +22,7 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-_PROXY_ENV_KEYS = [
+_PROXY_ENV_KEYS = frozenset({
     "http_proxy",
     "https_proxy",
     "all_proxy",
@@ -29,18 +31,15 @@ _PROXY_ENV_KEYS = [
     "HTTPS_PROXY",
     "ALL_PROXY",
     "NO_PROXY",
-]
+})
 
 
 def _disable_system_proxy_env() -> None:
     """清理代理环境变量，避免本地服务误走系统代理。"""
-    removed = []
-    for key in _PROXY_ENV_KEYS:
-        value = os.environ.pop(key, None)
-        if value:
-            removed.append(key)
+    # 只对实际存在的键调用 pop（每次删除都会触发一次 unsetenv）
+    removed = sorted(k for k in _PROXY_ENV_KEYS.intersection(os.environ) if os.environ.pop(k))
     if removed:
-        logger.info(f"[启动] 已禁用系统代理环境变量: {', '.join(removed)}")
+        logger.info("[启动] 已禁用系统代理环境变量: %s", ", ".join(removed))
 
 
 _disable_system_proxy_env()
@@ -53,12 +52,30 @@ async def lifespan(app: FastAPI):
     logger.info("========== 应用启动 ==========")
     load_stories_from_disk()
     
-    # 后台预生成音色预览（不阻塞启动）
+    # 后台预生成音色预览（不阻塞启动）；TTS 依赖较重，启动时才导入
+    from app.services.tts_service import pregenerate_all_previews
+    from app.services.tts_generation_service import load_generated_audio_index
+    load_generated_audio_index()
     asyncio.create_task(pregenerate_all_previews())
+
+    # 已压缩插画索引（重复的源图只查内存）
+    from app.services.jimeng_service import load_compressed_image_index
+    load_compressed_image_index()
+
+    # 启动插画 / TTS 预取 worker
+    prefetch_queue.start()
+    # 启动偏好设置批量落盘任务
+    start_preferences_flusher()
     
     logger.info("========== 应用启动完成 ==========")
     yield
     # 关闭时：清理资源（如需要）
+    await prefetch_queue.stop()
+    await stop_preferences_flusher()
+    from app.services.jimeng_service import close_client as close_jimeng_client
+    await close_jimeng_client()
+    from app.services.llm_service import close_client as close_llm_client
+    await close_llm_client()
     logger.info("========== 应用关闭 ==========")
 
 
@@ -66,30 +83,45 @@ app = FastAPI(
     title="有声互动故事书 API",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=AppJSONResponse,
 )
 settings = get_settings()
-allowed_origins = []
-for origin in settings.api_cors_origins.split(","):
-    normalized = origin.strip().rstrip("/")
-    if normalized:
-        allowed_origins.append(normalized)
+# 启动时解析一次 CORS 白名单（去空白、去尾部斜杠）
+ALLOWED_ORIGINS: tuple[str, ...] = tuple(
+    normalized
+    for normalized in (o.strip().rstrip("/") for o in settings.api_cors_origins.split(","))
+    if normalized
+)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allowed_origins,
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# 插画文件名是源图哈希，内容生成后不变，允许浏览器长期缓存
+IMAGE_CACHE_CONTROL = "public, max-age=2592000, immutable"
+
+
+class ImageStaticFiles(StaticFiles):
+    """StaticFiles + Cache-Control（生产环境由 Nginx 直接提供，此处用于开发环境及 Nginx 回退）。"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["cache-control"] = IMAGE_CACHE_CONTROL
+        return response
+
+
 # 挂载静态文件目录（压缩后的图片）
-app.mount("/static/images", StaticFiles(directory=str(IMAGES_DIR)), name="images")
+app.mount("/static/images", ImageStaticFiles(directory=str(IMAGES_DIR)), name="images")
 
 app.include_router(auth.router)
 app.include_router(story.router)
 app.include_router(video.router)
 app.include_router(voices.router)
-app.include_router(audio.router)
+audio.mount_audio_files(app)
 
 
 @app.get("/")
@@ -3,6 +3,7 @@ from .story import (
     Setting,
     InteractionPoint,
     StorySegment,
+    SEGMENT_TEMPLATE,
     StoryOutline,
     StoryState,
     InteractRequest,
@@ -13,6 +14,7 @@ __all__ = [
     "Setting",
     "InteractionPoint",
     "StorySegment",
+    "SEGMENT_TEMPLATE",
     "StoryOutline",
     "StoryState",
     "InteractRequest",
@@ -1,16 +1,68 @@
 """故事与互动数据模型"""
-from typing import Optional, List
-from pydantic import BaseModel, Field
+from typing import Any, Literal, Optional, List, get_args
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_serializer, field_validator
+
+# 取值固定的字段用 Literal 约束，校验时只需比对有限集合
+Emotion = Literal["happy", "excited", "mysterious", "warm", "tense"]
+InteractionType = Literal["guess", "choice", "name", "describe"]
+StoryStatus = Literal["generating", "narrating", "waiting_interaction", "completed"]
+
+
+def _coerce_literal(value, allowed: tuple, default: str):
+    """LLM 输出可能大小写不一或给出未知值：统一小写，不在集合内则回退默认值"""
+    if isinstance(value, str):
+        value = value.strip().lower()
+    return value if value in allowed else default
+
+
+class _CachedDumpModel(BaseModel):
+    """
+    缓存 model_dump() 结果，供接口轮询时重复使用。
+    任一字段被重新赋值或通过 model_copy 派生时缓存失效；返回的 dict 只读，不要修改。
+    缓存只感知本模型自身字段的赋值，因此嵌套的模型字段必须是只读的（frozen），修改时整体替换。
+    """
+    _dump_cache: Optional[dict] = PrivateAttr(default=None)
+
+    def cached_dump(self) -> dict:
+        if self._dump_cache is None:
+            self._dump_cache = self.model_dump()
+        return self._dump_cache
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields:
+            self._dump_cache = None
+
+    def model_copy(self, *, update: Optional[dict] = None, deep: bool = False):
+        copied = super().model_copy(update=update, deep=deep)
+        copied._dump_cache = None
+        return copied
+
+    def __eq__(self, other: Any) -> bool:
+        # 比较时忽略缓存（默认实现会连同私有属性一起比较）
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return (
+            type(self) is type(other)
+            and self.__dict__ == other.__dict__
+            and self.__pydantic_extra__ == other.__pydantic_extra__
+        )
+
+
+class Character(_CachedDumpModel):
+    """角色（只读；池中预置角色在各故事间共享同一实例）"""
+    model_config = ConfigDict(frozen=True)
 
-
-class Character(BaseModel):
     name: str
     species: str
     trait: str
     appearance: str  # 英文，用于即梦画图
 
 
-class Setting(BaseModel):
+class Setting(_CachedDumpModel):
+    """场景（只读；池中预置场景在各故事间共享同一实例）"""
+    model_config = ConfigDict(frozen=True)
+
     location: str
     time: str
     weather: str
@@ -18,20 +70,47 @@ class Setting(BaseModel):
 
 
 class InteractionPoint(BaseModel):
-    type: str  # guess | choice | name | describe
+    """互动节点（只读；作为 StorySegment 的嵌套字段，修改时用 model_copy 派生后整体赋值，段落的 dump 缓存随之失效）"""
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+    type: InteractionType
     prompt: str
     hints: Optional[List[str]] = None
     user_input: Optional[str] = None
 
+    @field_validator("type", mode="before")
+    @classmethod
+    def _normalize_type(cls, v):
+        return _coerce_literal(v, get_args(InteractionType), "guess")
+
+
+class StorySegment(_CachedDumpModel):
+    model_config = ConfigDict(extra="ignore")
 
-class StorySegment(BaseModel):
     id: Optional[str] = None
     text: str
     scene_description: str  # 英文，用于即梦
-    emotion: str = "warm"  # happy | excited | mysterious | warm | tense
+    emotion: Emotion = "warm"
     interaction_point: Optional[InteractionPoint] = None
     image_url: Optional[str] = None
 
+    @field_validator("emotion", mode="before")
+    @classmethod
+    def _normalize_emotion(cls, v):
+        return _coerce_literal(v, get_args(Emotion), "warm")
+
+
+# 段落模板：已知字段合法时用 SEGMENT_TEMPLATE.model_copy(update={...}) 派生新段落，跳过重复校验。
+# update 中的值不会被校验，来自 LLM 的原始数据仍应走 StorySegment(...) 构造。
+SEGMENT_TEMPLATE = StorySegment.model_construct(
+    id=None,
+    text="",
+    scene_description="",
+    emotion="warm",
+    interaction_point=None,
+    image_url=None,
+)
+
 
 class StoryOutline(BaseModel):
     title: str
@@ -43,6 +122,8 @@ class StoryOutline(BaseModel):
 
 class StoryState(BaseModel):
     """运行时故事状态（内存存储）"""
+    model_config = ConfigDict(extra="ignore")
+
     id: str
     title: str
     theme: str
@@ -50,10 +131,16 @@ class StoryState(BaseModel):
     setting: Setting
     segments: List[StorySegment]
     current_index: int = 0
-    status: str = "narrating"  # generating | narrating | waiting_interaction | completed
-    video_clips: dict[str, str] = Field(default_factory=dict)  # {segment_index: video_url}
+    status: StoryStatus = "narrating"
+    video_clips: dict[int, str] = Field(default_factory=dict)  # {segment_index: video_url}
     style_id: str = "q_cute"  # 故事风格ID，默认为软萌Q版卡通风
     max_total_pages: int = 7  # 用户设定的最大总页数（包括互动续写的页数），默认7页
+    revision: int = 0  # 每次 save_story / update_story 写入时递增，轮询接口据此生成 ETag
+
+    @field_serializer("video_clips", when_used="json")
+    def _serialize_video_clips(self, clips: dict[int, str]) -> dict[str, str]:
+        # JSON 对象键只能是字符串，仅在输出 JSON 时转换；旧数据的字符串键读入时会自动转为 int
+        return {str(k): v for k, v in clips.items()}
 
 
 class InteractRequest(BaseModel):
@@ -0,0 +1,61 @@
+"""故事接口的响应构建：start / 获取状态 / 下一页 / 互动 共用同一套字段组装逻辑"""
+from app.constants.story_styles import DEFAULT_STYLE_ID
+from app.services.story_engine import get_current_segment
+from app.utils.responses import AppJSONResponse
+from app.utils.url_utils import normalize_image_url
+
+
+def serialize_segment(seg):
+    if not seg:
+        return None
+    data = dict(seg.cached_dump())
+    data["image_url"] = normalize_image_url(data.get("image_url"))
+    return data
+
+
+def serialize_segments(segments):
+    return [serialize_segment(s) for s in segments]
+
+
+def progress_dict(state) -> dict:
+    """翻页 / 互动后的进度字段：当前段、是否有互动、状态。"""
+    seg, has_interaction = get_current_segment(state)
+    return {
+        "current_index": state.current_index,
+        "current_segment": serialize_segment(seg),
+        "has_interaction": has_interaction,
+        "status": state.status,
+    }
+
+
+def state_to_dict(state, include_all_segments: bool = False, summary_only: bool = False) -> dict:
+    """
+    组装故事状态响应体（字段均来自缓存的 model_dump 结果）。
+
+    Args:
+        state: StoryState
+        include_all_segments: 是否附带全部段落（GET /{story_id}）
+        summary_only: 只返回 story_id + 进度字段（/next）
+    """
+    data = {"story_id": state.id}
+    if not summary_only:
+        data.update({
+            "title": state.title,
+            "theme": state.theme,
+            "characters": [c.cached_dump() for c in state.characters],
+            "setting": state.setting.cached_dump(),
+            "total_segments": len(state.segments),
+            "style_id": getattr(state, "style_id", DEFAULT_STYLE_ID),
+        })
+        if include_all_segments:
+            data["segments"] = serialize_segments(state.segments)
+    data.update(progress_dict(state))
+    return data
+
+
+def state_response(state, include_all_segments: bool = False, summary_only: bool = False, **kwargs) -> AppJSONResponse:
+    """直接编码为 JSON 响应，跳过 jsonable_encoder。"""
+    return AppJSONResponse(
+        content=state_to_dict(state, include_all_segments=include_all_segments, summary_only=summary_only),
+        **kwargs,
+    )
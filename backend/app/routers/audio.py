@@ -1,102 +1,68 @@
-"""音频文件服务：提供 TTS 音频和预览音频的访问"""
-import logging
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.utils.paths import AUDIO_DIR
-
-logger = logging.getLogger(__name__)
-
-router = APIRouter(prefix="/api/audio", tags=["audio"])
+"""音频文件服务：以静态文件方式提供 TTS 音频和预览音频的访问
+
+示例:
+    /api/audio/data/audio/preview/zh-CN-XiaoxiaoNeural.mp3
+    /api/audio/data/audio/preview_volcano/zh_female_sajiaonvyou_moon_bigtts.mp3
+    /api/audio/data/audio/tts/story_123_0_zh-CN-XiaoxiaoNeural.mp3
+    /api/audio/data/audio/volcano_tts/story_123_0_BV700_V2.mp3
+"""
+import os
+
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from starlette.responses import Response
+from starlette.types import Scope
+from app.utils.paths import (
+    AUDIO_DIR,
+    PREVIEW_AUDIO_DIR,
+    TTS_AUDIO_DIR,
+    VOLCANO_PREVIEW_AUDIO_DIR,
+    VOLCANO_TTS_AUDIO_DIR,
+)
 
 # 音频文件根目录
 AUDIO_BASE_DIR = AUDIO_DIR
+AUDIO_URL_PREFIX = "/api/audio/data/audio"
 
+# 对外开放的子目录 -> 磁盘目录（只挂载这些目录，其余音频数据不可访问）
+AUDIO_MOUNTS = (
+    ("preview", str(PREVIEW_AUDIO_DIR)),
+    ("preview_volcano", str(VOLCANO_PREVIEW_AUDIO_DIR)),
+    ("tts", str(TTS_AUDIO_DIR)),
+    ("volcano_tts", str(VOLCANO_TTS_AUDIO_DIR)),
+)
+AUDIO_SUBDIRS = tuple(subdir for subdir, _ in AUDIO_MOUNTS)
 
-@router.get("/data/audio/preview/{filename}")
-async def get_preview_audio(filename: str):
-    """
-    获取预览音频文件
-    
-    示例: /api/audio/data/audio/preview/zh-CN-XiaoxiaoNeural.mp3
-    """
-    # 安全检查：防止路径遍历攻击
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="无效的文件名")
-    
-    file_path = AUDIO_BASE_DIR / "preview" / filename
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="音频文件不存在")
-    
-    return FileResponse(
-        path=str(file_path),
-        media_type="audio/mpeg",
-        filename=filename,
-    )
-
-
-@router.get("/data/audio/preview_volcano/{filename}")
-async def get_preview_audio_volcano(filename: str):
-    """
-    获取线上 TTS 预览音频文件
-
-    示例: /api/audio/data/audio/preview_volcano/zh_female_sajiaonvyou_moon_bigtts.mp3
-    """
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="无效的文件名")
-
-    file_path = AUDIO_BASE_DIR / "preview_volcano" / filename
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="音频文件不存在")
-
-    return FileResponse(
-        path=str(file_path),
-        media_type="audio/mpeg",
-        filename=filename,
-    )
+# 音频文件按 故事/段落/音色 命名，生成后内容不变，允许浏览器缓存一天
+AUDIO_CACHE_CONTROL = "public, max-age=86400"
 
 
-@router.get("/data/audio/tts/{filename}")
-async def get_tts_audio(filename: str):
+class AudioStaticFiles(StaticFiles):
     """
-    获取 edge-tts 音频文件
-
-    示例: /api/audio/data/audio/tts/story_123_0_zh-CN-XiaoxiaoNeural.mp3
+    在 StaticFiles 的基础上补充 Cache-Control。
+    ETag / Last-Modified 由 Starlette 根据 stat 结果生成，If-None-Match 命中时直接返回 304，不读取文件内容。
     """
-    # 安全检查：防止路径遍历攻击
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="无效的文件名")
-
-    file_path = AUDIO_BASE_DIR / "tts" / filename
-
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="音频文件不存在")
 
-    return FileResponse(
-        path=str(file_path),
-        media_type="audio/mpeg",
-        filename=filename,
-    )
+    def file_response(
+        self,
+        full_path: "os.PathLike[str] | str",
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["cache-control"] = AUDIO_CACHE_CONTROL
+        return response
 
 
-@router.get("/data/audio/volcano_tts/{filename}")
-async def get_volcano_tts_audio(filename: str):
+def mount_audio_files(app: FastAPI) -> None:
     """
-    获取火山 TTS 音频文件（付费用户）
-
-    示例: /api/audio/data/audio/volcano_tts/story_123_0_BV700_V2.mp3
+    将音频子目录挂载为 AudioStaticFiles。
+    由 Starlette 直接处理文件响应（含路径遍历检查、Range、ETag），不经过路由处理函数。
     """
-    # 安全检查：防止路径遍历攻击
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="无效的文件名")
-
-    file_path = AUDIO_BASE_DIR / "volcano_tts" / filename
-
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="音频文件不存在")
-
-    return FileResponse(
-        path=str(file_path),
-        media_type="audio/mpeg",
-        filename=filename,
-    )
+    for subdir, directory in AUDIO_MOUNTS:
+        app.mount(
+            f"{AUDIO_URL_PREFIX}/{subdir}",
+            AudioStaticFiles(directory=directory),
+            name=f"audio_{subdir}",
+        )
@@ -1,9 +1,11 @@
 """认证 API：注册、登录、当前用户、升级付费"""
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
-from app.utils.user_store import (
+from app.utils.responses import AppJSONResponse
+from app.utils.user_store_cache import (
     validate_email,
     get_user_by_email,
     verify_user,
@@ -11,10 +13,12 @@ from app.utils.user_store import (
     set_user_paid,
     create_token,
     get_email_by_token,
+    get_user_by_token,
+    peek_user_by_token,
     delete_token,
 )
 
-router = APIRouter(prefix="/api/auth", tags=["auth"])
+router = APIRouter(prefix="/api/auth", tags=["auth"], default_response_class=AppJSONResponse)
 security = HTTPBearer(auto_error=False)
 
 
@@ -28,18 +32,33 @@ class LoginRequest(BaseModel):
     password: str
 
 
-def _get_current_email(credentials: HTTPAuthorizationCredentials | None) -> str | None:
+async def _resolve_user(credentials: HTTPAuthorizationCredentials | None) -> dict | None:
+    """
+    按 token 解析当前用户：先查内存会话缓存（无 IO），未命中时在线程池中读文件，避免阻塞事件循环。
+    返回 None 表示未登录或 token 无效。
+    """
     if not credentials or not credentials.credentials:
         return None
-    return get_email_by_token(credentials.credentials)
+    token = credentials.credentials
+    user = peek_user_by_token(token)
+    if user is None:
+        user = await run_in_threadpool(get_user_by_token, token)
+    return user
+
+
+def _extract_bearer(request: Request) -> str:
+    """直接从请求头读取 Bearer token（不经过 HTTPBearer 依赖），无则返回空串。"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return ""
+    return token.strip()
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials | None = Depends(security)):
     """依赖：要求已登录，返回用户信息 dict。"""
-    email = _get_current_email(credentials)
-    if not email:
+    if not credentials or not credentials.credentials:
         raise HTTPException(status_code=401, detail="请先登录")
-    user = get_user_by_email(email)
+    user = await _resolve_user(credentials)
     if not user:
         raise HTTPException(status_code=401, detail="登录已失效，请重新登录")
     return user
@@ -47,11 +66,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials | None = De
 
 async def get_current_user_optional(credentials: HTTPAuthorizationCredentials | None = Depends(security)):
     """依赖：可选登录，如果已登录返回用户信息 dict，未登录返回 None。"""
-    email = _get_current_email(credentials)
-    if not email:
-        return None
-    user = get_user_by_email(email)
-    return user
+    return await _resolve_user(credentials)
 
 
 @router.post("/register")
@@ -88,9 +103,10 @@ async def login(body: LoginRequest):
 
 
 @router.get("/me")
-async def me(credentials: HTTPAuthorizationCredentials | None = Depends(security)):
+async def me(request: Request):
     """获取当前登录用户信息。未登录返回 401。"""
-    email = _get_current_email(credentials)
+    token = _extract_bearer(request)
+    email = get_email_by_token(token) if token else None
     if not email:
         raise HTTPException(status_code=401, detail="未登录")
     user = get_user_by_email(email)
@@ -100,10 +116,11 @@ async def me(credentials: HTTPAuthorizationCredentials | None = Depends(security
 
 
 @router.post("/logout")
-async def logout(credentials: HTTPAuthorizationCredentials | None = Depends(security)):
+async def logout(request: Request):
     """登出：使当前 token 失效。"""
-    if credentials and credentials.credentials:
-        delete_token(credentials.credentials)
+    token = _extract_bearer(request)
+    if token:
+        delete_token(token)
     return {"ok": True}
 
 
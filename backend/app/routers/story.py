@@ -1,8 +1,15 @@
 """故事 API：开始故事、获取当前段、下一页、互动、画廊列表、预加载"""
 import asyncio
+import hashlib
 import logging
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
+import os
+from functools import lru_cache
+
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, field_validator
 from app.models.story import InteractRequest
 from app.routers.auth import get_current_user_optional
 from app.constants.voices import get_default_voice_id, normalize_voice_for_user
@@ -14,29 +21,55 @@ from app.services.story_engine import (
     handle_interaction,
     preload_segment_image,
 )
-from app.services.tts_service import HAS_EDGE_TTS
-from app.services.tts_generation_service import generate_segment_tts
+from app.services.llm_service import LLMOutputError
+from app.services.tts_service import HAS_EDGE_TTS, get_tts_audio_path as get_edge_audio_path
+from app.services.tts_generation_service import (
+    generate_segment_tts,
+    generate_segments_tts_batch,
+    get_cached_segment_tts,
+    stream_segment_tts,
+)
 from app.services.volcano_tts_service import is_volcano_tts_available
 from app.services.video_service import generate_video_clip_between_segments
+from app.services import prefetch_queue
 from app.utils.store import list_stories
 from app.constants.story_styles import DEFAULT_STYLE_ID, get_all_styles
 from app.utils.url_utils import normalize_image_url
+from app.utils.paths import BACKEND_ROOT
+from app.utils.service_tier import is_premium_user
+from app.utils.responses import AppJSONResponse, etag_matches
+from app.routers._story_serde import serialize_segments, progress_dict, state_to_dict, state_response
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/story", tags=["story"])
+router = APIRouter(prefix="/api/story", tags=["story"], default_response_class=AppJSONResponse)
 
+# 朗读时向后预取的段落数
+AUDIO_PREFETCH_WINDOW = 3
+# 新故事开始时预生成 TTS 的段落数（含首段）
+INITIAL_TTS_BATCH_SIZE = 3
 
-def _serialize_segment(seg):
-    if not seg:
-        return None
-    data = seg.model_dump()
-    data["image_url"] = normalize_image_url(data.get("image_url"))
-    return data
 
+def _compute_etag(key: tuple) -> str:
+    return '"' + hashlib.blake2b(repr(key).encode("utf-8"), digest_size=8).hexdigest() + '"'
 
-def _serialize_segments(segments):
-    return [_serialize_segment(s) for s in segments]
+
+def _conditional_json(request: Request, key: tuple, build_content) -> Response:
+    """
+    轮询接口的条件响应：内容未变化（ETag 命中）时返回 304 空响应，不再构建和序列化响应体。
+    build_content 仅在需要完整响应时调用。
+    """
+    etag = _compute_etag(key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    # 内容已是纯 dict，直接编码，跳过 jsonable_encoder 的逐层遍历
+    return AppJSONResponse(content=build_content(), headers=headers)
+
+
+def _story_etag_key(state) -> tuple:
+    """GET /{story_id} 响应的版本：故事的每次写入（翻页、状态、续写、配图、互动回答等）都会递增 revision"""
+    return (state.id, state.revision)
 
 
 def _kickoff_premium_video_pregen(story_id: str, state, current_user: dict | None) -> None:
@@ -62,7 +95,8 @@ def _kickoff_premium_video_pregen(story_id: str, state, current_user: dict | Non
 
 def _kickoff_initial_tts_pregen(story_id: str, state, current_user: dict | None) -> None:
     """
-    故事文本生成后，首段 TTS 与图片生成并行进行，避免“先图后音”的串行体验。
+    故事文本生成后，首段 TTS 与图片生成并行进行，避免“先图后音”的串行体验；
+    随后几段合并为一个批量任务放入预取队列，按顺序生成。
     """
     seg, _ = get_current_segment(state)
     if not seg:
@@ -90,13 +124,77 @@ def _kickoff_initial_tts_pregen(story_id: str, state, current_user: dict | None)
         )
     )
 
+    following = [
+        (i, (state.segments[i].text or "").strip())
+        for i in range(state.current_index + 1, min(state.current_index + INITIAL_TTS_BATCH_SIZE, len(state.segments)))
+    ]
+    following = [(i, t) for i, t in following if t]
+    if following:
+        prefetch_queue.submit(
+            "tts_batch",
+            (is_premium, story_id, default_voice),
+            lambda: generate_segments_tts_batch(
+                story_id=story_id,
+                items=following,
+                voice_id=default_voice,
+                speed=1.0,
+                user=current_user,
+            ),
+            priority=1,
+        )
+
+
+def _prefetch_following_segments(
+    story_id: str,
+    state,
+    segment_index: int,
+    voice_id: str,
+    speed: float,
+    current_user: dict | None,
+) -> None:
+    is_paid = bool(current_user and current_user.get("is_paid"))
+    last_index = min(segment_index + AUDIO_PREFETCH_WINDOW, len(state.segments) - 1)
+    for next_index in range(segment_index + 1, last_index + 1):
+        next_seg = state.segments[next_index]
+        priority = next_index - segment_index
+        next_text = (next_seg.text or "").strip()
+        if next_text:
+            prefetch_queue.submit(
+                "tts",
+                (is_paid, story_id, next_index, voice_id),
+                lambda i=next_index, t=next_text: generate_segment_tts(
+                    story_id=story_id,
+                    segment_index=i,
+                    text=t,
+                    voice_id=voice_id,
+                    speed=speed,
+                    user=current_user,
+                ),
+                priority=priority,
+            )
+        if not next_seg.image_url:
+            prefetch_queue.submit(
+                "image",
+                (story_id, next_index),
+                lambda i=next_index: preload_segment_image(story_id, i, user=current_user),
+                priority=priority,
+            )
+
 
 class StartStoryRequest(BaseModel):
-    """开始故事请求，主题与页数可选。"""
+    """开始故事请求，主题与页数可选。字符串字段自动去除首尾空白。"""
+    model_config = ConfigDict(frozen=True, extra="ignore", str_strip_whitespace=True)
+
     theme: str | None = None  # 如 "龟兔赛跑"；空或省略则随机故事
     total_pages: int | None = None  # 指定则生成固定页数；3–4 页无互动，5 页及以上带互动
     style_id: str | None = None  # 故事风格ID，如 "q_cute"、"watercolor_healing" 等
 
+    @field_validator("theme")
+    @classmethod
+    def _empty_theme_to_none(cls, v: str | None) -> str | None:
+        # 空白主题视为随机故事
+        return v or None
+
 
 @router.post("/start")
 async def start(
@@ -105,34 +203,18 @@ async def start(
 ):
     """开始一个新故事（可选登录）。可传 theme 指定主题、total_pages 指定页数、style_id 指定风格。
     付费用户使用官方 API，免费用户和未登录用户使用本地服务。"""
-    theme = None
-    if body and body.theme and isinstance(body.theme, str):
-        t = body.theme.strip()
-        theme = t if t else None
-    total_pages = getattr(body, "total_pages", None) if body else None
+    if body is None:
+        body = StartStoryRequest()
+    theme = body.theme
+    total_pages = body.total_pages
     if total_pages is not None and (total_pages < 3 or total_pages > 7):
         raise HTTPException(status_code=400, detail="页数至少 3 页、最多 7 页")
-    style_id = getattr(body, "style_id", None) if body else None
-    if style_id is None:
-        style_id = DEFAULT_STYLE_ID
+    style_id = body.style_id if body.style_id is not None else DEFAULT_STYLE_ID
     no_interaction = total_pages is not None and 3 <= total_pages < 5
     try:
         state = await start_new_story(user_theme=theme, total_pages=total_pages, no_interaction=no_interaction, style_id=style_id, user=current_user)
-        seg, has_interaction = get_current_segment(state)
         _kickoff_initial_tts_pregen(state.id, state, current_user)
-        return {
-            "story_id": state.id,
-            "title": state.title,
-            "theme": state.theme,
-            "characters": [c.model_dump() for c in state.characters],
-            "setting": state.setting.model_dump(),
-            "total_segments": len(state.segments),
-            "current_index": state.current_index,
-            "current_segment": _serialize_segment(seg),
-            "has_interaction": has_interaction,
-            "status": state.status,
-            "style_id": getattr(state, "style_id", DEFAULT_STYLE_ID),
-        }
+        return state_response(state)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -140,39 +222,32 @@ async def start(
 @router.get("/list")
 async def list_stories_api():
     """获取所有故事摘要，用于主页画廊展示（按创建时间倒序）。"""
-    stories = list_stories()
-    for item in stories:
-        item["cover_url"] = normalize_image_url(item.get("cover_url"))
-    return {"stories": stories}
+    # list_stories 已做 cover_url 规范化并带版本缓存；允许浏览器短暂复用
+    return AppJSONResponse(
+        content={"stories": list_stories()},
+        headers={"Cache-Control": "max-age=2, stale-while-revalidate=10"},
+    )
+
+
+# 风格列表在进程内不变，首次请求时编码一次
+@lru_cache(maxsize=1)
+def _styles_payload() -> bytes:
+    return orjson.dumps({"styles": get_all_styles()})
 
 
 @router.get("/styles")
 async def list_story_styles():
     """获取所有可用的故事风格列表。"""
-    return {"styles": get_all_styles()}
+    return Response(content=_styles_payload(), media_type="application/json")
 
 
 @router.get("/{story_id}")
-async def get_story_state(story_id: str):
-    """获取故事状态与当前段。用于前端轮询检查图片是否生成完成。"""
+async def get_story_state(story_id: str, request: Request):
+    """获取故事状态与当前段。用于前端轮询检查图片是否生成完成（支持 If-None-Match，未变化返回 304）。"""
     state = get_story(story_id)
     if not state:
         raise HTTPException(status_code=404, detail="故事不存在")
-    seg, has_interaction = get_current_segment(state)
-    return {
-        "story_id": state.id,
-        "title": state.title,
-        "theme": state.theme,
-        "characters": [c.model_dump() for c in state.characters],
-        "setting": state.setting.model_dump(),
-        "segments": _serialize_segments(state.segments),
-        "total_segments": len(state.segments),
-        "current_index": state.current_index,
-        "current_segment": _serialize_segment(seg),
-        "has_interaction": has_interaction,
-        "status": state.status,
-        "style_id": getattr(state, "style_id", DEFAULT_STYLE_ID),
-    }
+    return _conditional_json(request, _story_etag_key(state), lambda: state_to_dict(state, include_all_segments=True))
 
 
 @router.post("/{story_id}/preload-segment/{segment_index}")
@@ -185,13 +260,18 @@ async def preload_segment(story_id: str, segment_index: int, current_user: dict
         raise HTTPException(status_code=400, detail="段落索引无效")
     if state.segments[segment_index].image_url:
         return {"ok": True, "preloading": False, "reason": "已有图片"}
-    asyncio.create_task(preload_segment_image(story_id, segment_index, user=current_user))
-    return {"ok": True, "preloading": True}
+    # 交给有界预取队列；同一段落已在排队/生成中时不重复提交
+    queued = prefetch_queue.submit(
+        "image",
+        (story_id, segment_index),
+        lambda: preload_segment_image(story_id, segment_index, user=current_user),
+    )
+    return {"ok": True, "preloading": queued}
 
 
 @router.get("/{story_id}/segment/{segment_index}/image")
-async def get_segment_image(story_id: str, segment_index: int):
-    """获取指定段落的图片 URL（用于轮询检查）。"""
+async def get_segment_image(story_id: str, segment_index: int, request: Request):
+    """获取指定段落的图片 URL（用于轮询检查，支持 If-None-Match，未变化返回 304）。"""
     state = get_story(story_id)
     if not state:
         raise HTTPException(status_code=404, detail="故事不存在")
@@ -199,24 +279,27 @@ async def get_segment_image(story_id: str, segment_index: int):
         raise HTTPException(status_code=404, detail="段落不存在")
     
     seg = state.segments[segment_index]
-    return {
-        "story_id": story_id,
-        "segment_index": segment_index,
-        "image_url": normalize_image_url(seg.image_url),
-        "has_image": seg.image_url is not None,
-    }
+    image_url = seg.image_url
+    return _conditional_json(
+        request,
+        (story_id, segment_index, image_url),
+        lambda: {
+            "story_id": story_id,
+            "segment_index": segment_index,
+            "image_url": normalize_image_url(image_url),
+            "has_image": image_url is not None,
+        },
+    )
 
 
-@router.get("/{story_id}/segment/{segment_index}/audio")
-async def get_segment_audio(
+def _resolve_segment_tts_request(
     story_id: str,
     segment_index: int,
-    voice_id: str | None = None,
-    speed: float = 1.0,
-    current_user: dict = Depends(get_current_user_optional),
+    voice_id: str | None,
+    speed: float,
+    current_user: dict | None,
 ):
-    """获取或生成指定段落的 TTS 音频，用于前端朗读。
-    付费用户使用火山 TTS API，免费用户和未登录用户使用 edge-tts。"""
+    """校验段落朗读请求，返回 (state, 文本, 音色, 倍速)；不合法时抛 HTTPException。"""
     is_premium = bool(current_user and current_user.get("is_paid"))
     if is_premium:
         if not is_volcano_tts_available():
@@ -246,9 +329,24 @@ async def get_segment_audio(
     # voice 校验；无效则回退默认
     requested_voice_id = (voice_id or "").strip() or get_default_voice_id(current_user)
     vid = normalize_voice_for_user(requested_voice_id, current_user)
+    return state, text, vid, speed
+
+
+@router.get("/{story_id}/segment/{segment_index}/audio")
+async def get_segment_audio(
+    story_id: str,
+    segment_index: int,
+    voice_id: str | None = None,
+    speed: float = 1.0,
+    current_user: dict = Depends(get_current_user_optional),
+):
+    """获取或生成指定段落的 TTS 音频，用于前端朗读。
+    付费用户使用火山 TTS API，免费用户和未登录用户使用 edge-tts。"""
+    state, text, vid, speed = _resolve_segment_tts_request(story_id, segment_index, voice_id, speed, current_user)
 
     try:
-        audio_path = await generate_segment_tts(
+        # 已生成过的音频直接返回，不进入生成流程
+        audio_path = get_cached_segment_tts(story_id, segment_index, vid, current_user) or await generate_segment_tts(
             story_id=story_id,
             segment_index=segment_index,
             text=text,
@@ -257,22 +355,8 @@ async def get_segment_audio(
             user=current_user,
         )
 
-        # 异步预生成「下一段」音频，减少用户翻页后的等待时间
-        next_index = segment_index + 1
-        if next_index < len(state.segments):
-            next_seg = state.segments[next_index]
-            next_text = (next_seg.text or "").strip()
-            if next_text:
-                asyncio.create_task(
-                    generate_segment_tts(
-                        story_id=story_id,
-                        segment_index=next_index,
-                        text=next_text,
-                        voice_id=vid,
-                        speed=speed,
-                        user=current_user,
-                    )
-                )
+        # 异步预生成后面几段的音频（及缺失的插画），离当前页越近优先级越高，减少用户翻页后的等待时间
+        _prefetch_following_segments(story_id, state, segment_index, vid, speed, current_user)
 
         return {
             "story_id": story_id,
@@ -284,7 +368,8 @@ async def get_segment_audio(
         }
     except Exception as e:
         logger.error(
-            f"[API] 段落音频生成失败: story_id={story_id}, segment_index={segment_index}, voice={vid}, speed={speed}, error={e}",
+            "[API] 段落音频生成失败: story_id=%s, segment_index=%s, voice=%s, speed=%s, error=%s",
+            story_id, segment_index, vid, speed, e,
             exc_info=True,
         )
         raise HTTPException(status_code=500, detail="段落音频生成失败")
@@ -297,59 +382,98 @@ async def next_segment(story_id: str, current_user: dict = Depends(get_current_u
     if not state:
         raise HTTPException(status_code=404, detail="故事不存在或已结束")
     _kickoff_premium_video_pregen(story_id, state, current_user)
-    seg, has_interaction = get_current_segment(state)
-    return {
-        "story_id": state.id,
-        "current_index": state.current_index,
-        "current_segment": _serialize_segment(seg),
-        "has_interaction": has_interaction,
-        "status": state.status,
-    }
+    return state_response(state, summary_only=True)
 
 
 @router.post("/interact")
 async def interact(req: InteractRequest, current_user: dict = Depends(get_current_user_optional)):
     """提交互动回答，返回反馈与续写段落（含图片）。"""
-    logger.info(f"[API] POST /interact - story_id={req.story_id}, segment_index={req.segment_index}")
+    logger.info("[API] POST /interact - story_id=%s, segment_index=%s", req.story_id, req.segment_index)
     try:
         continuation = await handle_interaction(req, user=current_user)
         state = get_story(req.story_id)
         if not state:
-            logger.error(f"[API] ❌ 故事不存在: {req.story_id}")
+            logger.error("[API] ❌ 故事不存在: %s", req.story_id)
             raise HTTPException(status_code=404, detail="故事不存在")
         _kickoff_premium_video_pregen(req.story_id, state, current_user)
         
-        seg, has_interaction = get_current_segment(state)
-        
         # 记录返回的数据
         response_data = {
             "feedback": continuation.feedback,
-            "new_segments": _serialize_segments(continuation.segments),
-            "current_index": state.current_index,
-            "current_segment": _serialize_segment(seg),
-            "has_interaction": has_interaction,
-            "status": state.status,
+            "new_segments": serialize_segments(continuation.segments),
+            **progress_dict(state),
         }
         
-        # 检查图片 URL
-        if seg and not seg.image_url:
-            logger.warning(f"[API] ⚠️ 当前段落没有图片 URL: segment_index={state.current_index}")
-        if continuation.segments:
+        # 检查图片 URL（仅用于日志，WARNING 级别关闭时跳过扫描）
+        if logger.isEnabledFor(logging.WARNING):
+            if response_data["current_segment"] and not response_data["current_segment"]["image_url"]:
+                logger.warning("[API] ⚠️ 当前段落没有图片 URL: segment_index=%s", state.current_index)
             missing_images = [i for i, s in enumerate(continuation.segments) if not s.image_url]
             if missing_images:
-                logger.warning(f"[API] ⚠️ 续写段落中缺少图片: 索引 {missing_images}")
+                logger.warning("[API] ⚠️ 续写段落中缺少图片: 索引 %s", missing_images)
         
-        logger.info(f"[API] ✅ 互动处理成功，返回 {len(continuation.segments)} 个新段落")
+        logger.info("[API] ✅ 互动处理成功，返回 %s 个新段落", len(continuation.segments))
         return response_data
         
+    except LLMOutputError as e:
+        # 模型多次重试后仍未返回可解析的 JSON：属于上游错误，提示用户稍后重试
+        logger.error("[API] ❌ LLM 返回格式错误: %s", e)
+        raise HTTPException(status_code=502, detail="LLM 返回格式错误，请稍后重试")
     except ValueError as e:
-        logger.error(f"[API] ❌ 参数错误: {e}")
-        # JSON 解析错误通常是 ValueError，提供更友好的错误信息
-        error_msg = str(e)
-        if "JSON" in error_msg or "delimiter" in error_msg or "Expecting" in error_msg:
-            error_msg = "LLM 返回格式错误，已使用默认内容继续故事"
-            logger.warning(f"[API] ⚠️ JSON 解析错误，但已处理: {e}")
-        raise HTTPException(status_code=400, detail=error_msg)
+        logger.error("[API] ❌ 参数错误: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"[API] ❌ 服务器错误: {type(e).__name__}: {e}", exc_info=True)
+        logger.error("[API] ❌ 服务器错误: %s: %s", type(e).__name__, e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+@router.get("/{story_id}/segment/{segment_index}/audio/stream")
+async def stream_segment_audio(
+    story_id: str,
+    segment_index: int,
+    voice_id: str | None = None,
+    speed: float = 1.0,
+    current_user: dict = Depends(get_current_user_optional),
+):
+    """直接返回段落音频（audio/mpeg）。已有缓存时返回文件；
+    免费用户未命中缓存时边合成边推送，首个音频块即可开始播放，合成完成后写入缓存。"""
+    state, text, vid, speed = _resolve_segment_tts_request(story_id, segment_index, voice_id, speed, current_user)
+    _prefetch_following_segments(story_id, state, segment_index, vid, speed, current_user)
+
+    if not is_premium_user(current_user):
+        cache_path = get_edge_audio_path(story_id, segment_index, vid)
+        stat_result = await run_in_threadpool(_stat_or_none, cache_path)
+        if stat_result and stat_result.st_size > 0:
+            return FileResponse(cache_path, stat_result=stat_result, media_type="audio/mpeg")
+        chunks = stream_segment_tts(story_id, segment_index, text, vid, current_user)
+        if chunks is not None:
+            logger.info("[API] 流式朗读: story_id=%s, segment_index=%s, voice=%s", story_id, segment_index, vid)
+            return StreamingResponse(chunks, media_type="audio/mpeg")
+
+    # 火山 TTS 无流式接口（免费用户则是已有非流式生成在进行）：生成完成后直接返回文件，省去前端二次请求
+    try:
+        audio_path = await generate_segment_tts(
+            story_id=story_id,
+            segment_index=segment_index,
+            text=text,
+            voice_id=vid,
+            speed=speed,
+            user=current_user,
+        )
+    except Exception as e:
+        logger.error(
+            "[API] 段落音频生成失败: story_id=%s, segment_index=%s, voice=%s, error=%s",
+            story_id, segment_index, vid, e,
+            exc_info=True,
+        )
+        raise HTTPException(status_code=500, detail="段落音频生成失败")
+    file_path = BACKEND_ROOT / audio_path
+    stat_result = await run_in_threadpool(os.stat, file_path)
+    return FileResponse(file_path, stat_result=stat_result, media_type="audio/mpeg")
@@ -1,21 +1,29 @@
 """视频生成相关 API"""
 import logging
+import os
+
+import orjson
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 from app.routers.auth import get_current_user_optional
 from app.services.video_service import (
     generate_story_video,
     get_video_generation_status,
+    watch_video_generation_status,
     VideoGenerationStatus,
 )
 from app.utils.store import get_story
+from app.utils.responses import AppJSONResponse
 
-router = APIRouter(prefix="/api/video", tags=["video"])
+router = APIRouter(prefix="/api/video", tags=["video"], default_response_class=AppJSONResponse)
 logger = logging.getLogger(__name__)
 
 
 class GenerateVideoRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore", str_strip_whitespace=True)
+
     story_id: str
     enable_audio: bool = True  # 默认开启音频（使用 TTS 缓存）
 
@@ -42,24 +50,24 @@ async def generate_video(
     - **story_id**: 故事 ID
     - **enable_audio**: 是否启用音频（需要 TTS 支持）
     """
-    logger.info(f"[视频 API] 收到生成视频请求: story_id={req.story_id}, enable_audio={req.enable_audio}")
+    logger.info("[视频 API] 收到生成视频请求: story_id=%s, enable_audio=%s", req.story_id, req.enable_audio)
     
     # 检查故事是否存在
     state = get_story(req.story_id)
     if not state:
-        logger.error(f"[视频 API] ❌ 故事不存在: {req.story_id}")
+        logger.error("[视频 API] ❌ 故事不存在: %s", req.story_id)
         raise HTTPException(status_code=404, detail="故事不存在")
     
     # 检查是否有足够的段落
     if len(state.segments) < 2:
-        logger.error(f"[视频 API] ❌ 故事段落不足: {len(state.segments)}")
+        logger.error("[视频 API] ❌ 故事段落不足: %s", len(state.segments))
         raise HTTPException(status_code=400, detail="故事段落不足，至少需要 2 个段落")
     
-    # 检查所有段落是否都有图片
-    missing_images = [i for i, seg in enumerate(state.segments) if not seg.image_url]
-    if missing_images:
-        logger.warning(f"[视频 API] ⚠️ 部分段落缺少图片: {missing_images}")
-        # 继续处理，跳过没有图片的段落
+    # 检查所有段落是否都有图片（仅用于日志，缺图段落由后台任务跳过）
+    if logger.isEnabledFor(logging.WARNING):
+        missing_images = [i for i, seg in enumerate(state.segments) if not seg.image_url]
+        if missing_images:
+            logger.warning("[视频 API] ⚠️ 部分段落缺少图片: %s", missing_images)
     
     # 启动后台任务
     background_tasks.add_task(
@@ -69,10 +77,9 @@ async def generate_video(
         title=state.title,
         enable_audio=req.enable_audio,
         user=current_user,
-        prebuilt_clips=dict(state.video_clips or {}),
     )
     
-    logger.info(f"[视频 API] ✅ 视频生成任务已启动: {req.story_id}")
+    logger.info("[视频 API] ✅ 视频生成任务已启动: %s", req.story_id)
     
     return {
         "message": "视频生成任务已启动",
@@ -88,11 +95,11 @@ async def get_video_status(story_id: str) -> VideoStatusResponse:
     
     - **story_id**: 故事 ID
     """
-    logger.info(f"[视频 API] 查询视频生成状态: story_id={story_id}（故事ID，非即梦task_id）")
+    logger.info("[视频 API] 查询视频生成状态: story_id=%s（故事ID，非即梦task_id）", story_id)
     
     status = get_video_generation_status(story_id)
     if not status:
-        logger.info(f"[视频 API] 未找到视频生成任务: {story_id}")
+        logger.info("[视频 API] 未找到视频生成任务: %s", story_id)
         return VideoStatusResponse(
             story_id=story_id,
             status=VideoGenerationStatus.IDLE,
@@ -114,6 +121,43 @@ async def get_video_status(story_id: str) -> VideoStatusResponse:
     )
 
 
+def _idle_status(story_id: str) -> dict:
+    return {
+        "story_id": story_id,
+        "status": VideoGenerationStatus.IDLE,
+        "progress": 0,
+        "total_clips": 0,
+        "generated_clips": 0,
+        "video_url": None,
+        "error": None,
+    }
+
+
+@router.get("/status-stream/{story_id}")
+async def stream_video_status(story_id: str):
+    """
+    以 SSE（text/event-stream）推送视频生成状态，替代前端定时轮询 /status
+    
+    - **story_id**: 故事 ID
+    - 每次状态变化推送一条 `data: {...}`，完成或失败后关闭连接；没有生成任务时推送 idle，一个心跳周期内仍无任务则关闭
+    """
+    logger.info("[视频 API] 订阅视频生成状态: story_id=%s", story_id)
+    if not get_story(story_id):
+        logger.error("[视频 API] ❌ 故事不存在: %s", story_id)
+        raise HTTPException(status_code=404, detail="故事不存在")
+
+    async def events():
+        async for status in watch_video_generation_status(story_id):
+            payload = orjson.dumps(status or _idle_status(story_id))
+            yield b"data: " + payload + b"\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/download/{story_id}")
 async def download_video(story_id: str):
     """
@@ -121,26 +165,34 @@ async def download_video(story_id: str):
     
     - **story_id**: 故事 ID
     """
-    logger.info(f"[视频 API] 下载视频请求: {story_id}")
+    logger.info("[视频 API] 下载视频请求: %s", story_id)
     
     status = get_video_generation_status(story_id)
     if not status or status["status"] != VideoGenerationStatus.COMPLETED:
-        logger.error(f"[视频 API] ❌ 视频未生成或生成中: {story_id}")
+        logger.error("[视频 API] ❌ 视频未生成或生成中: %s", story_id)
         raise HTTPException(status_code=404, detail="视频未生成或生成中")
     
     video_path = status["video_url"]
     if not video_path:
-        logger.error(f"[视频 API] ❌ 视频文件路径为空: {story_id}")
+        logger.error("[视频 API] ❌ 视频文件路径为空: %s", story_id)
         raise HTTPException(status_code=404, detail="视频文件不存在")
     
-    logger.info(f"[视频 API] ✅ 返回视频文件: {video_path}")
+    # stat 与读取故事（可能需要读盘）放到线程池，避免并发下载时阻塞事件循环
+    try:
+        stat_result = await run_in_threadpool(os.stat, video_path)
+    except FileNotFoundError:
+        logger.error("[视频 API] ❌ 视频文件不存在: %s", video_path)
+        raise HTTPException(status_code=404, detail="视频文件不存在")
+    
+    logger.info("[视频 API] ✅ 返回视频文件: %s", video_path)
     
     # 获取故事标题作为文件名
-    state = get_story(story_id)
+    state = await run_in_threadpool(get_story, story_id)
     filename = f"{state.title if state else story_id}_故事视频.mp4"
     
     return FileResponse(
         path=video_path,
+        stat_result=stat_result,
         media_type="video/mp4",
         filename=filename,
     )
@@ -153,11 +205,11 @@ async def get_video_clips(story_id: str):
     
     - **story_id**: 故事 ID
     """
-    logger.info(f"[视频 API] 查询视频片段: {story_id}")
+    logger.info("[视频 API] 查询视频片段: %s", story_id)
     
     state = get_story(story_id)
     if not state:
-        logger.error(f"[视频 API] ❌ 故事不存在: {story_id}")
+        logger.error("[视频 API] ❌ 故事不存在: %s", story_id)
         raise HTTPException(status_code=404, detail="故事不存在")
     
     return {
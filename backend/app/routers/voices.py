@@ -1,6 +1,11 @@
 """音色 API：音色列表、试听、用户偏好设置"""
+import hashlib
 import logging
-from fastapi import APIRouter, HTTPException, Depends
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 
 from app.constants.voices import (
@@ -20,36 +25,83 @@ from app.services.volcano_tts_service import (
 )
 from app.routers.auth import get_current_user_optional
 from app.utils.service_tier import is_premium_user
-from app.utils.user_store import get_user_by_email, update_user_preferences
+from app.utils.user_store_cache import queue_user_preferences
+from app.utils.paths import BACKEND_ROOT
+from app.utils.responses import AppJSONResponse, etag_matches
+from app.utils.singleflight import run_once
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/voices", tags=["voices"])
+router = APIRouter(prefix="/api/voices", tags=["voices"], default_response_class=AppJSONResponse)
 
+# 试听文案按音色固定，生成过的预览音频 URL 常驻内存（键为已校验的音色 ID，条目数不超过音色总数）：
+# 再次试听时只确认文件仍在，不再进入生成函数；文件被删除时丢弃条目并重新生成
+_preview_paths: dict[str, tuple[str, Path]] = {}
+# 进行中的预览生成：voice_id -> Task，同一音色的并发首次试听共享同一次合成
+_preview_inflight: dict = {}
+
+
+# 音色列表只取决于用户等级（及进程启动时即确定的 TTS 配置），浏览器可缓存 5 分钟；
+# 响应随登录态（Authorization）不同而不同，只允许浏览器私有缓存
+VOICE_LIST_CACHE_CONTROL = "private, max-age=300"
+
+
+def _with_etag(body: bytes) -> tuple[bytes, str]:
+    return body, '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
 
-@router.get("/list")
-async def list_voices(current_user: dict = Depends(get_current_user_optional)):
-    """按当前用户等级返回可用音色列表。"""
-    premium = is_premium_user(current_user)
-    voices = get_available_voices(current_user)
-    default_voice_id = get_default_voice_id(current_user)
-    tts_available = is_volcano_tts_available() if premium else HAS_EDGE_TTS
 
-    return {
-        "voices": voices,
-        "default_voice_id": default_voice_id,
-        "tts_available": tts_available,
+# 按等级缓存编码后的响应体及其 ETag
+@lru_cache(maxsize=2)
+def _voice_list_payload(premium: bool) -> tuple[bytes, str]:
+    tier_user = {"is_paid": premium}
+    return _with_etag(orjson.dumps({
+        "voices": [v.to_dict() for v in get_available_voices(tier_user)],
+        "default_voice_id": get_default_voice_id(tier_user),
+        "tts_available": is_volcano_tts_available() if premium else HAS_EDGE_TTS,
         "tier": "premium" if premium else "free",
-    }
+    }))
+
+
+@lru_cache(maxsize=2)
+def _recommended_payload(premium: bool) -> tuple[bytes, str]:
+    tier_user = {"is_paid": premium}
+    return _with_etag(orjson.dumps({
+        "voices": [v.to_dict() for v in get_recommended_voices(tier_user)],
+        "default_voice_id": get_default_voice_id(tier_user),
+    }))
+
+
+def _cached_json(request: Request, payload: tuple[bytes, str]) -> Response:
+    """返回预编码的响应体；If-None-Match 命中时返回 304 空响应。"""
+    body, etag = payload
+    headers = {"ETag": etag, "Cache-Control": VOICE_LIST_CACHE_CONTROL, "Vary": "Authorization"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def get_voice_tier(current_user: dict = Depends(get_current_user_optional)) -> bool:
+    """依赖：当前请求是否按付费等级提供音色（每个请求只解析一次）。"""
+    return is_premium_user(current_user)
+
+
+@router.get("/list")
+async def list_voices(request: Request, premium: bool = Depends(get_voice_tier)):
+    """按当前用户等级返回可用音色列表。"""
+    return _cached_json(request, _voice_list_payload(premium))
 
 
 @router.get("/recommended")
-async def get_recommended(current_user: dict = Depends(get_current_user_optional)):
+async def get_recommended(request: Request, premium: bool = Depends(get_voice_tier)):
     """按用户等级返回推荐音色列表（用于首页快速选择）。"""
-    return {
-        "voices": get_recommended_voices(current_user),
-        "default_voice_id": get_default_voice_id(current_user),
-    }
+    return _cached_json(request, _recommended_payload(premium))
+
+
+def _is_nonempty_file(path: Path) -> bool:
+    try:
+        return path.stat().st_size > 0
+    except OSError:
+        return False
 
 
 @router.get("/preview/{voice_id}")
@@ -63,11 +115,22 @@ async def preview_voice(voice_id: str, current_user: dict = Depends(get_current_
     if not voice_info:
         raise HTTPException(status_code=404, detail=f"音色不存在: {voice_id}")
     
+    cached = _preview_paths.get(voice_id)
+    if cached is not None:
+        audio_url, file_path = cached
+        if _is_nonempty_file(file_path):
+            return {
+                "voice_id": voice_id,
+                "audio_url": audio_url,
+                "voice_info": voice_info.to_dict(),
+            }
+        _preview_paths.pop(voice_id, None)
+
     try:
         if is_premium_voice(voice_id):
             if not is_volcano_tts_available():
                 raise HTTPException(status_code=503, detail="线上 TTS 配置不可用")
-            audio_path = await generate_preview_audio_volcano(voice_id)
+            generate = generate_preview_audio_volcano
         else:
             if not HAS_EDGE_TTS:
                 raise HTTPException(
@@ -76,18 +139,21 @@ async def preview_voice(voice_id: str, current_user: dict = Depends(get_current_
                 )
             if not is_free_voice(voice_id):
                 raise HTTPException(status_code=400, detail="该音色不属于免费语音库")
-            audio_path = await generate_preview_audio(voice_id)
+            generate = generate_preview_audio
+        audio_path = await run_once(_preview_inflight, voice_id, lambda: generate(voice_id))
+        audio_url = f"/api/audio/{audio_path}"
+        _preview_paths[voice_id] = (audio_url, BACKEND_ROOT / audio_path)
         
         return {
             "voice_id": voice_id,
-            "audio_url": f"/api/audio/{audio_path}",
-            "voice_info": voice_info,
+            "audio_url": audio_url,
+            "voice_info": voice_info.to_dict(),
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"[API] 音色预览失败: {voice_id}, error: {e}", exc_info=True)
+        logger.error("[API] 音色预览失败: %s, error: %s", voice_id, e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"音色预览失败: {str(e)}")
 
 
@@ -139,9 +205,13 @@ async def save_preferences(
         if body.playback_speed is not None:
             preferences["playback_speed"] = body.playback_speed
         
-        update_user_preferences(email, preferences)
+        # 合并到内存，由后台任务批量落盘（拖动倍速滑块等连续保存只写一次文件）
+        try:
+            queue_user_preferences(email, preferences)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
         
-        logger.info(f"[API] 用户偏好已保存: {email}, {preferences}")
+        logger.info("[API] 用户偏好已登记，等待后台落盘: %s, %s", email, preferences)
         
         return {
             "success": True,
@@ -149,8 +219,10 @@ async def save_preferences(
             "preferences": preferences,
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"[API] 保存用户偏好失败: {e}", exc_info=True)
+        logger.error("[API] 保存用户偏好失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"保存失败: {str(e)}")
 
 
@@ -170,24 +242,18 @@ async def get_preferences(current_user: dict = Depends(get_current_user_optional
         }
     
     try:
-        email = current_user["email"]
-        user = get_user_by_email(email)
-        
-        if not user:
-            return {
-                "preferred_voice": default_voice_id,
-                "playback_speed": 1.0,
-            }
-        preferred_voice = user.get("preferred_voice", default_voice_id)
+        # current_user 即 user_store_cache 中按 token 缓存的用户记录（含未落盘的偏好），
+        # 无需再按邮箱查一次；偏好写入会使会话缓存失效，读到的总是最新值
+        preferred_voice = current_user.get("preferred_voice") or default_voice_id
         preferred_voice = normalize_voice_for_user(preferred_voice, current_user)
 
         return {
             "preferred_voice": preferred_voice,
-            "playback_speed": user.get("playback_speed", 1.0),
+            "playback_speed": current_user.get("playback_speed", 1.0),
         }
         
     except Exception as e:
-        logger.error(f"[API] 获取用户偏好失败: {e}", exc_info=True)
+        logger.error("[API] 获取用户偏好失败: %s", e, exc_info=True)
         # 失败时返回默认值，不阻断用户使用
         return {
             "preferred_voice": default_voice_id,
@@ -1,9 +1,10 @@
-from .jimeng_service import generate_image, generate_story_illustration
+from .jimeng_service import generate_image, generate_story_illustration, generate_story_illustrations
 from .llm_service import generate_story_outline, continue_story_with_interaction
 
 __all__ = [
     "generate_image",
     "generate_story_illustration",
+    "generate_story_illustrations",
     "generate_story_outline",
     "continue_story_with_interaction",
 ]
@@ -8,6 +8,7 @@ from app.constants.story_styles import DEFAULT_STYLE_ID
 from app.utils.service_tier import get_service_tier, get_user_identifier
 from app.utils.logger_utils import log_service_call, log_cache_check, log_generation_result
 from app.utils.image_cache import get_cached_image, save_image_cache
+from app.utils.singleflight import run_once
 
 # 导入两种服务实现
 from app.services.jimeng_service import (
@@ -21,6 +22,9 @@ from app.services.volcano_image_service import (
 
 logger = logging.getLogger(__name__)
 
+# 进行中的图片生成：(prompt, style_id) -> Task。与图片缓存同键，缓存未命中的并发请求只调用一次生成 API
+_image_inflight: dict = {}
+
 
 async def generate_story_image(
     scene_description: str,
@@ -74,6 +78,15 @@ async def generate_story_image(
 
     log_cache_check(logger, "图片", cache_hit=False, cache_key=prompt[:16])
 
+    return await run_once(
+        _image_inflight,
+        (prompt, style_id),
+        lambda: _generate_and_cache(prompt, style_id, tier, start_time),
+    )
+
+
+async def _generate_and_cache(prompt: str, style_id: str, tier: str, start_time: float) -> str:
+    """缓存未命中时实际调用生成 API 并写缓存，由 generate_story_image 经并发合并后调用。"""
     try:
         # 根据服务等级选择API
         if tier == "premium":
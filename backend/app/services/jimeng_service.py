@@ -3,12 +3,18 @@
 接口: POST {base_url}/v1/images/generations
 认证: Authorization: Bearer {session_id}
 """
+import asyncio
 import logging
 import io
+import os
+import threading
 import base64
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Optional, Tuple
 import httpx
 from PIL import Image
 from app.config import get_settings
@@ -24,21 +30,56 @@ NEGATIVE_PROMPT = (
     "low quality, bad anatomy, extra limbs"
 )
 
-EMOTION_MAP = {
+# 只读映射：prompt 缓存依赖其内容不变
+EMOTION_MAP = MappingProxyType({
     "happy": "warm golden sunlight, cheerful bright colors, blue sky",
     "excited": "vibrant saturated colors, dynamic angle, sparkles",
     "mysterious": "soft purple and blue fog, moonlight, glowing details",
     "warm": "sunset orange glow, cozy atmosphere, soft bokeh",
     "tense": "dramatic shadows, stormy clouds, contrast lighting",
-}
-
-# 默认风格（向后兼容，已迁移到story_styles.py）
-DEFAULT_STYLE = "whimsical children's book watercolor illustration, Pixar style, cute rounded characters, storybook illustration, rich colors, detailed background, high quality, masterpiece"
+})
 
 # 压缩图片配置
 COMPRESSED_IMAGES_DIR = IMAGES_DIR
 COMPRESSION_QUALITY = 85  # JPEG 压缩质量（1-100）
 TARGET_IMAGE_SIZE = 1024  # 固定 1:1，1024x1024
+RESIZE_REDUCING_GAP = 3.0  # 大幅缩小时先整数倍降采样再 LANCZOS
+# 图片生成 / 下载的超时（秒）
+GENERATE_TIMEOUT = 300
+DOWNLOAD_TIMEOUT = 120
+# 下载原图的大小上限与分块大小
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 图片解码 / 缩放 / JPEG 编码专用线程池（即梦与火山两条链路都经 compress_and_save_image 共用）
+PIL_WORKERS = os.cpu_count() or 4
+_pil_executor: Optional[ThreadPoolExecutor] = None
+
+# 已压缩的图片文件名：启动时扫描目录，之后每次压缩/命中时加入；
+# 同一张源图再次出现时只查内存即可返回路径，不再 stat 文件
+_compressed_images: set[str] = set()
+
+# 共享连接池的 HTTP 客户端：首次使用时创建，应用关闭时由 lifespan 调用 close_client
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """返回模块级 AsyncClient（复用 TCP/TLS 连接，避免每张图都重新握手）。"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GENERATE_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            trust_env=False,
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
 def _build_prompt(
@@ -46,12 +87,24 @@ def _build_prompt(
     characters: List[Character],
     emotion: str,
     style_id: str = DEFAULT_STYLE_ID,
+) -> str:
+    chars = tuple((c.name, c.appearance) for c in characters)
+    return _build_prompt_cached(scene_description, chars, emotion, style_id)
+
+
+# 同一故事的重试 / 重新渲染会反复构建相同 prompt，按 (场景, 角色, 情绪, 风格) 缓存
+@lru_cache(maxsize=4096)
+def _build_prompt_cached(
+    scene_description: str,
+    chars: Tuple[Tuple[str, str], ...],
+    emotion: str,
+    style_id: str,
 ) -> str:
     # 构建角色描述
-    char_desc = ", ".join(f"{c.name}({c.appearance})" for c in characters)
+    char_desc = ", ".join(f"{name}({appearance})" for name, appearance in chars)
     
     # 多角色场景优化：当有2个或更多角色时，明确强调多角色互动
-    if len(characters) >= 2:
+    if len(chars) >= 2:
         multi_char_emphasis = "multiple characters interacting together in the same scene, all characters visible and engaged"
         char_desc = f"{char_desc}, {multi_char_emphasis}"
     
@@ -60,6 +113,90 @@ def _build_prompt(
     return f"{style_prompt}, {scene_description}, featuring {char_desc}, {mood}"
 
 
+def _image_source_hash(image_url: str) -> str:
+    # 对完整来源取哈希：首尾相同、长度相同的不同图片也不会撞名；命名方式与已压缩的历史文件一致
+    return hashlib.md5(image_url.encode()).hexdigest()[:16]
+
+
+async def _download_image(image_url: str) -> bytes:
+    """流式下载图片，超过 MAX_DOWNLOAD_BYTES 立即中止（不把异常大的响应整体读进内存）。"""
+    async with get_client().stream("GET", image_url, timeout=DOWNLOAD_TIMEOUT) as resp:
+        resp.raise_for_status()
+        declared = int(resp.headers.get("content-length") or 0)
+        if declared > MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"图片过大: {declared} bytes")
+        chunks: list[bytes] = []
+        received = 0
+        async for chunk in resp.aiter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            received += len(chunk)
+            if received > MAX_DOWNLOAD_BYTES:
+                raise ValueError(f"图片过大: 超过 {MAX_DOWNLOAD_BYTES} bytes")
+            chunks.append(chunk)
+    # 单个 bytes 交给解码线程，BytesIO 直接共享其缓冲区，不再额外拷贝
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+def _get_pil_executor() -> ThreadPoolExecutor:
+    global _pil_executor
+    if _pil_executor is None:
+        _pil_executor = ThreadPoolExecutor(max_workers=PIL_WORKERS, thread_name_prefix="pil")
+    return _pil_executor
+
+
+def load_compressed_image_index() -> None:
+    """启动时扫描已有的压缩图片，填充已压缩索引。"""
+    try:
+        with os.scandir(COMPRESSED_IMAGES_DIR) as entries:
+            names = {e.name for e in entries if e.name.endswith(".jpg") and e.is_file()}
+    except OSError:
+        names = set()
+    _compressed_images.clear()
+    _compressed_images.update(names)
+    logger.info("[图片压缩] 已有压缩图片: %d", len(_compressed_images))
+
+
+def _compress_sync(image_data: bytes, output_path: Path) -> int:
+    """解码图片 → 转 RGB → 中心裁剪并缩放为 1:1 → 保存为 JPEG（同步，在线程中调用），返回文件字节数。"""
+    image = Image.open(io.BytesIO(image_data))
+    # JPEG 源图远大于目标尺寸时，让解码器直接按 1/2、1/4… 缩小解码（DCT 缩放），省去大部分解码与缩放开销
+    if image.format == "JPEG":
+        image.draft("RGB", (TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE))
+    
+    # 转换为RGB（处理RGBA等格式）
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    # 统一成 1:1：中心裁剪 + 缩放到 1024x1024，保证后续视频画幅一致
+    original_width, original_height = image.size
+    side = min(original_width, original_height)
+    left = max((original_width - side) // 2, 0)
+    top = max((original_height - side) // 2, 0)
+    image = image.crop((left, top, left + side, top + side))
+    if image.size != (TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE):
+        # reducing_gap：先按整数倍快速缩小，再做 LANCZOS，放大/小幅缩放时效果不变
+        image = image.resize(
+            (TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE), Image.Resampling.LANCZOS, reducing_gap=RESIZE_REDUCING_GAP
+        )
+    logger.info(
+        "[图片压缩] 归一化尺寸: %dx%d -> %dx%d",
+        original_width, original_height, TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE,
+    )
+    
+    # 保存为JPEG，压缩质量85（不开 optimize：省去第二遍 Huffman 统计，体积仅大约 5%）；
+    # 先写临时文件再替换，并发压缩同一张图时不会读到半个文件
+    tmp_path = output_path.with_name(f"{output_path.stem}.{threading.get_ident()}.tmp")
+    image.save(tmp_path, 'JPEG', quality=COMPRESSION_QUALITY)
+    size = tmp_path.stat().st_size
+    os.replace(tmp_path, output_path)
+    return size
+
+
 async def compress_and_save_image(image_url: str) -> str:
     """
     下载图片，压缩并保存为JPEG格式，返回本地路径
@@ -72,12 +209,13 @@ async def compress_and_save_image(image_url: str) -> str:
     """
     try:
         # 生成唯一文件名（基于URL hash）
-        url_hash = hashlib.md5(image_url.encode()).hexdigest()[:16]
-        output_path = COMPRESSED_IMAGES_DIR / f"{url_hash}.jpg"
+        filename = f"{_image_source_hash(image_url)}.jpg"
+        output_path = COMPRESSED_IMAGES_DIR / filename
         
-        # 如果已经压缩过，直接返回
-        if output_path.exists():
-            logger.debug(f"[图片压缩] 图片已存在，跳过: {output_path}")
+        # 如果已经压缩过，直接返回（先查内存索引，未命中再看磁盘，兼容其他进程写入的文件）
+        if filename in _compressed_images or output_path.exists():
+            _compressed_images.add(filename)
+            logger.debug("[图片压缩] 图片已存在，跳过: %s", output_path)
             return str(output_path)
         
         # 处理base64图片
@@ -85,51 +223,42 @@ async def compress_and_save_image(image_url: str) -> str:
             logger.info("[图片压缩] 处理base64图片")
             # 提取base64数据
             base64_data = image_url.split(",")[1] if "," in image_url else image_url
-            image_data = base64.b64decode(base64_data)
-            image = Image.open(io.BytesIO(image_data))
+            image_data = await asyncio.to_thread(base64.b64decode, base64_data)
         # 处理URL图片
         else:
-            logger.info(f"[图片压缩] 下载图片: {image_url[:80]}...")
-            async with httpx.AsyncClient(timeout=120, trust_env=False) as client:
-                resp = await client.get(image_url)
-                resp.raise_for_status()
-                image = Image.open(io.BytesIO(resp.content))
-        
-        # 转换为RGB（处理RGBA等格式）
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode in ('RGBA', 'LA') else None)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # 统一成 1:1：中心裁剪 + 缩放到 1024x1024，保证后续视频画幅一致
-        original_width, original_height = image.size
-        side = min(original_width, original_height)
-        left = max((original_width - side) // 2, 0)
-        top = max((original_height - side) // 2, 0)
-        image = image.crop((left, top, left + side, top + side))
-        if image.size != (TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE):
-            image = image.resize((TARGET_IMAGE_SIZE, TARGET_IMAGE_SIZE), Image.Resampling.LANCZOS)
-        logger.info(
-            f"[图片压缩] 归一化尺寸: {original_width}x{original_height} -> {TARGET_IMAGE_SIZE}x{TARGET_IMAGE_SIZE}"
-        )
+            logger.info("[图片压缩] 下载图片: %s...", image_url[:80])
+            image_data = await _download_image(image_url)
         
-        # 保存为JPEG，压缩质量85
-        image.save(output_path, 'JPEG', quality=COMPRESSION_QUALITY, optimize=True)
-        file_size = output_path.stat().st_size / 1024  # KB
-        logger.info(f"[图片压缩] ✅ 压缩完成: {output_path}, 大小: {file_size:.1f}KB")
+        # 解码 / 缩放 / JPEG 编码都是 CPU 密集操作，且 Pillow 在这些 C 实现中会释放 GIL，
+        # 放到按 CPU 核数设定的专用线程池即可多核并行，也不会占满默认线程池（文件 IO 等）
+        loop = asyncio.get_running_loop()
+        file_size = await loop.run_in_executor(_get_pil_executor(), _compress_sync, image_data, output_path)
+        _compressed_images.add(filename)
+        logger.info("[图片压缩] ✅ 压缩完成: %s, 大小: %.1fKB", output_path, file_size / 1024)
         
         return str(output_path)
         
     except Exception as e:
-        logger.error(f"[图片压缩] ❌ 压缩失败: {type(e).__name__}: {e}", exc_info=True)
+        logger.error(
+            "[图片压缩] ❌ 压缩失败: %s: %s", type(e).__name__, e,
+            exc_info=logger.isEnabledFor(logging.DEBUG),
+        )
         # 压缩失败时返回原始URL
         return image_url
 
 
+@lru_cache(maxsize=1)
+def _generation_endpoint() -> Tuple[str, MappingProxyType, str]:
+    """生成接口的 URL、请求头与模型名（配置在进程内不变，只拼装一次）。"""
+    settings = get_settings()
+    url = f"{settings.jimeng_api_base_url.rstrip('/')}/v1/images/generations"
+    headers = MappingProxyType({
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {settings.jimeng_session_id}",
+    })
+    return url, headers, settings.jimeng_model
+
+
 async def generate_image(
     prompt: str,
     *,
@@ -139,55 +268,51 @@ async def generate_image(
     compress: bool = True,
 ) -> str:
     """调用即梦 API 生成一张图，可选压缩，返回图片 URL 或本地路径。"""
-    settings = get_settings()
-    url = f"{settings.jimeng_api_base_url.rstrip('/')}/v1/images/generations"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {settings.jimeng_session_id}",
-    }
+    url, headers, model = _generation_endpoint()
     payload = {
-        "model": settings.jimeng_model,
+        "model": model,
         "prompt": prompt,
         "negative_prompt": negative_prompt,
         "ratio": ratio,
         "resolution": resolution,
     }
     
-    logger.info(f"[即梦API] 开始生成图片，URL: {url}, Model: {settings.jimeng_model}, 分辨率: {resolution}")
-    logger.debug(f"[即梦API] Prompt (前100字): {prompt[:100]}...")
+    logger.info("[即梦API] 开始生成图片，URL: %s, Model: %s, 分辨率: %s", url, model, resolution)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[即梦API] Prompt (前100字): %s...", prompt[:100])
     
     try:
-        # 增加超时时间到 300 秒（5分钟），即梦生成可能需要较长时间
-        async with httpx.AsyncClient(timeout=300, trust_env=False) as client:
-            resp = await client.post(url, headers=headers, json=payload)
-            logger.info(f"[即梦API] 响应状态码: {resp.status_code}")
-            
-            if resp.status_code != 200:
-                error_text = resp.text[:500]
-                logger.error(f"[即梦API] 请求失败: {resp.status_code}, 响应: {error_text}")
-                raise ValueError(f"即梦 API 返回错误 {resp.status_code}: {error_text}")
-            
-            resp.raise_for_status()
-            data = resp.json()
-            logger.debug(f"[即梦API] 响应数据: {str(data)[:200]}...")
-            
+        # 超时 300 秒（5分钟），即梦生成可能需要较长时间
+        resp = await get_client().post(url, headers=headers, json=payload)
+        logger.info("[即梦API] 响应状态码: %s", resp.status_code)
+        
+        if resp.status_code != 200:
+            error_text = resp.text[:500]
+            logger.error("[即梦API] 请求失败: %s, 响应: %s", resp.status_code, error_text)
+            raise ValueError(f"即梦 API 返回错误 {resp.status_code}: {error_text}")
+        
+        resp.raise_for_status()
+        data = resp.json()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[即梦API] 响应数据: %s...", str(data)[:200])
+        
         urls = data.get("data") or []
         if not urls:
-            logger.error(f"[即梦API] 响应中没有图片数据，完整响应: {data}")
+            logger.error("[即梦API] 响应中没有图片数据，完整响应: %s", data)
             raise ValueError("即梦 API 未返回图片数据")
         
         image_url = urls[0].get("url") or urls[0].get("b64_json")
         if not image_url:
-            logger.error(f"[即梦API] 图片 URL 为空，响应: {urls[0]}")
+            logger.error("[即梦API] 图片 URL 为空，响应: %s", urls[0])
             raise ValueError("即梦 API 返回的图片 URL 为空")
         
-        logger.info(f"[即梦API] ✅ 图片生成成功，原始URL长度: {len(image_url)}")
+        logger.info("[即梦API] ✅ 图片生成成功，原始URL长度: %d", len(image_url))
         
         # 压缩图片（如果启用）
         if compress:
             compressed_path = await compress_and_save_image(image_url)
-            # 转换为可访问的URL路径
-            if Path(compressed_path).is_file():
+            # 转换为可访问的URL路径（压缩失败时返回的是原始 URL）
+            if compressed_path != image_url:
                 # 返回相对路径，浏览器会自动使用当前域名（开发环境/生产环境通用）
                 filename = Path(compressed_path).name
                 return f"/static/images/{filename}"
@@ -196,13 +321,17 @@ async def generate_image(
         return image_url
         
     except httpx.TimeoutException as e:
-        logger.error(f"[即梦API] ⏱️ 请求超时: {e}")
+        logger.error("[即梦API] ⏱️ 请求超时: %s", e)
         raise ValueError(f"即梦 API 请求超时: {e}")
     except httpx.RequestError as e:
-        logger.error(f"[即梦API] ❌ 网络错误: {e}")
+        logger.error("[即梦API] ❌ 网络错误: %s", e)
         raise ValueError(f"即梦 API 网络错误: {e}")
     except Exception as e:
-        logger.error(f"[即梦API] ❌ 未知错误: {type(e).__name__}: {e}", exc_info=True)
+        # 完整堆栈只在 DEBUG 级别输出，避免每次失败都格式化 traceback
+        logger.error(
+            "[即梦API] ❌ 未知错误: %s: %s", type(e).__name__, e,
+            exc_info=logger.isEnabledFor(logging.DEBUG),
+        )
         raise
 
 
@@ -212,14 +341,35 @@ async def generate_story_illustration(
     style_id: str = DEFAULT_STYLE_ID,
 ) -> str:
     """根据故事段落生成插画（自动压缩）。"""
-    logger.info(f"[即梦API] 为段落生成插画，风格ID: {style_id}, 情感: {segment.emotion}, 场景描述: {segment.scene_description[:50]}...")
     prompt = _build_prompt(
         segment.scene_description,
         characters,
         segment.emotion,
         style_id=style_id,
     )
-    logger.info(f"[即梦API] 完整 Prompt (前200字符): {prompt[:200]}...")
-    logger.info(f"[即梦API] 应用的风格prompt: {get_style_prompt(style_id)[:100]}...")
+    # 日志级别高于 INFO 时跳过切片与格式化
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "[即梦API] 为段落生成插画，风格ID: %s, 情感: %s, 场景描述: %s...",
+            style_id, segment.emotion, segment.scene_description[:50],
+        )
+        logger.info("[即梦API] 完整 Prompt (前200字符): %s...", prompt[:200])
+        logger.info("[即梦API] 应用的风格prompt: %s...", get_style_prompt(style_id)[:100])
     # 降低分辨率从2k到1k，并启用压缩
     return await generate_image(prompt=prompt, ratio="1:1", resolution="1k", compress=True)
+
+
+async def generate_story_illustrations(
+    segments: List[StorySegment],
+    characters: List[Character],
+    style_id: str = DEFAULT_STYLE_ID,
+    max_concurrency: int = 4,
+) -> List[str]:
+    """为多个段落并发生成插画（最多 max_concurrency 个同时进行），结果与 segments 一一对应。"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _one(segment: StorySegment) -> str:
+        async with semaphore:
+            return await generate_story_illustration(segment, characters, style_id)
+
+    return await asyncio.gather(*(_one(seg) for seg in segments))
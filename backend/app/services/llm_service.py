@@ -1,25 +1,55 @@
 """LLM 故事大纲生成与互动续写 - OpenAI 兼容 API"""
+import asyncio
+import hashlib
 import json
 import re
 import logging
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Optional
 import httpx
-from openai import AsyncOpenAI
+import orjson
+from openai import NOT_GIVEN, APIConnectionError, AsyncOpenAI
+from pydantic import TypeAdapter
 from app.config import get_settings
 from app.models.story import (
     StoryOutline,
     StorySegment,
+    SEGMENT_TEMPLATE,
     InteractionPoint,
     Character,
     Setting,
     ContinueResponse,
 )
-from app.data.pools import pick_theme, pick_character, pick_setting
+from app.data.pools import THEME_PROMPT_FRAGMENTS, pick_character, pick_setting, pick_story_preset
+from app.utils.json_stream import StreamingJSONObject
+from app.utils.singleflight import run_once
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2（httpx[http2]）
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# 共享客户端的连接池上限：并发的大纲 / 续写请求无需排队等待建连
+LLM_MAX_CONNECTIONS = 64
+LLM_MAX_KEEPALIVE_CONNECTIONS = 32
+
+# 模型输出无法解析 / 校验失败或请求超时、连接失败时，重新请求的总次数；重试时降低温度以得到更规整的 JSON
+LLM_MAX_ATTEMPTS = 3
+LLM_RETRY_TEMPERATURE = 0.2
+# ValueError 覆盖 JSON 解析错误（LLMOutputError）与 pydantic 校验错误；APIConnectionError 包含超时
+_RETRYABLE_ERRORS = (ValueError, APIConnectionError)
+
+
+class LLMOutputError(ValueError):
+    """模型输出经本地修复后仍无法解析为 JSON。"""
+
 
 def _create_openai_client() -> AsyncOpenAI:
-    """创建 OpenAI 客户端，带超时配置并禁用系统代理"""
+    """创建 OpenAI 客户端，带超时配置并禁用系统代理（由 get_client 调用，进程内复用）"""
     settings = get_settings()
     
     try:
@@ -31,10 +61,14 @@ def _create_openai_client() -> AsyncOpenAI:
             pool=30.0      # 连接池超时
         )
         
-        # 创建自定义 httpx 客户端
+        # 创建自定义 httpx 客户端；安装了 h2 时启用 HTTP/2，并发请求复用同一条 TLS 连接
         http_client = httpx.AsyncClient(
             timeout=timeout,
-            limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+            limits=httpx.Limits(
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=LLM_MAX_CONNECTIONS,
+            ),
+            http2=HAS_HTTP2,
             follow_redirects=True,
             trust_env=False,
         )
@@ -46,13 +80,87 @@ def _create_openai_client() -> AsyncOpenAI:
             http_client=http_client,
         )
         
-        logger.info("[LLM] ✅ OpenAI 客户端初始化成功")
+        logger.info("[LLM] ✅ OpenAI 客户端初始化成功 (HTTP/2: %s)", HAS_HTTP2)
         return client
     except Exception as e:
-        logger.error(f"[LLM] ❌ 创建 OpenAI 客户端失败: {e}", exc_info=True)
+        logger.error("[LLM] ❌ 创建 OpenAI 客户端失败: %s", e, exc_info=True)
         raise
 
 
+# 共享的 OpenAI 客户端：首次使用时创建，跨请求复用连接池（Keep-Alive），应用关闭时由 lifespan 调用 close_client
+_client: Optional[AsyncOpenAI] = None
+# 同时进行的 LLM 调用上限，首次调用时按配置创建
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None or _client.is_closed():
+        _client = _create_openai_client()
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        try:
+            await _client.close()
+        except Exception as e:
+            logger.warning("[LLM] 关闭客户端时出错（可忽略）: %s", e)
+        _client = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_settings().llm_max_concurrency)
+    return _semaphore
+
+
+async def _wait_before_retry(attempt: int, task: str, error: Exception) -> None:
+    """重试前按指数退避等待：0.5s、1s、2s……，最长 4s。"""
+    delay = min(0.5 * 2 ** attempt, 4.0)
+    logger.warning(
+        "[LLM] ⚠️ %s失败 (尝试 %s/%s)，%ss 后以较低温度重试: %s: %s",
+        task, attempt + 1, LLM_MAX_ATTEMPTS, delay, type(error).__name__, error,
+    )
+    await asyncio.sleep(delay)
+
+
+async def _iter_completion(messages: list, temperature: float, cache_key: str) -> AsyncIterator[str]:
+    """以流式方式调用 chat completions，逐段产出模型输出的文本（受并发上限约束）。
+    cache_key 标识共享同一前缀（系统提示词 + 固定说明）的一类请求，开启 llm_prompt_cache 时
+    作为 prompt_cache_key 发送，帮助服务端把同类请求路由到已缓存该前缀的节点。"""
+    settings = get_settings()
+    extra_body = {"prompt_cache_key": cache_key} if settings.llm_prompt_cache else None
+    # JSON 模式下模型只输出合法 JSON 对象，解析可直接走快速路径
+    response_format = {"type": "json_object"} if settings.llm_json_mode else NOT_GIVEN
+    async with _get_semaphore():
+        stream = await get_client().chat.completions.create(
+            model=settings.llm_model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            response_format=response_format,
+            extra_body=extra_body,
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+
+
+def _finish_json(parser: StreamingJSONObject, raw: str) -> dict:
+    """流结束后取解析结果：增量解析成功直接使用，否则回退到整体清洗 + 修复解析。"""
+    data = parser.result()
+    if data is not None:
+        return data
+    logger.info("[LLM] 增量解析未得到完整 JSON，回退到整体修复解析")
+    logger.debug("[LLM] 原始响应 (前200字符): %s...", raw[:200])
+    return _normalize_and_parse(raw)
+
+
 OUTLINE_SYSTEM = """你是一个专业的儿童故事创作家，专门为3-10岁小朋友创作温暖、有趣、富有教育意义的原创童话故事。
 
 ## 核心创作原则（最重要！）
@@ -107,19 +215,64 @@ OUTLINE_SYSTEM = """你是一个专业的儿童故事创作家，专门为3-10
 """
 
 
+_JSON_DECODER = json.JSONDecoder()
+
+# 清洗 / 修复 JSON 用到的正则，模块加载时编译一次
+_MARKDOWN_OPEN_RE = re.compile(r"^```\w*\n?")
+_MARKDOWN_CLOSE_RE = re.compile(r"\n?```\s*$")
+_TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+_STRING_RE = re.compile(r'"([^"]*)"')
+# 字符串内容中需要处理的片段：已转义的字符对（原样保留）或裸换行/回车/制表符（需转义）
+_STRING_FIX_RE = re.compile(r'\\[\s\S]|[\n\r\t]')
+# 转义字符对（反斜杠 + 任意字符）
+_ESCAPE_PAIR_RE = re.compile(r'\\[\s\S]')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+# str.translate 转换表：转义裸换行/回车/制表符
+_CTRL_TRANS = str.maketrans(_CONTROL_ESCAPES)
+# 需删除的控制字符（保留换行、回车、制表符）。UTF-8 多字节序列中不会出现 0x00-0x1f，
+# 因此可在字节层面用 bytes.translate 一次删除，比 str.translate 的逐字符查表快一个数量级
+_CTRL_STRIP_BYTES = bytes(b for b in range(32) if b not in (9, 10, 13))
+
+
+def _strip_control_chars(text: str) -> str:
+    return text.encode("utf-8", "surrogatepass").translate(None, _CTRL_STRIP_BYTES).decode("utf-8", "surrogatepass")
+
+
+def _escape_control_char(match: re.Match) -> str:
+    token = match.group(0)
+    return _CONTROL_ESCAPES.get(token, token)
+
+
+def _fix_string_content(match: re.Match) -> str:
+    """转义字符串值中的裸换行/回车/制表符（保留已转义的字符）。"""
+    content = match.group(1)
+    if "\\" not in content:
+        # 常见情况：没有转义序列，一次 translate 即可
+        return '"' + content.translate(_CTRL_TRANS) + '"'
+    return '"' + _STRING_FIX_RE.sub(_escape_control_char, content) + '"'
+
+
 def _normalize_json(raw: str) -> str:
     """从模型输出中提取 JSON 并做清洗和修复。"""
     raw = raw.strip()
     
     # 去掉可能的 markdown 代码块
     if raw.startswith("```"):
-        raw = re.sub(r"^```\w*\n?", "", raw)
-        raw = re.sub(r"\n?```\s*$", "", raw)
+        raw = _MARKDOWN_OPEN_RE.sub("", raw)
+        raw = _MARKDOWN_CLOSE_RE.sub("", raw)
         raw = raw.strip()
     
     # 提取第一个完整的 JSON 对象（如果有多余文本）
     start = raw.find("{")
     if start >= 0:
+        # 快速路径：模型输出本身合法时，由 C 实现的 raw_decode 直接定位对象结尾，
+        # 无需逐字符扫描，也无需再修复尾随逗号
+        try:
+            _, end = _JSON_DECODER.raw_decode(raw, start)
+            return raw[start:end]
+        except ValueError:
+            pass
+        
         # 找到匹配的结束括号（考虑嵌套）
         brace_count = 0
         in_string = False
@@ -154,26 +307,50 @@ def _normalize_json(raw: str) -> str:
             raw = raw[start:end]
     
     # 移除尾随逗号（在对象和数组的最后一个元素后）
-    raw = re.sub(r',(\s*[}\]])', r'\1', raw)
+    raw = _TRAILING_COMMA_RE.sub(r'\1', raw)
     
     return raw
 
 
+def _try_parse(raw: str) -> dict | None:
+    """直接解析，失败返回 None。"""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return None
+
+
+def _normalize_and_parse(raw: str) -> dict:
+    """清洗并解析模型输出。输出本身就是一个干净的 JSON 对象时（JSON 模式下的常见情况）直接解析返回，
+    跳过 markdown 剥离、括号匹配和尾随逗号修复。"""
+    raw = raw.strip()
+    if raw.startswith("{") and raw.endswith("}"):
+        data = _try_parse(raw)
+        if data is not None:
+            return data
+    return _parse_json_with_retry(_normalize_json(raw))
+
+
 def _parse_json_with_retry(raw: str, max_retries: int = 3) -> dict:
     """解析 JSON，带重试和错误修复。"""
+    # 常见情况：输出本身合法，直接返回，不进入修复流程
+    data = _try_parse(raw)
+    if data is not None:
+        return data
+    
     last_error = None
     current_raw = raw
     
     for attempt in range(max_retries):
         try:
-            # 尝试直接解析
-            return json.loads(current_raw)
-        except json.JSONDecodeError as e:
+            # 尝试直接解析（orjson 的错误位置同样按字符计算，可直接用于下方修复）
+            return orjson.loads(current_raw)
+        except orjson.JSONDecodeError as e:
             last_error = e
             error_pos = e.pos if hasattr(e, 'pos') else None
             logger.warning(
-                f"[LLM] JSON 解析失败 (尝试 {attempt + 1}/{max_retries}): "
-                f"{e.msg} at pos {error_pos}, line {e.lineno}, col {e.colno}"
+                "[LLM] JSON 解析失败 (尝试 %s/%s): %s at pos %s, line %s, col %s",
+                attempt + 1, max_retries, e.msg, error_pos, e.lineno, e.colno,
             )
             
             if attempt < max_retries - 1:
@@ -182,158 +359,126 @@ def _parse_json_with_retry(raw: str, max_retries: int = 3) -> dict:
                     # 方法1: 修复未转义的引号（在字符串值中）
                     if error_pos and error_pos < len(current_raw):
                         # 检查错误位置附近的上下文
-                        context_start = max(0, error_pos - 50)
-                        context_end = min(len(current_raw), error_pos + 50)
-                        context = current_raw[context_start:context_end]
-                        logger.debug(f"[LLM] 错误上下文: ...{context}...")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            context_start = max(0, error_pos - 50)
+                            context_end = min(len(current_raw), error_pos + 50)
+                            logger.debug("[LLM] 错误上下文: ...%s...", current_raw[context_start:context_end])
                         
                         # 如果错误位置是引号，且不在转义后，尝试转义
                         if current_raw[error_pos] == '"' and error_pos > 0:
                             if current_raw[error_pos - 1] != '\\':
                                 # 检查是否在字符串值中（通过计算前面的引号数）
-                                before = current_raw[:error_pos]
-                                # 简单计算：统计未转义的引号
-                                quote_count = 0
-                                i = 0
-                                while i < len(before):
-                                    if before[i] == '\\':
-                                        i += 2  # 跳过转义字符
-                                        continue
-                                    if before[i] == '"':
-                                        quote_count += 1
-                                    i += 1
+                                # 统计未转义的引号：先去掉所有转义字符对，再由 str.count 计数（均在 C 层完成）
+                                quote_count = _ESCAPE_PAIR_RE.sub("", current_raw[:error_pos]).count('"')
                                 
                                 if quote_count % 2 == 1:  # 在字符串值中
                                     current_raw = current_raw[:error_pos] + '\\"' + current_raw[error_pos + 1:]
-                                    logger.debug(f"[LLM] 尝试转义引号")
+                                    logger.debug("[LLM] 尝试转义引号")
                                     continue
                     
                     # 方法2: 修复未转义的换行符和特殊字符
                     # 在字符串值中，换行符应该被转义
                     # 使用正则表达式找到字符串值并转义其中的特殊字符
-                    def fix_string_content(match):
-                        content = match.group(1)
-                        # 转义特殊字符（但保留已转义的）
-                        fixed = ""
-                        i = 0
-                        while i < len(content):
-                            if content[i] == '\\' and i + 1 < len(content):
-                                fixed += content[i:i+2]  # 保留已转义的字符
-                                i += 2
-                            elif content[i] in '\n\r\t':
-                                fixed += '\\' + ('n' if content[i] == '\n' else 'r' if content[i] == '\r' else 't')
-                                i += 1
-                            else:
-                                fixed += content[i]
-                                i += 1
-                        return f'"{fixed}"'
-                    
-                    # 匹配字符串值并修复
-                    current_raw = re.sub(r'"([^"]*)"', fix_string_content, current_raw)
+                    current_raw = _STRING_RE.sub(_fix_string_content, current_raw)
                     
                     # 方法3: 移除尾随逗号
-                    current_raw = re.sub(r',(\s*[}\]])', r'\1', current_raw)
+                    current_raw = _TRAILING_COMMA_RE.sub(r'\1', current_raw)
                     
                     # 方法4: 移除控制字符（但保留换行、回车、制表符）
-                    current_raw = ''.join(
-                        char for char in current_raw 
-                        if ord(char) >= 32 or char in '\n\r\t' or (char == '\x00' and attempt == max_retries - 1)
-                    )
+                    current_raw = _strip_control_chars(current_raw)
                     
                 except Exception as fix_error:
-                    logger.warning(f"[LLM] JSON 修复过程出错: {fix_error}")
+                    logger.warning("[LLM] JSON 修复过程出错: %s", fix_error)
     
     # 所有尝试都失败，记录详细错误
-    logger.error(f"[LLM] ❌ JSON 解析最终失败")
-    logger.error(f"[LLM] 错误位置: pos {last_error.pos if hasattr(last_error, 'pos') else 'unknown'}, "
-                 f"line {last_error.lineno}, col {last_error.colno}")
-    logger.error(f"[LLM] 错误消息: {last_error.msg}")
-    logger.error(f"[LLM] 原始内容 (前1000字符):\n{raw[:1000]}")
-    logger.error(f"[LLM] 最后尝试的内容 (前1000字符):\n{current_raw[:1000]}")
+    logger.error("[LLM] ❌ JSON 解析最终失败")
+    logger.error(
+        "[LLM] 错误位置: pos %s, line %s, col %s",
+        last_error.pos if hasattr(last_error, 'pos') else 'unknown', last_error.lineno, last_error.colno,
+    )
+    logger.error("[LLM] 错误消息: %s", last_error.msg)
+    logger.error("[LLM] 原始内容 (前1000字符):\n%s", raw[:1000])
+    logger.error("[LLM] 最后尝试的内容 (前1000字符):\n%s", current_raw[:1000])
     
-    # 返回一个默认的空结构，避免完全崩溃
-    return {
-        "feedback": "太棒啦！你的想法真有趣！",
-        "segments": [{
-            "text": "故事继续发展着，充满了惊喜和温暖。",
-            "emotion": "warm",
-            "scene_description": "story continues with warmth",
-            "interaction_point": None
-        }]
-    }
+    # 不再返回占位内容：由调用方重新请求模型，仍失败时向上报错
+    raise LLMOutputError(f"LLM 返回的 JSON 无法解析: {last_error.msg}")
 
 
-def _parse_outline(data: dict) -> StoryOutline:
-    """将 LLM 返回的 dict 转为 StoryOutline。"""
-    chars = [Character(**c) for c in data.get("characters", [])]
+# 续写解析失败时使用的兜底段落；字段均为常量，构造一次后按需复制
+_FALLBACK_SEGMENT = SEGMENT_TEMPLATE.model_copy(update={
+    "text": "故事继续发展着，充满了惊喜和温暖。",
+    "scene_description": "story continues with warmth",
+})
+
+
+# 角色 / 段落列表的批量校验器，模块加载时构建一次
+_CHARACTER_LIST = TypeAdapter(list[Character])
+_SEGMENT_LIST = TypeAdapter(list[StorySegment])
+
+
+def _parse_outline(data: dict, partial: bool = False) -> StoryOutline:
+    """将 LLM 返回的 dict 转为 StoryOutline。partial=True 时用于流式中间结果，不做篇幅与互动节点的校正。"""
+    chars = _CHARACTER_LIST.validate_python(data.get("characters", []))
     setting_data = data.get("setting", {})
     if "visualDescription" in setting_data and "visual_description" not in setting_data:
         setting_data["visual_description"] = setting_data.pop("visualDescription", "")
     setting = Setting(**setting_data)
-    segments = []
+    # 先把各段落统一成 snake_case 字段的 dict，再整体交给 pydantic-core 一次校验；
+    # 同时记录带互动节点的段落下标，校正时无需再扫描一遍
+    raw_segments = []
+    interaction_indices: list[int] = []
     for i, s in enumerate(data.get("segments", [])):
         ip = s.get("interaction_point") or s.get("interactionPoint")
         if ip:
-            ip = InteractionPoint(
-                type=ip.get("type", "guess"),
-                prompt=ip.get("prompt", ""),
-                hints=ip.get("hints"),
-            )
-        seg = StorySegment(
-            id=str(i),
-            text=s.get("text", ""),
-            scene_description=s.get("scene_description", s.get("sceneDescription", "")),
-            emotion=s.get("emotion", "warm"),
-            interaction_point=ip,
+            ip = {
+                "type": ip.get("type", "guess"),
+                "prompt": ip.get("prompt", ""),
+                "hints": ip.get("hints"),
+            }
+            interaction_indices.append(i)
+        raw_segments.append({
+            "id": str(i),
+            "text": s.get("text", ""),
+            "scene_description": s.get("scene_description", s.get("sceneDescription", "")),
+            "emotion": s.get("emotion", "warm"),
+            "interaction_point": ip,
+        })
+    segments = _SEGMENT_LIST.validate_python(raw_segments)
+    
+    if partial:
+        return StoryOutline(
+            title=data.get("title", "奇妙冒险"),
+            theme=data.get("theme", ""),
+            characters=chars,
+            setting=setting,
+            segments=segments,
         )
-        segments.append(seg)
     
+    # 以下校正直接修改段落字段：段落均为本次新建、尚未共享，无需复制（字段赋值不触发校验）
     # 强制保证至少 1 个、至多 3 个互动环节
-    interaction_indices = [i for i, seg in enumerate(segments) if seg.interaction_point]
     if not interaction_indices and segments:
         idx = min(1, len(segments) - 1)
-        seg = segments[idx]
-        segments[idx] = StorySegment(
-            id=seg.id,
-            text=seg.text,
-            scene_description=seg.scene_description,
-            emotion=seg.emotion,
-            interaction_point=InteractionPoint(
-                type="guess",
-                prompt="小朋友，你猜猜接下来会发生什么？",
-                hints=["想一想故事里的角色会怎么做", "可以大胆猜一猜"],
-            ),
+        segments[idx].interaction_point = InteractionPoint(
+            type="guess",
+            prompt="小朋友，你猜猜接下来会发生什么？",
+            hints=["想一想故事里的角色会怎么做", "可以大胆猜一猜"],
         )
-        logger.info(f"[LLM] 为保证互动，在第 {idx + 1} 段添加了互动节点")
+        logger.info("[LLM] 为保证互动，在第 %s 段添加了互动节点", idx + 1)
     elif len(interaction_indices) > 3:
         for i in interaction_indices[3:]:
-            seg = segments[i]
-            segments[i] = StorySegment(
-                id=seg.id,
-                text=seg.text,
-                scene_description=seg.scene_description,
-                emotion=seg.emotion,
-                interaction_point=None,
-            )
-        logger.info(f"[LLM] 互动节点超过 3 个，已保留前 3 个，移除第 {[x+1 for x in interaction_indices[3:]]} 段互动")
+            segments[i].interaction_point = None
+        logger.info("[LLM] 互动节点超过 3 个，已保留前 3 个，移除第 %s 段互动", [x+1 for x in interaction_indices[3:]])
     
     # 篇幅限制：最少 5 页，最多 7 页
     if len(segments) > 7:
         segments = segments[:7]
         logger.info("[LLM] 段落超过 7 页，已截断为前 7 页")
     if len(segments) < 5:
-        logger.warning(f"[LLM] 段落数为 {len(segments)}，建议 5-7 页")
+        logger.warning("[LLM] 段落数为 %s，建议 5-7 页", len(segments))
     
     # 确保最后一段没有互动节点（因为是结局）
     if segments and segments[-1].interaction_point:
-        last_seg = segments[-1]
-        segments[-1] = StorySegment(
-            id=last_seg.id,
-            text=last_seg.text,
-            scene_description=last_seg.scene_description,
-            emotion=last_seg.emotion,
-            interaction_point=None,
-        )
+        segments[-1].interaction_point = None
         logger.info("[LLM] 最后一段有互动节点，已移除（结局不应有互动）")
     
     return StoryOutline(
@@ -345,76 +490,185 @@ def _parse_outline(data: dict) -> StoryOutline:
     )
 
 
-async def generate_story_outline(
-    user_theme: str | None = None,
-    total_pages: int | None = None,
-    no_interaction: bool = False,
-) -> StoryOutline:
-    """根据可选主题或随机选择主题/角色/场景，调用 LLM 生成故事大纲。
-    total_pages 指定则生成恰好该页数；no_interaction 为 True 时所有段落的 interaction_point 均为 null。"""
+# 大纲 / 续写用户消息的固定开头。系统提示词与这些开头逐字节不变，变量内容一律放在消息末尾，
+# 使服务端的前缀缓存（prompt caching）可以命中整个系统提示词及固定说明
+_OUTLINE_USER_PREFIX = "请根据以下元素创作一个完整的儿童故事，输出一个 JSON。\n"
+_CONTINUE_USER_PREFIX = """请先写一句热情鼓励的反馈（可提及孩子的回答），再续写1-2个段落。
+**重要**：续写内容必须明确体现「孩子的回答」——例如孩子起的名字要在后文用来称呼角色，孩子的选择要成为后续情节（如选了去哪里、做了什么），让孩子明显感到自己的参与改变了故事。保持风格一致。只输出 JSON。
+
+"""
+
+
+# 大纲用户消息中随请求变化的部分：模板在模块加载时定义，每次请求只做一次 format 和一次 join
+_OUTLINE_THEME_TPL = "故事主题（必须围绕此主题展开）：{}\n"
+_OUTLINE_ROLE_TPL = (
+    "主角：{c.name}，{c.species}，{c.trait}，外观（英文）：{c.appearance}\n"
+    "场景：{s.location}，{s.time}，{s.weather}，视觉（英文）：{s.visual_description}\n"
+)
+_OUTLINE_SEED_LABELS = (
+    ("scene_seed", "开场场景"),
+    ("core_task", "核心任务"),
+    ("plot_twist", "情节转折"),
+    ("location_hint", "地点线索"),
+)
+_OUTLINE_PAGES_TPL = "\n**篇幅要求（必须严格遵守）**：请生成恰好 {0} 页（段），segments 数组长度必须为 {0}。"
+_OUTLINE_NO_INTERACTION = "\n**不要任何互动节点**：所有段落的 interaction_point 必须为 null，这是一个纯叙述故事。"
+
+
+def _outline_user_content(
+    user_theme: str | None,
+    total_pages: int | None,
+    no_interaction: bool,
+) -> str:
+    """构建大纲生成的用户提示词（固定开头 + 本次的主题、角色、场景和篇幅要求）。"""
+    parts = [_OUTLINE_USER_PREFIX]
     if user_theme and user_theme.strip():
         # 用户指定主题（如龟兔赛跑、小兔子找妈妈）
-        theme_desc = user_theme.strip()
-        character = pick_character()
-        setting = pick_setting()
-        user_content = f"""请根据以下故事主题创作一个完整的儿童故事，输出一个 JSON。
-故事主题（必须围绕此主题展开）：{theme_desc}
-主角：{character.name}，{character.species}，{character.trait}，外观（英文）：{character.appearance}
-场景：{setting.location}，{setting.time}，{setting.weather}，视觉（英文）：{setting.visual_description}
-"""
+        parts.append(_OUTLINE_THEME_TPL.format(user_theme.strip()))
+        parts.append(_OUTLINE_ROLE_TPL.format(c=pick_character(), s=pick_setting()))
     else:
         # 随机故事
-        theme = pick_theme()
-        character = pick_character()
-        setting = pick_setting()
-        extra_seeds = []
-        if theme.get("scene_seed"):
-            extra_seeds.append(f"开场场景：{theme['scene_seed']}")
-        if theme.get("core_task"):
-            extra_seeds.append(f"核心任务：{theme['core_task']}")
-        if theme.get("plot_twist"):
-            extra_seeds.append(f"情节转折：{theme['plot_twist']}")
-        if theme.get("location_hint"):
-            extra_seeds.append(f"地点线索：{theme['location_hint']}")
-
-        user_content = f"""请根据以下元素创作一个完整的儿童故事，输出一个 JSON。
-主题：{theme['theme']}，{theme['keywords']}，情节种子：{theme['plot_seed']}
-主角：{character.name}，{character.species}，{character.trait}，外观（英文）：{character.appearance}
-场景：{setting.location}，{setting.time}，{setting.weather}，视觉（英文）：{setting.visual_description}
-"""
+        preset = pick_story_preset()
+        theme = preset["theme"]
+        parts.append(THEME_PROMPT_FRAGMENTS[theme["theme"]].text)
+        parts.append("\n")
+        parts.append(_OUTLINE_ROLE_TPL.format(c=preset["character"], s=preset["setting"]))
+        extra_seeds = [f"{label}：{theme[key]}" for key, label in _OUTLINE_SEED_LABELS if theme.get(key)]
         if extra_seeds:
-            user_content += f"补充设定：{'；'.join(extra_seeds)}\n"
+            parts.append(f"补充设定：{'；'.join(extra_seeds)}\n")
     if total_pages is not None and total_pages >= 1:
-        user_content += f"\n**篇幅要求（必须严格遵守）**：请生成恰好 {total_pages} 页（段），segments 数组长度必须为 {total_pages}。"
+        parts.append(_OUTLINE_PAGES_TPL.format(total_pages))
     if no_interaction:
-        user_content += "\n**不要任何互动节点**：所有段落的 interaction_point 必须为 null，这是一个纯叙述故事。"
-    
-    client = _create_openai_client()
-    try:
-        resp = await client.chat.completions.create(
-            model=get_settings().llm_model,
-            messages=[
-                {"role": "system", "content": OUTLINE_SYSTEM},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0.8,
-        )
-        raw = resp.choices[0].message.content or "{}"
-        logger.debug(f"[LLM] 原始响应 (前200字符): {raw[:200]}...")
-        
-        raw = _normalize_json(raw)
-        logger.debug(f"[LLM] 清洗后 (前200字符): {raw[:200]}...")
-        
-        data = _parse_json_with_retry(raw)
-        logger.info(f"[LLM] ✅ JSON 解析成功")
-        
-        return _parse_outline(data)
-    finally:
-        # 确保客户端正确关闭，避免资源泄漏
+        parts.append(_OUTLINE_NO_INTERACTION)
+    return "".join(parts)
+
+
+async def generate_story_outline_stream(
+    user_theme: str | None = None,
+    total_pages: int | None = None,
+    no_interaction: bool = False,
+) -> AsyncIterator[Optional[StoryOutline]]:
+    """流式生成故事大纲：模型每写完一个段落就产出一次当前的部分大纲（不含篇幅/互动校正），
+    最后产出一次校正后的完整大纲。参数同 generate_story_outline。
+    已产出过部分大纲的尝试失败后会重试并生成一份全新的大纲：重试前先产出一次 None 作为重新开始的标记，
+    调用方应丢弃此前收到的部分大纲（及据此启动的下游任务）。"""
+    messages = [
+        {"role": "system", "content": OUTLINE_SYSTEM},
+        {"role": "user", "content": _outline_user_content(user_theme, total_pages, no_interaction)},
+    ]
+    temperature = 0.8
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        parser = StreamingJSONObject(array_key="segments")
+        parts: list[str] = []
+        yielded_partial = False
         try:
-            await client.close()
-        except Exception as e:
-            logger.warning(f"[LLM] 关闭客户端时出错（可忽略）: {e}")
+            async for text in _iter_completion(messages, temperature=temperature, cache_key="outline_v1"):
+                parts.append(text)
+                # 标题、角色、场景都已闭合后，每个新闭合的段落都产出一次部分大纲
+                if parser.feed(text) and not parser.error and "characters" in parser.fields and "setting" in parser.fields:
+                    try:
+                        partial = _parse_outline({**parser.fields, "segments": parser.items}, partial=True)
+                    except Exception as e:
+                        logger.debug("[LLM] 部分大纲暂不可用: %s", e)
+                    else:
+                        yielded_partial = True
+                        yield partial
+            
+            outline = _parse_outline(_finish_json(parser, "".join(parts) or "{}"))
+        except _RETRYABLE_ERRORS as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            await _wait_before_retry(attempt, "大纲生成", e)
+            if yielded_partial:
+                # 本次尝试的部分大纲已交给调用方，通知其作废后再开始新的一次
+                yield None
+            temperature = LLM_RETRY_TEMPERATURE
+            continue
+        
+        logger.info("[LLM] ✅ JSON 解析成功")
+        yield outline
+        return
+
+
+# 指定主题的大纲结果缓存：key -> (过期时间, 大纲)，有效期由 outline_cache_ttl 配置（0 为关闭）。
+# 随机主题每次抽取不同的预设，不参与缓存
+OUTLINE_CACHE_MAX_ENTRIES = 256
+_outline_cache: "OrderedDict[str, tuple[float, StoryOutline]]" = OrderedDict()
+# 进行中的大纲生成：相同 key 的并发请求共享同一次 LLM 调用
+_outline_inflight: dict = {}
+
+
+def _outline_cache_key(theme: str, total_pages: int | None, no_interaction: bool) -> str:
+    raw = f"{theme}|{total_pages}|{no_interaction}|{get_settings().llm_model}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _get_cached_outline(key: str) -> Optional[StoryOutline]:
+    entry = _outline_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        _outline_cache.pop(key, None)
+        return None
+    _outline_cache.move_to_end(key)
+    return entry[1]
+
+
+def _put_cached_outline(key: str, outline: StoryOutline, ttl: float) -> None:
+    _outline_cache[key] = (time.monotonic() + ttl, outline)
+    _outline_cache.move_to_end(key)
+    if len(_outline_cache) > OUTLINE_CACHE_MAX_ENTRIES:
+        _outline_cache.popitem(last=False)
+
+
+async def _generate_story_outline(
+    user_theme: str | None,
+    total_pages: int | None,
+    no_interaction: bool,
+    on_partial: Optional[Callable[[StoryOutline], None]] = None,
+    on_restart: Optional[Callable[[], None]] = None,
+) -> StoryOutline:
+    outline = None
+    async for outline in generate_story_outline_stream(user_theme, total_pages, no_interaction):
+        if outline is None:
+            if on_restart is not None:
+                on_restart()
+        elif on_partial is not None:
+            on_partial(outline)
+    return outline
+
+
+async def generate_story_outline(
+    user_theme: str | None = None,
+    total_pages: int | None = None,
+    no_interaction: bool = False,
+    on_partial: Optional[Callable[[StoryOutline], None]] = None,
+    on_restart: Optional[Callable[[], None]] = None,
+) -> StoryOutline:
+    """根据可选主题或随机选择主题/角色/场景，调用 LLM 生成故事大纲。
+    total_pages 指定则生成恰好该页数；no_interaction 为 True 时所有段落的 interaction_point 均为 null。
+    on_partial 在流式生成过程中每得到一次（部分）大纲即被调用，调用方可据此提前启动已完成段落的配图等下游任务；
+    若已产出部分大纲的生成尝试失败并重试，会先调用 on_restart，此前传给 on_partial 的部分大纲随之作废。
+    命中大纲缓存或与进行中的相同请求合并时两者都不会被调用。
+    开启 outline_cache_ttl 时，相同主题 + 页数 + 互动设置的请求在有效期内直接复用已生成的大纲。"""
+    ttl = get_settings().outline_cache_ttl
+    theme = user_theme.strip() if user_theme else ""
+    if ttl <= 0 or not theme:
+        return await _generate_story_outline(user_theme, total_pages, no_interaction, on_partial, on_restart)
+
+    key = _outline_cache_key(theme, total_pages, no_interaction)
+    outline = _get_cached_outline(key)
+    if outline is not None:
+        logger.info("[LLM] ✅ 命中大纲缓存: 主题=%s, 页数=%s", theme, total_pages)
+    else:
+        outline = await run_once(
+            _outline_inflight,
+            key,
+            lambda: _generate_story_outline(theme, total_pages, no_interaction, on_partial, on_restart),
+        )
+        _put_cached_outline(key, outline, ttl)
+    # 缓存中的大纲可能被多个故事复用，返回深拷贝，调用方可随意修改
+    return outline.model_copy(deep=True)
 
 
 CONTINUE_SYSTEM = """你正在为一个小朋友续写互动童话故事。请只输出一个 JSON 对象，不要 markdown 代码块，不要其他文字。
@@ -466,12 +720,12 @@ def _parse_continue(data: dict) -> ContinueResponse:
         segments_data = data.get("segments", [])
         
         if not isinstance(segments_data, list):
-            logger.warning(f"[LLM] segments 不是列表类型: {type(segments_data)}")
+            logger.warning("[LLM] segments 不是列表类型: %s", type(segments_data))
             segments_data = []
         
         for i, s in enumerate(segments_data):
             if not isinstance(s, dict):
-                logger.warning(f"[LLM] 段落 {i} 不是字典类型: {type(s)}")
+                logger.warning("[LLM] 段落 %s 不是字典类型: %s", i, type(s))
                 continue
             
             ip = s.get("interaction_point") or s.get("interactionPoint")
@@ -487,7 +741,7 @@ def _parse_continue(data: dict) -> ContinueResponse:
             # 确保必要字段存在
             text = s.get("text", "")
             if not text:
-                logger.warning(f"[LLM] 段落 {i} 文本为空，使用默认文本")
+                logger.warning("[LLM] 段落 %s 文本为空，使用默认文本", i)
                 text = "故事继续发展着..."
             
             segs.append(
@@ -502,14 +756,7 @@ def _parse_continue(data: dict) -> ContinueResponse:
         # 如果没有段落，创建一个默认段落
         if not segs:
             logger.warning("[LLM] 没有有效段落，创建默认段落")
-            segs.append(
-                StorySegment(
-                    text="故事继续发展着，充满了惊喜和温暖。",
-                    scene_description="story continues with warmth",
-                    emotion="warm",
-                    interaction_point=None,
-                )
-            )
+            segs.append(_FALLBACK_SEGMENT.model_copy())
         
         feedback = data.get("feedback", "太棒啦！")
         if not feedback:
@@ -520,18 +767,11 @@ def _parse_continue(data: dict) -> ContinueResponse:
             segments=segs,
         )
     except Exception as e:
-        logger.error(f"[LLM] ❌ 解析续写响应失败: {type(e).__name__}: {e}", exc_info=True)
+        logger.error("[LLM] ❌ 解析续写响应失败: %s: %s", type(e).__name__, e, exc_info=True)
         # 返回默认响应，避免完全失败
         return ContinueResponse(
             feedback="太棒啦！你的想法真有趣！",
-            segments=[
-                StorySegment(
-                    text="故事继续发展着，充满了惊喜和温暖。",
-                    scene_description="story continues with warmth",
-                    emotion="warm",
-                    interaction_point=None,
-                )
-            ],
+            segments=[_FALLBACK_SEGMENT.model_copy()],
         )
 
 
@@ -573,39 +813,34 @@ async def continue_story_with_interaction(
 **故事进度提示**：当前故事已有 {current_segment_count} 页，用户设定的故事总长度为 {max_total_pages} 页。续写 1-2 段即可，不要一次续写太多。
 """
     
-    user_content = f"""当前故事上下文：
+    user_content = _CONTINUE_USER_PREFIX + f"""当前故事上下文：
 {story_context}
 
 互动类型：{interaction_type}
 互动问题：{interaction_prompt}
 孩子的回答：{user_input}
-{progress_hint}
-请先写一句热情鼓励的反馈（可提及孩子的回答），再续写1-2个段落。
-**重要**：续写内容必须明确体现「孩子的回答」——例如孩子起的名字要在后文用来称呼角色，孩子的选择要成为后续情节（如选了去哪里、做了什么），让孩子明显感到自己的参与改变了故事。保持风格一致。只输出 JSON。"""
+{progress_hint}"""
     
-    client = _create_openai_client()
-    try:
-        resp = await client.chat.completions.create(
-            model=get_settings().llm_model,
-            messages=[
-                {"role": "system", "content": CONTINUE_SYSTEM},
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0.7,
-        )
-        raw = resp.choices[0].message.content or "{}"
-        logger.debug(f"[LLM] 续写原始响应 (前200字符): {raw[:200]}...")
-        
-        raw = _normalize_json(raw)
-        logger.debug(f"[LLM] 续写清洗后 (前200字符): {raw[:200]}...")
-        
-        data = _parse_json_with_retry(raw)
-        logger.info(f"[LLM] ✅ 续写 JSON 解析成功")
-        
-        return _parse_continue(data)
-    finally:
-        # 确保客户端正确关闭，避免资源泄漏
+    messages = [
+        {"role": "system", "content": CONTINUE_SYSTEM},
+        {"role": "user", "content": user_content},
+    ]
+    temperature = 0.7
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        parser = StreamingJSONObject()
+        parts: list[str] = []
         try:
-            await client.close()
-        except Exception as e:
-            logger.warning(f"[LLM] 关闭客户端时出错（可忽略）: {e}")
+            async for text in _iter_completion(messages, temperature=temperature, cache_key="continue_v1"):
+                parts.append(text)
+                parser.feed(text)
+            data = _finish_json(parser, "".join(parts) or "{}")
+            break
+        except _RETRYABLE_ERRORS as e:
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            await _wait_before_retry(attempt, "续写", e)
+            temperature = LLM_RETRY_TEMPERATURE
+    
+    logger.info("[LLM] ✅ 续写 JSON 解析成功")
+    
+    return _parse_continue(data)
@@ -0,0 +1,86 @@
+"""后台预取队列：有界优先队列 + 固定数量 worker，限制插画 / TTS 预生成的并发，避免挤占前台请求"""
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 队列容量与 worker 数量
+PREFETCH_QUEUE_SIZE = 64
+PREFETCH_WORKERS = 3
+
+_queue: Optional[asyncio.PriorityQueue] = None
+_workers: list = []
+# 同优先级按提交顺序执行（也避免比较到不可比较的 factory）
+_seq = itertools.count()
+# 已入队或执行中的 (kind, key)，重复提交直接丢弃
+_pending: Set[Tuple[str, Hashable]] = set()
+
+
+async def _worker(worker_id: int) -> None:
+    while True:
+        _, _, full_key, factory = await _queue.get()
+        try:
+            await factory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[预取队列] worker-{worker_id} 任务失败: {full_key}, 错误: {e}")
+        finally:
+            _pending.discard(full_key)
+            _queue.task_done()
+
+
+def start() -> None:
+    """启动 worker（须在事件循环内调用；重复调用无副作用）。"""
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.PriorityQueue(maxsize=PREFETCH_QUEUE_SIZE)
+    _pending.clear()
+    for i in range(PREFETCH_WORKERS):
+        _workers.append(asyncio.create_task(_worker(i)))
+    logger.info(f"[预取队列] 已启动 {PREFETCH_WORKERS} 个 worker，队列容量 {PREFETCH_QUEUE_SIZE}")
+
+
+async def stop() -> None:
+    """停止所有 worker，丢弃未执行的任务。"""
+    global _queue
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _pending.clear()
+    _queue = None
+
+
+def submit(
+    kind: str,
+    key: Hashable,
+    factory: Callable[[], Awaitable[object]],
+    priority: int = 0,
+) -> bool:
+    """
+    提交一个预取任务。
+
+    Args:
+        kind: 任务类别（如 "image"、"tts"），与 key 一起用于去重
+        key: 任务标识
+        factory: 返回待执行协程的工厂函数，出队时才调用
+        priority: 优先级，数值越小越先执行（如离当前页越近的段落越小）
+
+    Returns:
+        是否已入队；相同任务已在队列/执行中或队列已满时返回 False
+    """
+    start()
+    full_key = (kind, key)
+    if full_key in _pending:
+        return False
+    try:
+        _queue.put_nowait((priority, next(_seq), full_key, factory))
+    except asyncio.QueueFull:
+        logger.warning(f"[预取队列] 队列已满，丢弃预取任务: {full_key}")
+        return False
+    _pending.add(full_key)
+    return True
@@ -6,9 +6,40 @@ from app.models.story import StoryState, StoryOutline, StorySegment, InteractReq
 from app.services.llm_service import generate_story_outline, continue_story_with_interaction
 from app.services.image_generation_service import generate_story_image
 from app.utils.store import save_story, get_story, update_story, new_story_id
+from app.utils.singleflight import run_once
+from app.services import prefetch_queue
 
 logger = logging.getLogger(__name__)
 
+# 进行中的段落插画预生成：(story_id, segment_index) -> Task，并发请求共享同一次生成
+_image_inflight: dict = {}
+
+# 后台批量生成插画时同时进行的段落数
+IMAGE_GENERATION_CONCURRENCY = 4
+# 互动模式下，大纲流式生成期间提前开始配图的页数（首图 + 预取的第二页）
+EARLY_IMAGE_PAGES = 2
+# 进行中的提前配图任务：持有引用以免任务在执行中被垃圾回收，完成后自动移除
+_early_image_tasks: set = set()
+
+
+async def _warm_segment_image(
+    seg: StorySegment,
+    characters: List[Character],
+    style_id: str,
+    user: Optional[dict],
+) -> None:
+    """提前生成段落插画（结果进入图片缓存），失败只记录日志，由后续正式生成流程重试。"""
+    try:
+        await generate_story_image(
+            scene_description=seg.scene_description,
+            characters=characters,
+            emotion=seg.emotion,
+            style_id=style_id,
+            user=user,
+        )
+    except Exception as e:
+        logger.warning("[故事引擎] 提前生成段落插画失败（将在正式生成时重试）: %s", e)
+
 
 async def start_new_story(
     user_theme: str | None = None,
@@ -20,12 +51,37 @@ async def start_new_story(
     """生成新故事：大纲 + 第一段配图。user_theme 为空则随机主题。
     total_pages 指定则生成固定页数；no_interaction 为 True 时不设互动节点，且后台依次生成全部插画（不等待用户翻页）。
     user 参数用于选择服务等级（免费/付费）。"""
-    logger.info(f"[故事引擎] 开始生成新故事，风格ID: {style_id}, 主题: {user_theme}, 页数: {total_pages}, 用户: {user.get('email') if user else '未登录'}")
-    outline: StoryOutline = await generate_story_outline(
-        user_theme=user_theme,
-        total_pages=total_pages,
-        no_interaction=no_interaction,
-    )
+    logger.info("[故事引擎] 开始生成新故事，风格ID: %s, 主题: %s, 页数: %s, 用户: %s", style_id, user_theme, total_pages, user.get('email') if user else '未登录')
+    # 大纲流式生成期间，前几页一写完就开始配图，与 LLM 继续生成后续段落重叠进行；
+    # 之后 _generate_images_async 对同一段落发起的请求会合并到这次生成（或命中图片缓存）
+    early_limit = IMAGE_GENERATION_CONCURRENCY if no_interaction else EARLY_IMAGE_PAGES
+    early_tasks: dict[int, asyncio.Task] = {}
+
+    def _start_early_images(partial: StoryOutline) -> None:
+        for idx, seg in enumerate(partial.segments[:early_limit]):
+            if idx not in early_tasks:
+                task = asyncio.create_task(_warm_segment_image(seg, partial.characters, style_id, user))
+                early_tasks[idx] = task
+                _early_image_tasks.add(task)
+                task.add_done_callback(_early_image_tasks.discard)
+
+    def _cancel_early_images() -> None:
+        # 大纲生成重试或失败：已开始的配图属于作废的大纲，取消后由新大纲的段落重新开始
+        for task in early_tasks.values():
+            task.cancel()
+        early_tasks.clear()
+
+    try:
+        outline: StoryOutline = await generate_story_outline(
+            user_theme=user_theme,
+            total_pages=total_pages,
+            no_interaction=no_interaction,
+            on_partial=_start_early_images,
+            on_restart=_cancel_early_images,
+        )
+    except BaseException:
+        _cancel_early_images()
+        raise
     story_id = new_story_id()
     segments = list(outline.segments)
     if not segments:
@@ -33,17 +89,10 @@ async def start_new_story(
     if no_interaction:
         for i, seg in enumerate(segments):
             if seg.interaction_point is not None:
-                segments[i] = StorySegment(
-                    id=seg.id,
-                    text=seg.text,
-                    scene_description=seg.scene_description,
-                    emotion=seg.emotion,
-                    interaction_point=None,
-                    image_url=seg.image_url,
-                )
+                segments[i] = seg.model_copy(update={"interaction_point": None})
 
     # 优化：start 接口先返回文本，不阻塞等待首图，图片后台异步生成
-    logger.info(f"[故事引擎] start 阶段跳过同步首图生成，改为后台异步（style={style_id}）")
+    logger.info("[故事引擎] start 阶段跳过同步首图生成，改为后台异步（style=%s）", style_id)
 
     state = StoryState(
         id=story_id,
@@ -58,7 +107,7 @@ async def start_new_story(
         max_total_pages=total_pages if total_pages else 7,  # 保存用户设定的页数限制
     )
     save_story(state)
-    logger.info(f"[故事引擎] 故事已保存，story_id: {story_id}, style_id: {state.style_id}")
+    logger.info("[故事引擎] 故事已保存，story_id: %s, style_id: %s", story_id, state.style_id)
 
     if no_interaction:
         # 无互动模式：后台依次生成全部插画（包含首图）
@@ -68,13 +117,19 @@ async def start_new_story(
             )
         )
     else:
-        # 互动模式：先后台生成前两页（首图+下一页），保证首屏尽快可见
-        pregen_count = min(2, len(segments))
+        # 互动模式：首图立即后台生成；第二页同时放入预取队列并行生成（与前端的 preload 请求共用同一去重键）
         asyncio.create_task(
             _generate_images_async(
-                story_id, 0, pregen_count, outline.characters, style_id=style_id, user=user
+                story_id, 0, 1, outline.characters, style_id=style_id, user=user
             )
         )
+        if len(segments) > 1:
+            prefetch_queue.submit(
+                "image",
+                (story_id, 1),
+                lambda: preload_segment_image(story_id, 1, user=user),
+                priority=1,
+            )
 
     return state
 
@@ -90,7 +145,7 @@ async def _pregenerate_image(story_id: str, segment_index: int, style_id: str |
     # 如果没有传入style_id，使用故事状态中保存的风格
     if style_id is None:
         style_id = state.style_id if hasattr(state, 'style_id') else 'q_cute'
-    logger.info(f"[故事引擎] 预生成段落 {segment_index} 图片，使用风格: {style_id}")
+    logger.info("[故事引擎] 预生成段落 %s 图片，使用风格: %s", segment_index, style_id)
     try:
         url = await generate_story_image(
             scene_description=seg.scene_description,
@@ -102,14 +157,18 @@ async def _pregenerate_image(story_id: str, segment_index: int, style_id: str |
         seg.image_url = url
         state.segments[segment_index] = seg
         update_story(story_id, segments=state.segments)
-        logger.info(f"[故事引擎] ✅ 预生成段落 {segment_index} 图片完成")
+        logger.info("[故事引擎] ✅ 预生成段落 %s 图片完成", segment_index)
     except Exception as e:
-        logger.warning(f"[故事引擎] 预生成段落 {segment_index} 图片失败: {e}")
+        logger.warning("[故事引擎] 预生成段落 %s 图片失败: %s", segment_index, e)
 
 
 async def preload_segment_image(story_id: str, segment_index: int, user: Optional[dict] = None) -> None:
-    """供 API 调用的预生成接口，后台生成指定段落插画。"""
-    await _pregenerate_image(story_id, segment_index, user=user)
+    """供 API 调用的预生成接口，后台生成指定段落插画。同一段落并发调用只生成一次。"""
+    await run_once(
+        _image_inflight,
+        (story_id, segment_index),
+        lambda: _pregenerate_image(story_id, segment_index, user=user),
+    )
 
 
 def get_current_segment(state: StoryState) -> tuple[StorySegment | None, bool]:
@@ -134,7 +193,7 @@ async def go_next_segment(story_id: str, user: Optional[dict] = None) -> StorySt
     next_seg = state.segments[idx]
     if not next_seg.image_url:
         style_id = state.style_id if hasattr(state, 'style_id') else 'q_cute'
-        logger.info(f"[故事引擎] 翻页时生成图片，段落 {idx}，使用风格: {style_id}")
+        logger.info("[故事引擎] 翻页时生成图片，段落 %s，使用风格: %s", idx, style_id)
         next_seg.image_url = await generate_story_image(
             scene_description=next_seg.scene_description,
             characters=state.characters,
@@ -149,7 +208,7 @@ async def go_next_segment(story_id: str, user: Optional[dict] = None) -> StorySt
     is_last_segment = (idx == len(state.segments) - 1)
     if is_last_segment and not next_seg.interaction_point:
         state.status = "completed"
-        logger.info(f"[故事引擎] 翻到最后一段（无互动），故事完结")
+        logger.info("[故事引擎] 翻到最后一段（无互动），故事完结")
     else:
         state.status = "waiting_interaction" if next_seg.interaction_point else "narrating"
     
@@ -159,36 +218,35 @@ async def go_next_segment(story_id: str, user: Optional[dict] = None) -> StorySt
 
 async def handle_interaction(req: InteractRequest, user: Optional[dict] = None) -> ContinueResponse:
     """处理用户互动：续写 + 为新段落生成图片。"""
-    logger.info(f"[故事引擎] 处理互动请求: story_id={req.story_id}, segment_index={req.segment_index}, type={req.interaction_type}, input={req.user_input[:50]}..., 用户: {user.get('email') if user else '未登录'}")
+    logger.info("[故事引擎] 处理互动请求: story_id=%s, segment_index=%s, type=%s, input=%s..., 用户: %s", req.story_id, req.segment_index, req.interaction_type, req.user_input[:50], user.get('email') if user else '未登录')
     
     state = get_story(req.story_id)
     if not state or req.segment_index >= len(state.segments):
-        logger.error(f"[故事引擎] ❌ 故事或段落不存在: story_id={req.story_id}, segment_index={req.segment_index}, total_segments={len(state.segments) if state else 0}")
+        logger.error("[故事引擎] ❌ 故事或段落不存在: story_id=%s, segment_index=%s, total_segments=%s", req.story_id, req.segment_index, len(state.segments) if state else 0)
         raise ValueError("故事或段落不存在")
     
     seg = state.segments[req.segment_index]
     ip = seg.interaction_point
     if not ip:
-        logger.error(f"[故事引擎] ❌ 段落没有互动节点: segment_index={req.segment_index}")
+        logger.error("[故事引擎] ❌ 段落没有互动节点: segment_index=%s", req.segment_index)
         raise ValueError("该段落没有互动节点")
     
-    ip.user_input = req.user_input
-    seg.interaction_point = ip
+    seg.interaction_point = ip.model_copy(update={"user_input": req.user_input})
     state.segments[req.segment_index] = seg
 
     # 构建上下文（最近几段文本）
     start = max(0, req.segment_index - 2)
     context_parts = [state.segments[i].text for i in range(start, req.segment_index + 1)]
     story_context = "\n\n".join(context_parts)
-    logger.debug(f"[故事引擎] 故事上下文长度: {len(story_context)} 字符")
+    logger.debug("[故事引擎] 故事上下文长度: %s 字符", len(story_context))
 
     # 计算故事进度：已有段落数、已使用交互次数
     current_segment_count = len(state.segments)
     total_interactions_used = sum(1 for s in state.segments if s.interaction_point is not None)
     max_pages = state.max_total_pages if hasattr(state, 'max_total_pages') else 7
-    logger.info(f"[故事引擎] 故事进度: 已有 {current_segment_count} 段，已使用 {total_interactions_used} 次交互，最大页数限制: {max_pages}")
+    logger.info("[故事引擎] 故事进度: 已有 %s 段，已使用 %s 次交互，最大页数限制: %s", current_segment_count, total_interactions_used, max_pages)
 
-    logger.info(f"[故事引擎] 调用 LLM 续写故事...")
+    logger.info("[故事引擎] 调用 LLM 续写故事...")
     continuation = await continue_story_with_interaction(
         story_context=story_context,
         interaction_type=req.interaction_type,
@@ -198,11 +256,11 @@ async def handle_interaction(req: InteractRequest, user: Optional[dict] = None)
         total_interactions_used=total_interactions_used,
         max_total_pages=max_pages,  # 传递用户设定的页数限制
     )
-    logger.info(f"[故事引擎] ✅ LLM 续写完成，生成 {len(continuation.segments)} 个新段落")
+    logger.info("[故事引擎] ✅ LLM 续写完成，生成 %s 个新段落", len(continuation.segments))
 
     # 把续写段落追加到 segments，图片异步生成
     new_segments = continuation.segments
-    logger.info(f"[故事引擎] 开始为新段落生成图片，共 {len(new_segments)} 段")
+    logger.info("[故事引擎] 开始为新段落生成图片，共 %s 段", len(new_segments))
     
     # 先设置段落 ID，图片 URL 初始为 None（异步生成）
     for i, new_seg in enumerate(new_segments):
@@ -214,19 +272,16 @@ async def handle_interaction(req: InteractRequest, user: Optional[dict] = None)
     # 篇幅控制：使用用户设定的max_total_pages，如果超过则截断并确保最后一段是结局（无互动）
     max_pages = state.max_total_pages if hasattr(state, 'max_total_pages') else 7
     if len(state.segments) > max_pages:
-        logger.warning(f"[故事引擎] 续写后段落数 {len(state.segments)} 超过用户设定的 {max_pages} 页，截断为 {max_pages} 页")
+        logger.warning("[故事引擎] 续写后段落数 %s 超过用户设定的 %s 页，截断为 %s 页", len(state.segments), max_pages, max_pages)
         state.segments = state.segments[:max_pages]
         # 确保最后一段没有互动节点（结局）
         if state.segments[-1].interaction_point:
             last = state.segments[-1]
-            state.segments[-1] = StorySegment(
-                id=last.id,
-                text=last.text + " 故事到这里就结束啦，小朋友们晚安！",
-                scene_description=last.scene_description,
-                emotion="warm",
-                interaction_point=None,
-                image_url=last.image_url,
-            )
+            state.segments[-1] = last.model_copy(update={
+                "text": last.text + " 故事到这里就结束啦，小朋友们晚安！",
+                "emotion": "warm",
+                "interaction_point": None,
+            })
             logger.info("[故事引擎] 最后一段有互动节点，已移除并添加结束语")
     
     # 状态：续写后继续叙述，由 go_next_segment 在翻到最后一页时设为 completed
@@ -236,10 +291,10 @@ async def handle_interaction(req: InteractRequest, user: Optional[dict] = None)
     
     # 异步生成图片（不阻塞响应）
     style_id = state.style_id if hasattr(state, 'style_id') else 'q_cute'
-    logger.info(f"[故事引擎] 互动续写后异步生成图片，使用风格: {style_id}")
+    logger.info("[故事引擎] 互动续写后异步生成图片，使用风格: %s", style_id)
     asyncio.create_task(_generate_images_async(req.story_id, req.segment_index + 1, len(new_segments), state.characters, style_id=style_id, user=user))
     
-    logger.info(f"[故事引擎] ✅ 互动处理完成，当前段落索引: {state.current_index}, 总段落数: {len(state.segments)}，图片后台生成中...")
+    logger.info("[故事引擎] ✅ 互动处理完成，当前段落索引: %s, 总段落数: %s，图片后台生成中...", state.current_index, len(state.segments))
     return continuation
 
 
@@ -252,56 +307,65 @@ async def _generate_images_async(
     user: Optional[dict] = None,
 ) -> None:
     """后台异步生成图片，更新到 story state。"""
-    logger.info(f"[故事引擎] 后台开始生成图片: story_id={story_id}, start_index={start_index}, count={count}, 用户: {user.get('email') if user else '未登录'}")
+    logger.info("[故事引擎] 后台开始生成图片: story_id=%s, start_index=%s, count=%s, 用户: %s", story_id, start_index, count, user.get('email') if user else '未登录')
 
     state = get_story(story_id)
     if not state:
-        logger.error(f"[故事引擎] ❌ 故事不存在，无法生成图片: {story_id}")
+        logger.error("[故事引擎] ❌ 故事不存在，无法生成图片: %s", story_id)
         return
 
     # 如果没有传入style_id，使用故事状态中保存的风格
     if style_id is None:
         style_id = state.style_id if hasattr(state, 'style_id') else 'q_cute'
-    logger.info(f"[故事引擎] 后台生成图片使用风格: {style_id}")
+    logger.info("[故事引擎] 后台生成图片使用风格: %s", style_id)
     
-    for i in range(count):
-        segment_index = start_index + i
-        if segment_index >= len(state.segments):
-            logger.warning(f"[故事引擎] ⚠️ 段落索引超出范围: {segment_index} >= {len(state.segments)}")
-            break
-        
+    semaphore = asyncio.Semaphore(IMAGE_GENERATION_CONCURRENCY)
+
+    async def _generate_one(i: int, segment_index: int) -> None:
         seg = state.segments[segment_index]
         if seg.image_url:  # 已有图片，跳过
-            logger.info(f"[故事引擎] 段落 {segment_index} 已有图片，跳过")
-            continue
+            logger.info("[故事引擎] 段落 %s 已有图片，跳过", segment_index)
+            return
         
-        logger.info(f"[故事引擎] 后台生成第 {i+1}/{count} 段图片 (索引 {segment_index})...")
-        try:
-            # 重试机制：最多重试 2 次
-            max_retries = 2
-            for retry in range(max_retries + 1):
-                try:
-                    image_url = await generate_story_image(
-                        scene_description=seg.scene_description,
-                        characters=characters,
-                        emotion=seg.emotion,
-                        style_id=style_id,
-                        user=user,
-                    )
-                    seg.image_url = image_url
-                    state.segments[segment_index] = seg
-                    update_story(story_id, segments=state.segments)
-                    logger.info(f"[故事引擎] ✅ 段落 {segment_index} 图片生成成功: {image_url[:80]}...")
-                    break
-                except Exception as e:
-                    if retry < max_retries:
-                        wait_time = (retry + 1) * 5  # 5秒、10秒
-                        logger.warning(f"[故事引擎] ⚠️ 段落 {segment_index} 图片生成失败，{wait_time}秒后重试 ({retry+1}/{max_retries}): {e}")
-                        await asyncio.sleep(wait_time)
-                    else:
-                        logger.error(f"[故事引擎] ❌ 段落 {segment_index} 图片生成最终失败: {type(e).__name__}: {e}", exc_info=True)
-                        # 生成失败，保持 image_url 为 None，前端会显示"加载中"
-        except Exception as e:
-            logger.error(f"[故事引擎] ❌ 段落 {segment_index} 图片生成异常: {type(e).__name__}: {e}", exc_info=True)
+        # 信号量按提交顺序放行，靠前的页面先开始生成
+        async with semaphore:
+            logger.info("[故事引擎] 后台生成第 %s/%s 段图片 (索引 %s)...", i+1, count, segment_index)
+            try:
+                # 重试机制：最多重试 2 次
+                max_retries = 2
+                for retry in range(max_retries + 1):
+                    try:
+                        image_url = await generate_story_image(
+                            scene_description=seg.scene_description,
+                            characters=characters,
+                            emotion=seg.emotion,
+                            style_id=style_id,
+                            user=user,
+                        )
+                        seg.image_url = image_url
+                        state.segments[segment_index] = seg
+                        update_story(story_id, segments=state.segments)
+                        logger.info("[故事引擎] ✅ 段落 %s 图片生成成功: %s...", segment_index, image_url[:80])
+                        break
+                    except Exception as e:
+                        if retry < max_retries:
+                            wait_time = (retry + 1) * 5  # 5秒、10秒
+                            logger.warning("[故事引擎] ⚠️ 段落 %s 图片生成失败，%s秒后重试 (%s/%s): %s", segment_index, wait_time, retry+1, max_retries, e)
+                            await asyncio.sleep(wait_time)
+                        else:
+                            logger.error("[故事引擎] ❌ 段落 %s 图片生成最终失败: %s: %s", segment_index, type(e).__name__, e, exc_info=True)
+                            # 生成失败，保持 image_url 为 None，前端会显示"加载中"
+            except Exception as e:
+                logger.error("[故事引擎] ❌ 段落 %s 图片生成异常: %s: %s", segment_index, type(e).__name__, e, exc_info=True)
+
+    end_index = start_index + count
+    if end_index > len(state.segments):
+        logger.warning("[故事引擎] ⚠️ 段落索引超出范围: %s >= %s", end_index - 1, len(state.segments))
+        end_index = len(state.segments)
+    # 各段插画互不依赖，并发生成（受信号量限制），总耗时接近最慢的几张而非逐张累加
+    await asyncio.gather(*(
+        _generate_one(i, segment_index)
+        for i, segment_index in enumerate(range(start_index, end_index))
+    ))
     
-    logger.info(f"[故事引擎] ✅ 后台图片生成任务完成: story_id={story_id}")
+    logger.info("[故事引擎] ✅ 后台图片生成任务完成: story_id=%s", story_id)
@@ -1,10 +1,11 @@
 """统一 TTS 生成服务（集成 edge-tts 和官方 API）"""
 import asyncio
+import os
 import time
 import logging
 from pathlib import Path
 from threading import Lock
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from app.constants.voices import (
     DEFAULT_FREE_VOICE_ID,
@@ -13,11 +14,14 @@ from app.constants.voices import (
 )
 from app.utils.service_tier import get_service_tier, get_user_identifier
 from app.utils.logger_utils import log_service_call, log_cache_check, log_generation_result
+from app.utils.singleflight import run_once, start_once
+from app.utils.paths import TTS_AUDIO_DIR, VOLCANO_TTS_AUDIO_DIR
 
 # 导入两种服务实现
 from app.services.tts_service import (
     generate_tts_audio as generate_tts_edge,
     get_tts_audio_path as get_edge_audio_path,
+    stream_tts_audio,
 )
 from app.services.volcano_tts_service import (
     generate_tts_audio_volcano,
@@ -29,6 +33,56 @@ logger = logging.getLogger(__name__)
 _generation_locks: dict[str, asyncio.Lock] = {}
 _locks_guard = Lock()
 
+# 进行中的段落 TTS：(tier, story_id, segment_index, voice_id) -> Task，并发请求共享同一次生成
+_tts_inflight: dict = {}
+
+# 已生成的段落音频文件名（按等级分目录）：启动时扫描目录，之后每次生成/命中时加入，
+# 重复请求同一段音频时无需进入生成流程（加锁、stat 文件）即可返回 URL
+_generated_audio: dict[str, set[str]] = {"free": set(), "premium": set()}
+
+
+def _scan_audio_dir(directory: Path) -> set[str]:
+    try:
+        with os.scandir(directory) as entries:
+            return {e.name for e in entries if e.name.endswith(".mp3") and e.is_file()}
+    except OSError:
+        return set()
+
+
+def load_generated_audio_index() -> None:
+    """启动时扫描已有的段落音频，填充已生成索引。"""
+    _generated_audio["free"] = _scan_audio_dir(TTS_AUDIO_DIR)
+    _generated_audio["premium"] = _scan_audio_dir(VOLCANO_TTS_AUDIO_DIR)
+    logger.info(
+        f"[TTS生成] 已有段落音频: free={len(_generated_audio['free'])}, premium={len(_generated_audio['premium'])}"
+    )
+
+
+def _relative_audio_path(tier: str, filename: str) -> str:
+    return f"data/audio/volcano_tts/{filename}" if tier == "premium" else f"data/audio/tts/{filename}"
+
+
+def get_cached_segment_tts(
+    story_id: str,
+    segment_index: int,
+    voice_id: str,
+    user: Optional[dict] = None,
+) -> Optional[str]:
+    """已生成过的段落音频直接返回相对路径（查内存索引，命中后再 stat 确认文件仍在），否则返回 None。
+    文件已被删除（如缓存清理）时从索引中移除，调用方随后走正常生成流程。"""
+    tier = get_service_tier(user)
+    resolved_voice_id = normalize_voice_for_user(voice_id, user)
+    audio_path = _get_tts_cache_path(story_id, segment_index, resolved_voice_id, tier)
+    if audio_path.name not in _generated_audio[tier]:
+        return None
+    try:
+        if audio_path.stat().st_size > 0:
+            return _relative_audio_path(tier, audio_path.name)
+    except OSError:
+        pass
+    _generated_audio[tier].discard(audio_path.name)
+    return None
+
 
 def _get_generation_lock(key: str) -> asyncio.Lock:
     with _locks_guard:
@@ -72,7 +126,8 @@ async def generate_segment_tts(
     user: Optional[dict] = None,
 ) -> str:
     """
-    根据用户等级选择服务生成 TTS 音频（带缓存优化）
+    根据用户等级选择服务生成 TTS 音频（带缓存优化）。
+    相同 (等级, 故事, 段落, 音色) 的并发调用合并为一次，共享同一结果。
 
     Args:
         story_id: 故事 ID
@@ -88,6 +143,23 @@ async def generate_segment_tts(
     Raises:
         RuntimeError: TTS 生成失败
     """
+    key = (get_service_tier(user), story_id, segment_index, voice_id)
+    return await run_once(
+        _tts_inflight,
+        key,
+        lambda: _generate_segment_tts(story_id, segment_index, text, voice_id, speed, user),
+    )
+
+
+async def _generate_segment_tts(
+    story_id: str,
+    segment_index: int,
+    text: str,
+    voice_id: str = DEFAULT_FREE_VOICE_ID,
+    speed: float = 1.0,
+    user: Optional[dict] = None,
+) -> str:
+    """实际生成逻辑，由 generate_segment_tts 经并发合并后调用。"""
     start_time = time.time()
     tier = get_service_tier(user)
     user_email = get_user_identifier(user)
@@ -110,11 +182,7 @@ async def generate_segment_tts(
     # 获取缓存路径
     audio_path = _get_tts_cache_path(story_id, segment_index, resolved_voice_id, tier)
 
-    relative_path = (
-        f"data/audio/volcano_tts/{audio_path.name}"
-        if tier == "premium"
-        else f"data/audio/tts/{audio_path.name}"
-    )
+    relative_path = _relative_audio_path(tier, audio_path.name)
     cache_key = f"{story_id}_{segment_index}_{resolved_voice_id}"
 
     generation_lock = _get_generation_lock(f"{tier}:{audio_path}")
@@ -128,6 +196,7 @@ async def generate_segment_tts(
                 f"[TTS生成] ✅ 使用缓存，耗时: {elapsed:.2f}s, "
                 f"路径: {audio_path.name}, 大小: {file_size_kb:.1f}KB"
             )
+            _generated_audio[tier].add(audio_path.name)
             return relative_path
 
         log_cache_check(logger, "音频", cache_hit=False, cache_key=cache_key)
@@ -169,6 +238,7 @@ async def generate_segment_tts(
             )
             logger.info(f"[TTS生成] 文件大小: {file_size_kb:.1f}KB")
 
+            _generated_audio[tier].add(audio_path.name)
             return relative_path
 
         except Exception as e:
@@ -197,7 +267,142 @@ async def generate_segment_tts(
                         max_retries=3,
                     )
                     if fallback_path.exists() and fallback_path.stat().st_size > 0:
-                        return f"data/audio/volcano_tts/{fallback_path.name}"
+                        return _relative_audio_path(tier, fallback_path.name)
                 logger.error("[TTS生成] ❌ 付费用户线上 TTS 失败，不再降级到 edge-tts")
 
             raise
+
+
+class _AudioStreamBuffer:
+    """进行中的流式合成：已产出的音频块 + 新块到达通知，同一段落的多个流式请求共享一份。"""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.closed = False
+        self._event = asyncio.Event()
+
+    def _notify(self) -> None:
+        # 每次通知后换一个新事件，等待方在检查前先取当前事件，不会漏掉通知
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    def push(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def close(self) -> None:
+        self.closed = True
+        self._notify()
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        i = 0
+        while True:
+            event = self._event
+            while i < len(self.chunks):
+                yield self.chunks[i]
+                i += 1
+            if self.closed:
+                return
+            await event.wait()
+
+
+# 进行中的流式段落 TTS：键同 _tts_inflight，值为共享的音频块缓冲
+_tts_streams: dict = {}
+
+
+def stream_segment_tts(
+    story_id: str,
+    segment_index: int,
+    text: str,
+    voice_id: str = DEFAULT_FREE_VOICE_ID,
+    user: Optional[dict] = None,
+) -> Optional[AsyncIterator[bytes]]:
+    """
+    免费用户边合成边产出段落音频（edge-tts 流式接口），完成后写入缓存并登记到已生成索引。
+    与 generate_segment_tts 共用进行中任务表和生成锁：相同段落的流式请求共享同一次合成，
+    generate_segment_tts 的并发调用也会等待这次合成的结果。
+
+    Returns:
+        音频块迭代器；若该段落已有非流式生成在进行则返回 None，调用方改为等待 generate_segment_tts
+    """
+    key = (get_service_tier(user), story_id, segment_index, voice_id)
+
+    def _start():
+        buffer = _tts_streams[key] = _AudioStreamBuffer()
+        return _stream_segment_tts(key, text, user, buffer)
+
+    # 已有相同段落的任务时 _start 不会被调用：流式任务的缓冲仍在 _tts_streams 中，非流式任务则没有
+    task = start_once(_tts_inflight, key, _start)
+    buffer = _tts_streams.get(key)
+    if buffer is None:
+        return None
+    return _iter_stream(buffer, task)
+
+
+async def _iter_stream(buffer: _AudioStreamBuffer, task: asyncio.Task) -> AsyncIterator[bytes]:
+    async for chunk in buffer.iter_chunks():
+        yield chunk
+    # 合成失败时把异常传给本次请求（中断响应，不会当作完整音频）
+    await asyncio.shield(task)
+
+
+async def _stream_segment_tts(
+    key: tuple,
+    text: str,
+    user: Optional[dict],
+    buffer: _AudioStreamBuffer,
+) -> str:
+    """实际的流式合成，由 stream_segment_tts 经并发合并后调用；与请求的生命周期无关，客户端断开也会完成并写入缓存。"""
+    tier, story_id, segment_index, voice_id = key
+    resolved_voice_id = normalize_voice_for_user(voice_id, user)
+    audio_path = _get_tts_cache_path(story_id, segment_index, resolved_voice_id, tier)
+    try:
+        async with _get_generation_lock(f"{tier}:{audio_path}"):
+            if audio_path.exists() and audio_path.stat().st_size > 0:
+                buffer.push(await asyncio.to_thread(audio_path.read_bytes))
+            else:
+                async for chunk in stream_tts_audio(text, str(audio_path), resolved_voice_id, rate="+0%"):
+                    buffer.push(chunk)
+        _generated_audio[tier].add(audio_path.name)
+        return _relative_audio_path(tier, audio_path.name)
+    finally:
+        buffer.close()
+        _tts_streams.pop(key, None)
+
+
+async def generate_segments_tts_batch(
+    story_id: str,
+    items: list[tuple[int, str]],
+    voice_id: str = DEFAULT_FREE_VOICE_ID,
+    speed: float = 1.0,
+    user: Optional[dict] = None,
+) -> list[Optional[str]]:
+    """
+    按顺序为多个段落生成 TTS（作为一个后台任务执行，只占用一个预取 worker）。
+    单段失败不影响后续段落，对应位置返回 None。
+
+    Args:
+        story_id: 故事 ID
+        items: [(段落索引, 段落文本), ...]，按朗读顺序排列
+        voice_id / speed / user: 同 generate_segment_tts
+
+    Returns:
+        与 items 一一对应的音频相对路径列表
+    """
+    results: list[Optional[str]] = []
+    for segment_index, text in items:
+        try:
+            results.append(
+                await generate_segment_tts(
+                    story_id=story_id,
+                    segment_index=segment_index,
+                    text=text,
+                    voice_id=voice_id,
+                    speed=speed,
+                    user=user,
+                )
+            )
+        except Exception as e:
+            logger.warning(f"[TTS生成] 批量预生成失败: story={story_id}, segment={segment_index}, 错误: {e}")
+            results.append(None)
+    return results
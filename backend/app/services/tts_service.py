@@ -3,8 +3,8 @@ import asyncio
 import logging
 import os
 from pathlib import Path
-from typing import Optional
-from app.utils.paths import AUDIO_DIR
+from typing import AsyncIterator, Optional
+from app.utils.paths import TTS_AUDIO_DIR, PREVIEW_AUDIO_DIR
 
 try:
     import edge_tts
@@ -15,7 +15,7 @@ except ImportError:
 
 from app.constants.voices import (
     DEFAULT_FREE_VOICE_ID,
-    FREE_AVAILABLE_VOICES,
+    get_recommended_voices,
     get_voice_by_id,
     is_free_voice,
     PREVIEW_TEXT,
@@ -23,14 +23,6 @@ from app.constants.voices import (
 
 logger = logging.getLogger(__name__)
 
-# TTS 音频存储路径（使用绝对路径，避免相对路径问题）
-TTS_AUDIO_DIR = AUDIO_DIR / "tts"
-TTS_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-
-# 预览音频存储路径
-PREVIEW_AUDIO_DIR = AUDIO_DIR / "preview"
-PREVIEW_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-
 logger.info(f"[TTS] 音频目录: {TTS_AUDIO_DIR}")
 logger.info(f"[TTS] 预览目录: {PREVIEW_AUDIO_DIR}")
 
@@ -137,7 +129,7 @@ async def generate_preview_audio(voice_id: str, force_regenerate: bool = False)
     logger.info(f"[TTS] 🎙️ 生成新的预览音频: {voice_id}")
     
     # 生成预览文案
-    preview_text = PREVIEW_TEXT.format(voice_name=voice_info["name"])
+    preview_text = PREVIEW_TEXT.format(voice_name=voice_info.name)
     
     # 生成语音（带重试机制）
     await generate_tts_audio(preview_text, str(output_path), voice_id, max_retries=3)
@@ -167,24 +159,22 @@ async def pregenerate_all_previews():
     success_count = 0
     failed_voices = []
     
-    for voice in FREE_AVAILABLE_VOICES:
-        if not voice.get("is_recommended"):
-            continue
-        
+    recommended = get_recommended_voices()
+    for voice in recommended:
         try:
             # 串行生成，避免并发请求触发限流
-            await generate_preview_audio(voice["id"])
+            await generate_preview_audio(voice.id)
             success_count += 1
-            logger.info(f"[TTS] ✅ {voice['name']} ({voice['id']}) 预览生成成功")
+            logger.info(f"[TTS] ✅ {voice.name} ({voice.id}) 预览生成成功")
             
             # 每次生成后延迟 1 秒，避免频率限制
             await asyncio.sleep(1)
             
         except Exception as e:
-            failed_voices.append(voice["name"])
-            logger.warning(f"[TTS] ⚠️ {voice['name']} ({voice['id']}) 预览生成失败: {e}")
+            failed_voices.append(voice.name)
+            logger.warning(f"[TTS] ⚠️ {voice.name} ({voice.id}) 预览生成失败: {e}")
     
-    total = sum(1 for v in FREE_AVAILABLE_VOICES if v.get("is_recommended"))
+    total = len(recommended)
     
     if success_count > 0:
         logger.info(f"[TTS] ✅ 预生成完成: {success_count}/{total} 个音色成功")
@@ -229,6 +219,58 @@ def get_tts_audio_path(story_id: str, segment_index: int, voice_id: str) -> Path
     return TTS_AUDIO_DIR / filename
 
 
+def _write_bytes_atomic(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+async def stream_tts_audio(
+    text: str,
+    output_path: str,
+    voice_id: str = DEFAULT_FREE_VOICE_ID,
+    rate: str = "+0%",
+    volume: str = "+0%",
+) -> AsyncIterator[bytes]:
+    """
+    边合成边产出 MP3 数据块（edge-tts 流式接口），用于降低首字节延迟。
+    完整合成成功后顺带写入 output_path 作为缓存；中途失败或客户端断开则不写缓存。
+
+    Args:
+        text: 要转换的文本
+        output_path: 缓存文件路径
+        voice_id: 音色 ID
+        rate: 语速调整
+        volume: 音量调整
+
+    Yields:
+        MP3 音频数据块
+    """
+    if not HAS_EDGE_TTS:
+        raise RuntimeError("edge-tts 未安装，无法生成语音")
+
+    if not is_free_voice(voice_id):
+        logger.warning(f"音色 {voice_id} 不是免费音色，使用默认音色 {DEFAULT_FREE_VOICE_ID}")
+        voice_id = DEFAULT_FREE_VOICE_ID
+
+    logger.info(f"[TTS] 开始流式生成语音: voice={voice_id}, text_len={len(text)}")
+    chunks: list[bytes] = []
+    communicate = edge_tts.Communicate(text, voice_id, rate=rate, volume=volume)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio" and chunk["data"]:
+            chunks.append(chunk["data"])
+            yield chunk["data"]
+
+    data = b"".join(chunks)
+    if not data:
+        raise RuntimeError(f"TTS 流式生成结果为空: {output_path}")
+    path = Path(output_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 先写临时文件再改名，避免并发读到半个文件
+    await asyncio.to_thread(_write_bytes_atomic, path, data)
+    logger.info(f"[TTS] ✅ 流式语音已写入缓存: {path.name} ({len(data)} bytes)")
+
+
 async def get_or_generate_segment_audio(
     story_id: str,
     segment_index: int,
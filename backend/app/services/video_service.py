@@ -14,14 +14,15 @@ import logging
 import os
 import shutil
 from pathlib import Path
-from typing import List, Optional, Dict, Any, Tuple
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 from urllib.parse import urlparse
 import httpx
+import orjson
 from app.config import get_settings
 from app.models.story import StorySegment
-from app.utils.paths import IMAGES_DIR
+from app.utils.paths import IMAGES_DIR, VIDEO_STATUS_DIR
 from app.utils.url_utils import normalize_image_url
-from app.utils.store import get_story, update_story
+from app.utils.store import MULTI_WORKER, get_story, update_story
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +40,15 @@ REMOTE_IMAGE_CACHE_DIR = IMAGES_DIR / "remote_downloads"
 REMOTE_IMAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # 视频生成状态存储（实际项目中应该用数据库）
+# 值为只读快照：每次进度变化整体替换为新 dict，轮询读取无需加锁也不会读到半更新的状态；
+# 多进程部署时同时写入 VIDEO_STATUS_DIR，轮询落到其他 worker 也能查到。
 _video_tasks: Dict[str, Dict] = {}
+# 等待状态变化的订阅者：每次发布时 set 并移除，订阅者下一轮重新创建
+_status_events: Dict[str, asyncio.Event] = {}
+# 每个故事当前的订阅连接数：最后一个订阅者断开时移除其事件，避免无任务的 story_id 长期占用
+_status_watchers: Dict[str, int] = {}
+# 状态推送的心跳间隔（秒）：无变化时也重发一次当前状态，保持连接并兼顾其他 worker 的状态文件
+STATUS_WATCH_HEARTBEAT_SECONDS = 15
 _pregen_inflight: set[Tuple[str, int]] = set()
 
 
@@ -454,7 +463,7 @@ async def maybe_pregenerate_premium_clip(
 
     state = get_story(story_id)
     if state:
-        existing = state.video_clips.get(str(segment_index))
+        existing = state.video_clips.get(segment_index)
         if existing and os.path.exists(existing):
             return existing
 
@@ -490,7 +499,7 @@ async def maybe_pregenerate_premium_clip(
         state = get_story(story_id)
         if state:
             clips = dict(state.video_clips)
-            clips[str(segment_index)] = str(cached)
+            clips[segment_index] = str(cached)
             update_story(story_id, video_clips=clips)
 
         logger.info(f"[视频服务] ✅ 付费预生成完成: segment={segment_index}, path={cached}")
@@ -1040,7 +1049,6 @@ async def generate_story_video(
     title: str,
     enable_audio: bool = True,
     user: Optional[dict] = None,
-    prebuilt_clips: Optional[Dict[str, str]] = None,
 ) -> Dict:
     """
     生成完整的故事视频。
@@ -1059,7 +1067,7 @@ async def generate_story_video(
         "video_url": None,
         "error": None,
     }
-    _video_tasks[story_id] = task_info
+    _publish_status(task_info)
 
     try:
         settings = get_settings()
@@ -1102,19 +1110,20 @@ async def generate_story_video(
         if total == 0:
             task_info["status"] = VideoGenerationStatus.FAILED
             task_info["error"] = "没有可生成片段的段落（缺少图片）"
+            _publish_status(task_info)
             return task_info
 
         task_info["total_clips"] = total
+        _publish_status(task_info)
         logger.info(f"[视频服务] 步骤 1: 提交并轮询共 {total} 个片段，最多 {MAX_CONCURRENT_VIDEO_TASKS} 个并发")
 
         # 提交前优先复用“当前故事目录/状态缓存”中的已有片段，避免重复提交
+        # （片段缓存在任务开始时直接读取故事状态，不由调用方拷贝传入）
         results: Dict[int, str] = {}
-        cache_store: Dict[str, str] = {}
-        if prebuilt_clips:
-            cache_store.update({str(k): v for k, v in prebuilt_clips.items() if v})
+        cache_store: Dict[int, str] = {}
         state = get_story(story_id)
         if state and state.video_clips:
-            cache_store.update({str(k): v for k, v in state.video_clips.items() if v})
+            cache_store.update({k: v for k, v in state.video_clips.items() if v})
 
         for ordered_i, (seg_i, _, _, _, _) in enumerate(all_specs):
             # 1) 当前故事目录中已存在片段（新命名/旧命名）优先复用
@@ -1130,7 +1139,7 @@ async def generate_story_video(
                 continue
 
             # 2) 复用状态缓存或预生成缓存
-            cached = cache_store.get(str(seg_i))
+            cached = cache_store.get(seg_i)
             if not cached:
                 continue
             if os.path.exists(cached) or cached.startswith("http"):
@@ -1145,6 +1154,7 @@ async def generate_story_video(
             done = len(results)
             task_info["generated_clips"] = done
             task_info["progress"] = int(done / total * 70) if total else 0
+            _publish_status(task_info)
 
         update_progress()
         logger.info(f"[视频服务] 可复用已有片段: {len(results)}，待新生成: {len(specs)}")
@@ -1208,13 +1218,14 @@ async def generate_story_video(
         if not results:
             task_info["status"] = VideoGenerationStatus.FAILED
             task_info["error"] = "没有成功生成任何视频片段"
+            _publish_status(task_info)
             return task_info
 
         # 按 segment_index 顺序拼接（顺序必须正确）
         ordered_indices = sorted(results.keys())
         video_clips: List[str] = []
         audio_clips = []
-        clip_index_updates: Dict[str, str] = {}
+        clip_index_updates: Dict[int, str] = {}
 
         for k, seg_i in enumerate(ordered_indices):
             ref = results[seg_i]
@@ -1242,7 +1253,7 @@ async def generate_story_video(
             video_clips.append(clip_local_path)
 
             if os.path.exists(clip_local_path):
-                clip_index_updates[str(seg_i)] = clip_local_path
+                clip_index_updates[seg_i] = clip_local_path
 
             if enable_audio and seg_i < len(segments) and segments[seg_i].text:
                 existing_story_audio = _pick_existing_story_media_path(
@@ -1326,10 +1337,12 @@ async def generate_story_video(
 
         task_info["status"] = VideoGenerationStatus.MERGING
         task_info["progress"] = 75
+        _publish_status(task_info)
         output_path = temp_dir / f"story_{story_id}_final.mp4"
         if enable_audio and any(audio_clips):
             task_info["status"] = VideoGenerationStatus.ADDING_AUDIO
             task_info["progress"] = 85
+            _publish_status(task_info)
 
         final_video_path = await merge_videos_with_audio(
             video_clips=video_clips,
@@ -1342,18 +1355,81 @@ async def generate_story_video(
         task_info["status"] = VideoGenerationStatus.COMPLETED
         task_info["progress"] = 100
         task_info["video_url"] = final_video_path
+        _publish_status(task_info)
         return task_info
 
     except Exception as e:
         logger.error(f"[视频服务] ❌ 故事视频生成失败: {type(e).__name__}: {e}", exc_info=True)
         task_info["status"] = VideoGenerationStatus.FAILED
         task_info["error"] = str(e)
+        _publish_status(task_info)
         return task_info
 
 
+def _status_file(story_id: str) -> Path:
+    return VIDEO_STATUS_DIR / f"{story_id}.json"
+
+
+def _publish_status(task_info: Dict) -> None:
+    """发布一次状态快照（替换而非原地修改，读方拿到的始终是完整一致的 dict）。"""
+    snapshot = dict(task_info)
+    _video_tasks[snapshot["story_id"]] = snapshot
+    event = _status_events.pop(snapshot["story_id"], None)
+    if event is not None:
+        event.set()
+    if MULTI_WORKER:
+        path = _status_file(snapshot["story_id"])
+        try:
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(orjson.dumps(snapshot))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[视频服务] 写入状态快照失败: {snapshot['story_id']}, {e}")
+
+
 def get_video_generation_status(story_id: str) -> Optional[Dict]:
-    """获取视频生成状态"""
-    return _video_tasks.get(story_id)
+    """获取视频生成状态（本进程快照优先，多进程时回退到其他 worker 写入的状态文件）"""
+    status = _video_tasks.get(story_id)
+    if status is None and MULTI_WORKER:
+        try:
+            status = orjson.loads(_status_file(story_id).read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+    return status
+
+
+async def watch_video_generation_status(story_id: str) -> AsyncIterator[Optional[Dict]]:
+    """
+    订阅视频生成状态：先产出当前状态，之后每次状态变化（或心跳超时）再产出一次，
+    到达 completed / failed 后结束。无任务时产出 None，并最多再等一个心跳周期
+    （覆盖刚提交生成、后台任务尚未发布状态的情况），仍无任务则结束。
+    """
+    _status_watchers[story_id] = _status_watchers.get(story_id, 0) + 1
+    try:
+        waited_idle = False
+        while True:
+            event = _status_events.get(story_id)
+            if event is None:
+                event = _status_events[story_id] = asyncio.Event()
+            status = get_video_generation_status(story_id)
+            if status is None:
+                if waited_idle:
+                    return
+                waited_idle = True
+            elif status["status"] in (VideoGenerationStatus.COMPLETED, VideoGenerationStatus.FAILED):
+                yield status
+                return
+            yield status
+            try:
+                await asyncio.wait_for(event.wait(), timeout=STATUS_WATCH_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        remaining = _status_watchers.pop(story_id, 1) - 1
+        if remaining > 0:
+            _status_watchers[story_id] = remaining
+        else:
+            _status_events.pop(story_id, None)
 
 
 async def generate_video_clip_between_segments(
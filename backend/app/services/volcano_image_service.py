@@ -163,8 +163,8 @@ async def generate_image_volcano(
                 if compress:
                     compressed_path = await compress_and_save_image(image_url)
                     logger.info(f"[火山即梦] ✅ 图片已压缩: {compressed_path}")
-                    # 转换为可访问的相对路径 URL
-                    if Path(compressed_path).is_file():
+                    # 转换为可访问的相对路径 URL（压缩失败时返回的是原始 URL）
+                    if compressed_path != image_url:
                         filename = Path(compressed_path).name
                         return f"/static/images/{filename}"
                     return compressed_path
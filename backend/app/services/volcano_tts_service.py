@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Optional
 
 from app.config import get_settings
-from app.utils.paths import AUDIO_DIR, PROJECT_ROOT
+from app.utils.paths import PROJECT_ROOT, VOLCANO_TTS_AUDIO_DIR, VOLCANO_PREVIEW_AUDIO_DIR
 from app.constants.voices import (
     DEFAULT_PREMIUM_VOICE_ID,
     PREVIEW_TEXT,
@@ -18,12 +18,6 @@ from app.constants.voices import (
 
 logger = logging.getLogger(__name__)
 
-# TTS 音频存储路径
-VOLCANO_TTS_AUDIO_DIR = AUDIO_DIR / "volcano_tts"
-VOLCANO_TTS_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-VOLCANO_PREVIEW_AUDIO_DIR = AUDIO_DIR / "preview_volcano"
-VOLCANO_PREVIEW_AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-
 logger.info(f"[火山TTS] 音频目录: {VOLCANO_TTS_AUDIO_DIR}")
 
 
@@ -57,8 +51,9 @@ def get_cluster(voice: str) -> str:
     return "volcano_tts"
 
 
+@lru_cache(maxsize=1)
 def is_volcano_tts_available() -> bool:
-    """检查线上 TTS 配置是否可用。"""
+    """检查线上 TTS 配置是否可用（纯配置判断，进程内只计算一次）。"""
     settings = get_settings()
     return bool(settings.volcano_tts_appid and settings.volcano_tts_access_token)
 
@@ -201,7 +196,7 @@ async def generate_preview_audio_volcano(voice_id: str, force_regenerate: bool =
         logger.info(f"[火山TTS] ✅ 使用缓存预览音频: {voice_id} ({file_size_kb:.1f}KB)")
         return f"data/audio/preview_volcano/{filename}"
 
-    preview_text = PREVIEW_TEXT.format(voice_name=voice_info["name"])
+    preview_text = PREVIEW_TEXT.format(voice_name=voice_info.name)
     await generate_tts_audio_volcano(
         text=preview_text,
         output_path=str(output_path),
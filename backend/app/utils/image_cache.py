@@ -2,6 +2,8 @@
 import hashlib
 import json
 import logging
+import os
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 from app.utils.paths import IMAGE_CACHE_DIR, PROJECT_ROOT, BACKEND_ROOT
@@ -13,6 +15,20 @@ CACHE_DIR = IMAGE_CACHE_DIR
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 CACHE_MAP_FILE = CACHE_DIR / "cache_map.json"
 
+# 两级缓存：
+# L1 进程内 LRU（缓存键 -> 已确认存在的绝对路径），命中时不读映射文件、不 stat 图片；
+# L2 映射文件的内存副本，按文件 mtime 失效，其他 worker 写入后自动重新加载（映射文件即跨进程共享层）。
+L1_MAX_ENTRIES = 512
+_l1: "OrderedDict[str, str]" = OrderedDict()
+_map_cache: Optional[tuple[int, dict]] = None
+
+
+def _l1_put(cache_key: str, resolved_path: str) -> None:
+    _l1[cache_key] = resolved_path
+    _l1.move_to_end(cache_key)
+    if len(_l1) > L1_MAX_ENTRIES:
+        _l1.popitem(last=False)
+
 
 def _resolve_image_path(path_str: str) -> Path:
     """将缓存中的相对/绝对路径统一解析为绝对路径。"""
@@ -50,22 +66,33 @@ def get_cache_key(prompt: str, style_id: str) -> str:
 
 
 def _load_cache_map() -> dict:
-    """加载缓存映射"""
-    if not CACHE_MAP_FILE.exists():
+    """加载缓存映射（文件未变化时直接返回内存副本）"""
+    global _map_cache
+    try:
+        mtime = CACHE_MAP_FILE.stat().st_mtime_ns
+    except OSError:
         return {}
+    if _map_cache is not None and _map_cache[0] == mtime:
+        return _map_cache[1]
     try:
-        return json.loads(CACHE_MAP_FILE.read_text(encoding="utf-8"))
+        cache_map = json.loads(CACHE_MAP_FILE.read_text(encoding="utf-8"))
     except Exception as e:
         logger.warning(f"[图片缓存] 加载缓存映射失败: {e}")
         return {}
+    _map_cache = (mtime, cache_map)
+    return cache_map
 
 
 def _save_cache_map(cache_map: dict) -> None:
-    """保存缓存映射"""
+    """保存缓存映射（先写临时文件再替换）"""
+    global _map_cache
     try:
-        CACHE_MAP_FILE.write_text(
+        tmp_path = CACHE_MAP_FILE.with_name(f"{CACHE_MAP_FILE.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
             json.dumps(cache_map, ensure_ascii=False, indent=2), encoding="utf-8"
         )
+        os.replace(tmp_path, CACHE_MAP_FILE)
+        _map_cache = (CACHE_MAP_FILE.stat().st_mtime_ns, cache_map)
     except Exception as e:
         logger.error(f"[图片缓存] 保存缓存映射失败: {e}")
 
@@ -86,6 +113,12 @@ def get_cached_image(prompt: str, style_id: str) -> Optional[str]:
         'data/images/abc123.jpg'
     """
     cache_key = get_cache_key(prompt, style_id)
+    cached = _l1.get(cache_key)
+    if cached is not None:
+        _l1.move_to_end(cache_key)
+        logger.info(f"[图片缓存] ✅ 命中（内存），缓存键: {cache_key}")
+        return cached
+
     cache_map = _load_cache_map()
 
     if cache_key in cache_map:
@@ -95,6 +128,7 @@ def get_cached_image(prompt: str, style_id: str) -> Optional[str]:
         # 验证文件是否存在
         if resolved.exists():
             logger.info(f"[图片缓存] ✅ 命中，缓存键: {cache_key}")
+            _l1_put(cache_key, str(resolved))
             return str(resolved)
         else:
             # 文件已删除，清理缓存映射
@@ -125,6 +159,7 @@ def save_image_cache(prompt: str, style_id: str, image_path: str) -> None:
 
     cache_map[cache_key] = image_path
     _save_cache_map(cache_map)
+    _l1.pop(cache_key, None)
 
     logger.info(
         f"[图片缓存] ✅ 已保存，缓存键: {cache_key}, 路径: {image_path}"
@@ -140,6 +175,7 @@ def clear_cache() -> int:
     """
     cache_map = _load_cache_map()
     count = len(cache_map)
+    _l1.clear()
 
     if count > 0:
         _save_cache_map({})
@@ -0,0 +1,117 @@
+"""流式 JSON 增量解析：边接收 LLM 输出边解析顶层对象，已闭合的字段 / 数组元素立即可用"""
+from typing import Any, List, Optional
+
+import orjson
+
+
+class StreamingJSONObject:
+    """
+    增量解析一个顶层 JSON 对象（对象之前的 markdown 代码块等多余文本会被跳过）。
+
+    每次 feed 只扫描新到达的文本：顶层字段的值闭合后立即解析进 fields；
+    array_key 指定的数组字段，其中每个对象元素闭合时即解析并返回，无需等待整个数组结束。
+    任一片段解析失败时 error 置为 True，调用方应在结束后回退到整体修复解析。
+    """
+
+    def __init__(self, array_key: Optional[str] = None):
+        self.array_key = array_key
+        self.fields: dict = {}
+        self.items: List[Any] = []
+        self.done = False
+        self.error = False
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Any]:
+        """追加一段文本，返回本次新闭合的 array_key 数组元素。"""
+        self._text += chunk
+        text = self._text
+        stack = self._stack
+        new_items: List[Any] = []
+        i = self._pos
+        n = len(text)
+        while i < n and not self.done:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = self._loads(text[self._key_start:i + 1])
+                        self._key_start = None
+            elif not stack:
+                # 尚未进入顶层对象
+                if c == "{":
+                    stack.append(c)
+                    self._expect_key = True
+            elif c == '"':
+                self._in_string = True
+                if len(stack) == 1 and self._expect_key:
+                    self._key_start = i
+            elif c == ":" and len(stack) == 1 and self._expect_key:
+                self._expect_key = False
+                self._value_start = i + 1
+            elif c in "{[":
+                stack.append(c)
+                if (
+                    c == "{"
+                    and len(stack) == 3
+                    and stack[1] == "["
+                    and self._key == self.array_key
+                ):
+                    self._item_start = i
+            elif c in "}]":
+                if len(stack) == 3 and self._item_start is not None and c == "}":
+                    item = self._loads(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        self.items.append(item)
+                        new_items.append(item)
+                stack.pop()
+                if not stack:
+                    self._finish_member(text, i)
+                    self.done = True
+            elif c == "," and len(stack) == 1:
+                self._finish_member(text, i)
+                self._expect_key = True
+            i += 1
+        self._pos = i
+        return new_items
+
+    def result(self) -> Optional[dict]:
+        """顶层对象完整且各片段均解析成功时返回结果 dict，否则返回 None。"""
+        if not self.done or self.error:
+            return None
+        return self.fields
+
+    def _finish_member(self, text: str, end: int) -> None:
+        key, start = self._key, self._value_start
+        self._key = None
+        self._value_start = None
+        if key is None or start is None:
+            return
+        value = text[start:end].strip()
+        if key == self.array_key and value.startswith("["):
+            # 数组元素已逐个解析，无需再整体解析一次
+            self.fields[key] = self.items
+            return
+        if value:
+            self.fields[key] = self._loads(value)
+
+    def _loads(self, raw: str) -> Any:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            self.error = True
+            return None
@@ -11,7 +11,17 @@ IMAGES_DIR = BACKEND_DATA_DIR / "images"
 STORIES_DIR = BACKEND_DATA_DIR / "stories"
 AUDIO_DIR = BACKEND_DATA_DIR / "audio"
 IMAGE_CACHE_DIR = BACKEND_DATA_DIR / "image_cache"
+VIDEO_STATUS_DIR = BACKEND_DATA_DIR / "video_status"
+
+# 音频子目录（生成服务写入、静态挂载读取共用同一组常量）
+TTS_AUDIO_DIR = AUDIO_DIR / "tts"
+PREVIEW_AUDIO_DIR = AUDIO_DIR / "preview"
+VOLCANO_TTS_AUDIO_DIR = AUDIO_DIR / "volcano_tts"
+VOLCANO_PREVIEW_AUDIO_DIR = AUDIO_DIR / "preview_volcano"
 
 # 初始化目录
-for _p in [BACKEND_DATA_DIR, IMAGES_DIR, STORIES_DIR, AUDIO_DIR, IMAGE_CACHE_DIR]:
+for _p in [
+    BACKEND_DATA_DIR, IMAGES_DIR, STORIES_DIR, AUDIO_DIR, IMAGE_CACHE_DIR, VIDEO_STATUS_DIR,
+    TTS_AUDIO_DIR, PREVIEW_AUDIO_DIR, VOLCANO_TTS_AUDIO_DIR, VOLCANO_PREVIEW_AUDIO_DIR,
+]:
     _p.mkdir(parents=True, exist_ok=True)
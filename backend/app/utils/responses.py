@@ -0,0 +1,25 @@
+"""全局 JSON 响应类：基于 orjson 序列化；条件请求（ETag）辅助函数"""
+from typing import Any
+
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+
+class AppJSONResponse(JSONResponse):
+    """
+    用 orjson 替代标准库 json 编码响应体。
+    允许非字符串字典键（如 {segment_index: url}），与标准库 json 的行为保持一致。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """请求头 If-None-Match 是否命中给定 ETag（忽略弱校验前缀 W/）。"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in candidates or "*" in candidates
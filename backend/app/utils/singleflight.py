@@ -0,0 +1,50 @@
+"""同键并发请求合并（singleflight）：同一时刻相同 key 只执行一次，其余调用方等待同一结果"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+def start_once(
+    inflight: Dict[Hashable, "asyncio.Task[Any]"],
+    key: Hashable,
+    factory: Callable[[], Awaitable[T]],
+) -> "asyncio.Task[T]":
+    """
+    若 key 已在执行中则返回已有任务，否则用 factory() 创建任务并登记；任务结束后自动移除。
+    与 run_once 相同，但不等待结果，供需要在任务运行期间另行取得中间结果的调用方使用。
+    """
+    loop = asyncio.get_running_loop()
+    full_key = (id(loop), key)
+    task = inflight.get(full_key)
+    if task is None:
+        task = loop.create_task(factory())
+        inflight[full_key] = task
+
+        def _cleanup(t: "asyncio.Task[Any]") -> None:
+            if inflight.get(full_key) is t:
+                inflight.pop(full_key, None)
+
+        task.add_done_callback(_cleanup)
+    return task
+
+
+async def run_once(
+    inflight: Dict[Hashable, "asyncio.Task[Any]"],
+    key: Hashable,
+    factory: Callable[[], Awaitable[T]],
+) -> T:
+    """
+    若 key 已在执行中则等待已有任务，否则用 factory() 创建任务并登记；任务结束后自动移除。
+
+    Args:
+        inflight: 调用方持有的进行中任务表
+        key: 去重键（内部会附加当前事件循环，避免跨循环等待）
+        factory: 实际执行的协程工厂
+
+    Returns:
+        任务结果；异常会传播给所有等待方
+    """
+    task = start_once(inflight, key, factory)
+    # shield：某个等待方被取消时不影响共享任务和其他等待方
+    return await asyncio.shield(task)
@@ -1,6 +1,7 @@
 """故事状态存储：内存+文件持久化（后端重启不丢失）"""
 import json
 import logging
+import os
 from typing import Optional, List
 import uuid
 from app.models.story import StoryState
@@ -13,10 +14,32 @@ logger = logging.getLogger(__name__)
 _stories: dict[str, StoryState] = {}
 _story_order: List[str] = []  # 创建顺序，用于画廊（新在前）
 
+# 多进程部署（uvicorn --workers N / gunicorn，均通过 WEB_CONCURRENCY 传入进程数）时每个 worker 各有一份内存缓存，
+# 需按文件修改时间感知其他 worker 的写入；单进程时跳过这些 stat 检查。
+MULTI_WORKER = int(os.environ.get("WEB_CONCURRENCY", "1") or 1) > 1
+_file_mtimes: dict[str, int] = {}  # story_id -> 内存副本对应的文件 mtime_ns
+_dir_mtime = 0
+
+# 画廊列表缓存：任何故事写入/加载都会递增版本号，版本不变时直接复用上次结果
+_list_version = 0
+_list_cache: Optional[tuple[int, List[dict]]] = None
+
+
+def _invalidate_list_cache() -> None:
+    global _list_version
+    _list_version += 1
+
 # 文件存储目录
 INDEX_FILE = STORIES_DIR / "_index.json"
 
 
+def _write_text_atomic(path, text: str) -> None:
+    """先写临时文件再替换，其他 worker 不会读到写了一半的文件。"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
 def _save_story_to_file(state: StoryState) -> None:
     """将故事保存到文件"""
     try:
@@ -26,19 +49,58 @@ def _save_story_to_file(state: StoryState) -> None:
         segments = data.get("segments") or []
         for seg in segments:
             seg["image_url"] = normalize_image_url(seg.get("image_url"))
-        story_file.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        logger.debug(f"[存储] 故事已保存到文件: {story_file}")
+        _write_text_atomic(story_file, json.dumps(data, ensure_ascii=False, indent=2))
+        if MULTI_WORKER:
+            _file_mtimes[state.id] = story_file.stat().st_mtime_ns
+        logger.debug("[存储] 故事已保存到文件: %s", story_file)
     except Exception as e:
-        logger.error(f"[存储] ❌ 保存故事文件失败: {e}", exc_info=True)
+        logger.error("[存储] ❌ 保存故事文件失败: %s", e, exc_info=True)
 
 
 def _save_index() -> None:
     """保存故事索引（顺序）"""
     try:
-        INDEX_FILE.write_text(json.dumps(_story_order, ensure_ascii=False), encoding="utf-8")
-        logger.debug(f"[存储] 索引已保存，共 {len(_story_order)} 个故事")
+        if MULTI_WORKER:
+            _merge_index_from_disk()
+        _write_text_atomic(INDEX_FILE, json.dumps(_story_order, ensure_ascii=False))
+        logger.debug("[存储] 索引已保存，共 %s 个故事", len(_story_order))
     except Exception as e:
-        logger.error(f"[存储] ❌ 保存索引失败: {e}", exc_info=True)
+        logger.error("[存储] ❌ 保存索引失败: %s", e, exc_info=True)
+
+
+def _merge_index_from_disk() -> None:
+    """把其他 worker 写入索引的故事 ID 合并进内存顺序（保持磁盘上的先后顺序）。"""
+    try:
+        disk_order = json.loads(INDEX_FILE.read_text(encoding="utf-8")) if INDEX_FILE.exists() else []
+    except Exception:
+        return
+    known = set(disk_order)
+    merged = disk_order + [sid for sid in _story_order if sid not in known]
+    if merged != _story_order:
+        _story_order[:] = merged
+        _invalidate_list_cache()
+
+
+def _sync_from_disk() -> None:
+    """多进程下：故事目录有变化（新建/替换文件都会更新目录 mtime）时重新合并索引并失效列表缓存。"""
+    global _dir_mtime
+    try:
+        mtime = STORIES_DIR.stat().st_mtime_ns
+    except OSError:
+        return
+    if mtime != _dir_mtime:
+        _dir_mtime = mtime
+        _merge_index_from_disk()
+        _invalidate_list_cache()
+
+
+def _is_stale(story_id: str) -> bool:
+    """多进程下：文件被其他 worker 更新过则内存副本已过期。"""
+    try:
+        mtime = (STORIES_DIR / f"{story_id}.json").stat().st_mtime_ns
+    except OSError:
+        return False
+    return mtime != _file_mtimes.get(story_id)
 
 
 def load_stories_from_disk() -> None:
@@ -51,9 +113,9 @@ def load_stories_from_disk() -> None:
             _story_order.clear()
             order_data = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
             _story_order.extend(order_data)
-            logger.info(f"[存储] ✅ 索引加载完成，共 {len(_story_order)} 个故事")
+            logger.info("[存储] ✅ 索引加载完成，共 %s 个故事", len(_story_order))
         except Exception as e:
-            logger.error(f"[存储] ❌ 加载索引失败: {e}", exc_info=True)
+            logger.error("[存储] ❌ 加载索引失败: %s", e, exc_info=True)
     
     # 加载所有故事文件
     loaded_count = 0
@@ -75,18 +137,22 @@ def load_stories_from_disk() -> None:
                         seg["image_url"] = new
                         normalized = True
                 _stories[story_id] = StoryState(**data)
+                if MULTI_WORKER:
+                    _file_mtimes[story_id] = story_file.stat().st_mtime_ns
                 loaded_count += 1
                 if normalized:
                     _save_story_to_file(_stories[story_id])
-                logger.debug(f"[存储] 加载故事: {story_id} - {data.get('title', 'untitled')}")
+                logger.debug("[存储] 加载故事: %s - %s", story_id, data.get('title', 'untitled'))
         except Exception as e:
-            logger.error(f"[存储] ❌ 加载故事文件失败 {story_file}: {e}", exc_info=True)
+            logger.error("[存储] ❌ 加载故事文件失败 %s: %s", story_file, e, exc_info=True)
     
-    logger.info(f"[存储] ✅ 故事加载完成，共 {loaded_count} 个故事")
+    _invalidate_list_cache()
+    logger.info("[存储] ✅ 故事加载完成，共 %s 个故事", loaded_count)
 
 
 def save_story(state: StoryState) -> StoryState:
     """保存故事到内存和文件"""
+    state.revision += 1
     for seg in state.segments:
         seg.image_url = normalize_image_url(seg.image_url)
     _stories[state.id] = state
@@ -94,43 +160,50 @@ def save_story(state: StoryState) -> StoryState:
         _story_order.append(state.id)
         _save_index()
     _save_story_to_file(state)
+    _invalidate_list_cache()
     return state
 
 
 def get_story(story_id: str) -> Optional[StoryState]:
     """获取故事（先从内存，如未找到则尝试从文件加载）"""
-    # 先从内存获取
-    if story_id in _stories:
+    # 先从内存获取（多进程时需确认没有被其他 worker 更新过）
+    if story_id in _stories and not (MULTI_WORKER and _is_stale(story_id)):
         return _stories[story_id]
     
     # 尝试从文件加载
     story_file = STORIES_DIR / f"{story_id}.json"
     if story_file.exists():
         try:
+            mtime = story_file.stat().st_mtime_ns
             data = json.loads(story_file.read_text(encoding="utf-8"))
             story = StoryState(**data)
             _stories[story_id] = story  # 加载到内存
+            if MULTI_WORKER:
+                _file_mtimes[story_id] = mtime
             if story_id not in _story_order:
                 _story_order.append(story_id)
-            logger.info(f"[存储] 从文件加载故事: {story_id}")
+            _invalidate_list_cache()
+            logger.info("[存储] 从文件加载故事: %s", story_id)
             return story
         except Exception as e:
-            logger.error(f"[存储] ❌ 从文件加载故事失败 {story_id}: {e}", exc_info=True)
+            logger.error("[存储] ❌ 从文件加载故事失败 %s: %s", story_id, e, exc_info=True)
     
     return None
 
 
 def update_story(story_id: str, **kwargs) -> Optional[StoryState]:
     """更新故事并保存到文件"""
-    s = _stories.get(story_id)
+    s = get_story(story_id) if MULTI_WORKER else _stories.get(story_id)
     if not s:
         return None
     for k, v in kwargs.items():
         if hasattr(s, k):
             setattr(s, k, v)
+    s.revision += 1
     for seg in s.segments:
         seg.image_url = normalize_image_url(seg.image_url)
     _save_story_to_file(s)
+    _invalidate_list_cache()
     return s
 
 
@@ -139,13 +212,23 @@ def new_story_id() -> str:
 
 
 def list_stories() -> List[dict]:
-    """返回所有故事摘要（用于画廊），按创建时间倒序。"""
+    """返回所有故事摘要（用于画廊），按创建时间倒序。结果按版本号缓存，返回的是各条目的浅拷贝。"""
+    global _list_cache
+    if MULTI_WORKER:
+        _sync_from_disk()
+    if _list_cache is None or _list_cache[0] != _list_version:
+        items = _build_story_list()
+        # 构建过程中 get_story 从文件加载故事会递增版本号，而加载结果已反映在本次列表中，
+        # 因此在构建完成后再记录版本号，否则下一次调用总会重新构建
+        _list_cache = (_list_version, items)
+    return [dict(item) for item in _list_cache[1]]
+
+
+def _build_story_list() -> List[dict]:
     result = []
     for story_id in reversed(_story_order):
-        state = _stories.get(story_id)
-        if not state:
-            # 尝试从文件加载
-            state = get_story(story_id)
+        # 内存优先；不在内存（或多进程下已过期）时从文件加载
+        state = get_story(story_id)
         if not state:
             continue
         cover_url = None
@@ -1,9 +1,13 @@
 """用户与登录态：本地文件系统存储"""
+import fcntl
 import hashlib
 import json
 import re
+import os
 import secrets
+from contextlib import contextmanager
 from pathlib import Path
+from threading import Lock
 from typing import Optional
 
 from app.config import get_settings
@@ -25,6 +29,13 @@ def _tokens_path() -> Path:
     return base / "tokens.json"
 
 
+def _write_json_atomic(path: Path, data, indent: Optional[int] = 2) -> None:
+    """先写临时文件再替换，避免并发读到写了一半的文件。"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=indent), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
 def _email_to_filename(email: str) -> str:
     """将邮箱转为安全文件名（小写、替换特殊字符）"""
     safe = email.strip().lower().replace("@", "_at_").replace(".", "_")
@@ -86,7 +97,7 @@ def create_user(email: str, password: str) -> dict:
         "created_at": str(int(time.time())),
     }
     path = _users_dir() / _email_to_filename(email)
-    path.write_text(json.dumps(user, ensure_ascii=False, indent=2), encoding="utf-8")
+    _write_json_atomic(path, user)
     return {"email": user["email"], "is_paid": user["is_paid"], "created_at": user["created_at"]}
 
 
@@ -98,10 +109,39 @@ def set_user_paid(email: str) -> None:
         raise ValueError("用户不存在")
     data = json.loads(path.read_text(encoding="utf-8"))
     data["is_paid"] = True
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    _write_json_atomic(path, data)
+
+
+# ---------- 登录态 token（内存 + 追加日志持久化，便于重启保留）-----------
+# tokens.json 为快照，tokens.log 为追加日志（每行 {"t": token, "e": email}，e 为 null 表示登出）。
+# 登录/登出只追加一行，不再整文件重写；读取走内存字典，日志有新增（含其他进程写入）时增量回放。
+# 多进程之间通过 tokens.lock 上的 flock 协调：追加与回放持共享锁，压缩持排他锁。
+# 压缩不原地清空日志，而是以新文件替换（轮换）；新日志首行为 {"g": 代号}，
+# 各进程据 inode 与代号判断日志是否已被轮换，轮换后从快照重新加载。
+TOKEN_LOG_COMPACT_BYTES = 256 * 1024
+
+_tokens_lock = Lock()
+_tokens: Optional[dict] = None
+_token_log_offset = 0
+_token_log_inode = 0
+_token_log_generation: Optional[str] = None
+
+
+def _token_log_path() -> Path:
+    return _tokens_path().with_name("tokens.log")
+
+
+@contextmanager
+def _token_file_lock(exclusive: bool = False):
+    """跨进程的 token 文件锁（flock），与进程内的 _tokens_lock 配合使用。"""
+    with _tokens_path().with_name("tokens.lock").open("a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
 
 
-# ---------- 登录态 token（内存 + 文件持久化，便于重启保留）-----------
 def _load_tokens() -> dict:
     p = _tokens_path()
     if not p.exists():
@@ -112,19 +152,102 @@ def _load_tokens() -> dict:
         return {}
 
 
-def _save_tokens(tokens: dict) -> None:
-    p = _tokens_path()
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(tokens, ensure_ascii=False), encoding="utf-8")
+def _log_generation(first_line: bytes) -> Optional[str]:
+    """解析日志首行的代号；旧格式日志没有代号行，返回 None。"""
+    try:
+        return json.loads(first_line).get("g")
+    except ValueError:
+        return None
+
+
+def _replay_token_log(tokens: dict, offset: int) -> tuple[int, Optional[str]]:
+    """从 offset 处回放日志到 tokens，返回新的偏移量（只消费完整的行）和日志代号。
+    调用方需持有 _token_file_lock。"""
+    log_path = _token_log_path()
+    if not log_path.exists():
+        return 0, None
+    with log_path.open("rb") as f:
+        generation = _log_generation(f.readline())
+        f.seek(offset)
+        chunk = f.read()
+    end = chunk.rfind(b"\n") + 1
+    for line in chunk[:end].splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if "t" not in entry:
+            continue
+        if entry.get("e"):
+            tokens[entry["t"]] = entry["e"]
+        else:
+            tokens.pop(entry["t"], None)
+    return offset + end, generation
+
+
+def _compact_token_log() -> tuple[dict, int, int, str]:
+    """写回快照并轮换日志，返回 (tokens, 新日志 inode, 偏移量, 代号)。
+    在排他锁下重新读取快照与完整日志，其他进程在此之前追加的记录不会丢失。"""
+    with _token_file_lock(exclusive=True):
+        tokens = _load_tokens()
+        _replay_token_log(tokens, 0)
+        _write_json_atomic(_tokens_path(), tokens, indent=None)
+        generation = secrets.token_hex(8)
+        header = (json.dumps({"g": generation}) + "\n").encode("utf-8")
+        log_path = _token_log_path()
+        tmp_path = log_path.with_name(f"{log_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(header)
+        os.replace(tmp_path, log_path)
+        return tokens, log_path.stat().st_ino, len(header), generation
+
+
+def _token_map() -> dict:
+    """返回内存中的 token 表，必要时增量回放日志。调用方需持有 _tokens_lock。"""
+    global _tokens, _token_log_offset, _token_log_inode, _token_log_generation
+    compact = False
+    with _token_file_lock():
+        log_path = _token_log_path()
+        try:
+            st = log_path.stat()
+            inode, size = st.st_ino, st.st_size
+        except FileNotFoundError:
+            inode, size = 0, 0
+        if _tokens is None or inode != _token_log_inode or size < _token_log_offset:
+            tokens = _load_tokens()
+            offset, generation = _replay_token_log(tokens, 0)
+            _tokens, _token_log_offset = tokens, offset
+            _token_log_inode, _token_log_generation = inode, generation
+            compact = offset > TOKEN_LOG_COMPACT_BYTES
+        elif size > _token_log_offset:
+            tokens = dict(_tokens)
+            offset, generation = _replay_token_log(tokens, _token_log_offset)
+            if generation == _token_log_generation:
+                _tokens, _token_log_offset = tokens, offset
+            else:
+                # inode 被新一代日志复用：从快照完整重新加载
+                tokens = _load_tokens()
+                offset, generation = _replay_token_log(tokens, 0)
+                _tokens, _token_log_offset, _token_log_generation = tokens, offset, generation
+    if compact:
+        _tokens, _token_log_inode, _token_log_offset, _token_log_generation = _compact_token_log()
+    return _tokens
+
+
+def _append_token_log(token: str, email: Optional[str]) -> None:
+    line = json.dumps({"t": token, "e": email}, ensure_ascii=False) + "\n"
+    with _token_file_lock():
+        with _token_log_path().open("a", encoding="utf-8") as f:
+            f.write(line)
 
 
 def create_token(email: str) -> str:
     """创建登录 token，关联邮箱。返回 token 字符串。"""
     email = email.strip().lower()
     token = secrets.token_urlsafe(32)
-    tokens = _load_tokens()
-    tokens[token] = email
-    _save_tokens(tokens)
+    with _tokens_lock:
+        tokens = _token_map()
+        _append_token_log(token, email)
+        tokens[token] = email
     return token
 
 
@@ -132,15 +255,17 @@ def get_email_by_token(token: str) -> Optional[str]:
     """根据 token 取邮箱，无效则返回 None。"""
     if not token or not token.strip():
         return None
-    tokens = _load_tokens()
-    return tokens.get(token.strip())
+    with _tokens_lock:
+        return _token_map().get(token.strip())
 
 
 def delete_token(token: str) -> None:
     """登出：删除 token。"""
-    tokens = _load_tokens()
-    tokens.pop(token, None)
-    _save_tokens(tokens)
+    with _tokens_lock:
+        tokens = _token_map()
+        if token in tokens:
+            _append_token_log(token, None)
+            tokens.pop(token, None)
 
 
 def update_user_preferences(email: str, preferences: dict) -> None:
@@ -166,7 +291,7 @@ def update_user_preferences(email: str, preferences: dict) -> None:
             data["playback_speed"] = preferences["playback_speed"]
         
         # 保存
-        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        _write_json_atomic(path, data)
     except json.JSONDecodeError:
         raise ValueError("用户数据损坏")
 
@@ -0,0 +1,220 @@
+"""用户与登录态的短时内存缓存（包装 user_store，减少轮询 /me 时的磁盘读取）
+
+只缓存命中结果（用户存在 / token 有效），写操作会同步失效对应条目。
+多进程部署时其他 worker 的登出无法通知本进程，token 相关结果不做缓存，每次交给 user_store
+校验（其内存 token 表会增量回放其他 worker 追加的登录/登出日志）。
+偏好设置的写入先合并在内存中，由后台任务定期批量落盘。
+"""
+import asyncio
+import logging
+import time
+from threading import RLock
+from typing import Dict, Optional, Tuple
+
+from app.utils import user_store
+from app.utils.store import MULTI_WORKER
+from app.utils.user_store import (  # noqa: F401  直接透传的无状态函数
+    validate_email,
+    verify_user,
+    create_token,
+)
+
+# 缓存有效期（秒）与最大条目数
+CACHE_TTL_SECONDS = 60.0
+CACHE_MAX_ENTRIES = 10_000
+
+_lock = RLock()
+_users: Dict[str, Tuple[float, dict]] = {}
+_tokens: Dict[str, Tuple[float, str]] = {}
+# token -> 用户信息（登录态依赖的快速路径）；条目记录写入时的 (登出版本号, 该用户版本号)，
+# 用户变更只递增该邮箱的版本号，登出递增全局登出版本号，版本不符的条目视为失效
+_sessions: Dict[str, Tuple[float, Tuple[int, int, dict]]] = {}
+_logout_epoch = 0
+_user_epochs: Dict[str, int] = {}
+
+# 偏好设置写入合并：email -> 待落盘的偏好（同一用户多次保存只保留合并后的最新值）
+PREFERENCES_FLUSH_INTERVAL = 0.5
+_pending_prefs: Dict[str, dict] = {}
+_prefs_flusher: Optional["asyncio.Task[None]"] = None
+
+logger = logging.getLogger(__name__)
+
+
+def _get(cache: dict, key: str):
+    with _lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            cache.pop(key, None)
+            return None
+        return value
+
+
+def _put(cache: dict, key: str, value) -> None:
+    with _lock:
+        if len(cache) >= CACHE_MAX_ENTRIES:
+            cache.clear()
+        cache[key] = (time.monotonic() + CACHE_TTL_SECONDS, value)
+
+
+def invalidate_user(email: str) -> None:
+    key = email.strip().lower()
+    with _lock:
+        _users.pop(key, None)
+        _user_epochs[key] = _user_epochs.get(key, 0) + 1
+
+
+def get_user_by_email(email: str) -> Optional[dict]:
+    """同 user_store.get_user_by_email，命中缓存时不读文件。返回副本，调用方可随意修改。"""
+    key = email.strip().lower()
+    user = _get(_users, key)
+    if user is None:
+        user = user_store.get_user_by_email(key)
+        if user is None:
+            return None
+        _put(_users, key, user)
+    user = dict(user)
+    with _lock:
+        pending = _pending_prefs.get(key)
+        if pending:
+            # 尚未落盘的偏好覆盖在读取结果上，保证“写后读”一致
+            user.update(pending)
+    return user
+
+
+def get_email_by_token(token: str) -> Optional[str]:
+    """同 user_store.get_email_by_token，命中缓存时不读 tokens.json。"""
+    if not token or not token.strip():
+        return None
+    key = token.strip()
+    if MULTI_WORKER:
+        return user_store.get_email_by_token(key)
+    email = _get(_tokens, key)
+    if email is None:
+        email = user_store.get_email_by_token(key)
+        if email is None:
+            return None
+        _put(_tokens, key, email)
+    return email
+
+
+def peek_user_by_token(token: str) -> Optional[dict]:
+    """只查内存缓存（不读文件）：命中返回用户信息副本，否则返回 None（多进程部署时总是 None）。"""
+    if not token or MULTI_WORKER:
+        return None
+    with _lock:
+        entry = _get(_sessions, token.strip())
+        if entry is None:
+            return None
+        logout_epoch, user_epoch, user = entry
+        if logout_epoch != _logout_epoch or user_epoch != _user_epochs.get(user["email"], 0):
+            return None
+        return dict(user)
+
+
+def get_user_by_token(token: str) -> Optional[dict]:
+    """按 token 取用户信息（可能读文件），结果写入会话缓存。"""
+    key = (token or "").strip()
+    # 版本号在读取之前记下：读取期间发生的登出/用户变更会使本次写入的条目直接失效
+    with _lock:
+        logout_epoch = _logout_epoch
+    email = get_email_by_token(key)
+    if not email:
+        return None
+    with _lock:
+        user_epoch = _user_epochs.get(email, 0)
+    user = get_user_by_email(email)
+    if user is None:
+        return None
+    if not MULTI_WORKER:
+        _put(_sessions, key, (logout_epoch, user_epoch, user))
+    return dict(user)
+
+
+def create_user(email: str, password: str) -> dict:
+    user = user_store.create_user(email, password)
+    invalidate_user(email)
+    return user
+
+
+def set_user_paid(email: str) -> None:
+    try:
+        user_store.set_user_paid(email)
+    finally:
+        invalidate_user(email)
+
+
+def update_user_preferences(email: str, preferences: dict) -> None:
+    try:
+        user_store.update_user_preferences(email, preferences)
+    finally:
+        invalidate_user(email)
+
+
+def delete_token(token: str) -> None:
+    global _logout_epoch
+    # 先删文件再清缓存，避免并发请求在两者之间把旧 token 重新写回缓存
+    user_store.delete_token(token)
+    with _lock:
+        _tokens.pop(token, None)
+        _tokens.pop(token.strip(), None)
+        _logout_epoch += 1
+
+
+def queue_user_preferences(email: str, preferences: dict) -> None:
+    """登记偏好更新（立即对读取可见），由后台任务在 PREFERENCES_FLUSH_INTERVAL 内合并落盘；
+    进程退出时 stop_preferences_flusher 会写完剩余的偏好。用户不存在时抛 ValueError。"""
+    key = email.strip().lower()
+    if get_user_by_email(key) is None:
+        raise ValueError("用户不存在")
+    with _lock:
+        _pending_prefs.setdefault(key, {}).update(preferences)
+    invalidate_user(key)
+
+
+def flush_pending_preferences() -> int:
+    """把所有待落盘的偏好写入文件，返回写入的用户数。"""
+    with _lock:
+        if not _pending_prefs:
+            return 0
+        batch = dict(_pending_prefs)
+        _pending_prefs.clear()
+    for email, preferences in batch.items():
+        try:
+            update_user_preferences(email, preferences)
+        except ValueError as e:
+            # 用户不存在或数据损坏：重试也不会成功，放弃这批偏好
+            logger.error("[用户缓存] 偏好落盘失败，已放弃: %s, 错误: %s", email, e)
+        except Exception as e:
+            # 写文件失败（磁盘等临时问题）：放回待落盘队列，期间新登记的偏好优先
+            logger.error("[用户缓存] 偏好落盘失败，稍后重试: %s, 错误: %s", email, e)
+            with _lock:
+                _pending_prefs[email] = {**preferences, **_pending_prefs.get(email, {})}
+    return len(batch)
+
+
+async def _preferences_flush_loop() -> None:
+    while True:
+        await asyncio.sleep(PREFERENCES_FLUSH_INTERVAL)
+        if _pending_prefs:
+            await asyncio.to_thread(flush_pending_preferences)
+
+
+def start_preferences_flusher() -> None:
+    """启动偏好落盘任务（须在事件循环内调用；重复调用无副作用）。"""
+    global _prefs_flusher
+    if _prefs_flusher is not None and not _prefs_flusher.done():
+        return
+    _prefs_flusher = asyncio.create_task(_preferences_flush_loop())
+
+
+async def stop_preferences_flusher() -> None:
+    """停止偏好落盘任务，并写完所有待落盘的偏好。"""
+    global _prefs_flusher
+    if _prefs_flusher is not None:
+        _prefs_flusher.cancel()
+        await asyncio.gather(_prefs_flusher, return_exceptions=True)
+        _prefs_flusher = None
+    flush_pending_preferences()
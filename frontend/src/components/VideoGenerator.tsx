@@ -5,6 +5,7 @@ import { motion, AnimatePresence } from "framer-motion";
 import {
   generateVideo,
   getVideoStatus,
+  getVideoStatusStreamUrl,
   getVideoDownloadUrl,
   type VideoStatusResponse,
 } from "@/services/api";
@@ -40,23 +41,26 @@ export default function VideoGenerator({
 
   const { user, token } = useAuthStore();
 
+  const applyStatus = useCallback((statusData: VideoStatusResponse) => {
+    setStatus(statusData);
+
+    // 如果完成或失败，停止轮询
+    if (statusData.status === "completed" || statusData.status === "failed") {
+      setIsGenerating(false);
+      if (statusData.error) {
+        setError(statusData.error);
+      }
+    }
+  }, []);
+
   // 轮询检查视频生成状态
   const pollVideoStatus = useCallback(async () => {
     try {
-      const statusData = await getVideoStatus(storyId);
-      setStatus(statusData);
-
-      // 如果完成或失败，停止轮询
-      if (statusData.status === "completed" || statusData.status === "failed") {
-        setIsGenerating(false);
-        if (statusData.error) {
-          setError(statusData.error);
-        }
-      }
+      applyStatus(await getVideoStatus(storyId));
     } catch (e) {
       console.error("[视频生成] 查询状态失败:", e);
     }
-  }, [storyId]);
+  }, [storyId, applyStatus]);
 
   // 点击「一键转视频」：检查登录状态
   const onVideoButtonClick = () => {
@@ -118,13 +122,41 @@ export default function VideoGenerator({
     checkInitialStatus();
   }, [storyId]);
 
-  // 自动轮询（当正在生成时）
+  // 正在生成时订阅服务端推送（SSE）；浏览器不支持或连接出错时回退到定时轮询
   useEffect(() => {
     if (!isGenerating) return;
 
-    const interval = setInterval(pollVideoStatus, STATUS_POLL_INTERVAL_MS);
-    return () => clearInterval(interval);
-  }, [isGenerating, pollVideoStatus]);
+    let interval: ReturnType<typeof setInterval> | null = null;
+    const startPolling = () => {
+      if (!interval) interval = setInterval(pollVideoStatus, STATUS_POLL_INTERVAL_MS);
+    };
+
+    if (typeof EventSource === "undefined") {
+      startPolling();
+      return () => {
+        if (interval) clearInterval(interval);
+      };
+    }
+
+    const source = new EventSource(getVideoStatusStreamUrl(storyId));
+    source.onmessage = (event) => {
+      try {
+        applyStatus(JSON.parse(event.data) as VideoStatusResponse);
+      } catch (e) {
+        console.error("[视频生成] 状态推送解析失败:", e);
+      }
+    };
+    source.onerror = () => {
+      // 服务端在完成/失败后主动关闭连接也会触发 onerror，这里统一关闭并交给轮询兜底
+      source.close();
+      startPolling();
+    };
+
+    return () => {
+      source.close();
+      if (interval) clearInterval(interval);
+    };
+  }, [isGenerating, storyId, pollVideoStatus, applyStatus]);
 
   const handleDownload = () => {
     const downloadUrl = getVideoDownloadUrl(storyId);
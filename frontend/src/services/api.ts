@@ -331,6 +331,11 @@ export async function getVideoStatus(storyId: string): Promise<VideoStatusRespon
   return requestJson(`${getApiUrl()}/api/video/status/${storyId}`);
 }
 
+/** 视频生成状态推送（SSE），每条消息为一个 VideoStatusResponse */
+export function getVideoStatusStreamUrl(storyId: string): string {
+  return `${getApiUrl()}/api/video/status-stream/${storyId}`;
+}
+
 export function getVideoDownloadUrl(storyId: string): string {
   return `${getApiUrl()}/api/video/download/${storyId}`;
 }
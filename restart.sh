@@ -6,6 +6,8 @@ LOG_DIR="$ROOT_DIR/logs"
 mkdir -p "$LOG_DIR"
 
 BACKEND_PORT="1001"
+# 后端 worker 进程数（>1 时为多进程部署，可通过环境变量覆盖，如 BACKEND_WORKERS=4 ./restart.sh start）
+BACKEND_WORKERS="${BACKEND_WORKERS:-1}"
 FRONTEND_PORT="1000"
 BACKEND_PYTHON_BIN=""
 
@@ -67,12 +69,14 @@ start_backend() {
     echo "[restart] 后端已在运行 ($BACKEND_PORT)"
     return
   fi
-  echo "[restart] 启动后端 http://localhost:1001 ..."
+  echo "[restart] 启动后端 http://localhost:1001 (workers=$BACKEND_WORKERS) ..."
   (
     cd "$ROOT_DIR/backend"
     env -u http_proxy -u https_proxy -u all_proxy -u no_proxy \
       -u HTTP_PROXY -u HTTPS_PROXY -u ALL_PROXY -u NO_PROXY \
-      nohup "$BACKEND_PYTHON_BIN" -m uvicorn app.main:app --host 0.0.0.0 --port 1001 > "$LOG_DIR/backend.log" 2>&1 &
+      WEB_CONCURRENCY="$BACKEND_WORKERS" \
+      nohup "$BACKEND_PYTHON_BIN" -m uvicorn app.main:app --host 0.0.0.0 --port 1001 \
+        --workers "$BACKEND_WORKERS" > "$LOG_DIR/backend.log" 2>&1 &
   )
 }
 